@@ -0,0 +1,73 @@
+"""
+Recall@k and latency of the IVF index against exact (brute-force) search.
+
+    python3 -m benchmarks.ann_recall                      # synthetic clustered vectors
+    python3 -m benchmarks.ann_recall --index .code-index  # real embeddings.npy
+"""
+import os
+import time
+import argparse
+import numpy as np
+from src import search
+from src.ann import IVFIndex
+
+def synthetic(n, dim, clusters, seed=0, out=None):
+    # Кластеризовані одиничні вектори - ближче до реальних ембедингів, ніж рівномірний шум.
+    # out: готовий (n, dim) масив, напр. memmap для мільйонів рядків
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    matrix = np.empty((n, dim), dtype=np.float32) if out is None else out
+    chunk = 65536
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        labels = rng.integers(0, clusters, size)
+        matrix[start:start + size] = centers[labels] + 0.6 * rng.standard_normal((size, dim), dtype=np.float32)
+    return search.normalize_rows(matrix)
+
+def make_queries(matrix, count, seed=1):
+    # Запити - зашумлені рядки індексу (як перефразований опис сутності)
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(matrix[rng.choice(len(matrix), count, replace=False)])
+    queries = rows + 0.3 * rng.standard_normal(rows.shape, dtype=np.float32)
+    return search.normalize_rows(queries.astype(np.float32))
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF recall@k benchmark")
+    parser.add_argument("--index", help="Index dir with embeddings.npy (default: synthetic data)")
+    parser.add_argument("-n", type=int, default=200000, help="Synthetic vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000, help="Synthetic topic clusters")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = default for n")
+    parser.add_argument("--nprobe", default="1,4,8,16,32,64")
+    args = parser.parse_args()
+
+    if args.index:
+        matrix = np.load(os.path.join(args.index, "embeddings.npy"), mmap_mode="r")
+        source = os.path.join(args.index, "embeddings.npy")
+    else:
+        matrix = synthetic(args.n, args.dim, args.clusters)
+        source = "synthetic"
+    queries = make_queries(matrix, min(args.queries, len(matrix)))
+    print(f"Data: {source}, {matrix.shape[0]} x {matrix.shape[1]}, {len(queries)} queries, k={args.k}")
+
+    start = time.perf_counter()
+    index = IVFIndex.build(matrix, nlist=args.nlist or None)
+    print(f"Build: nlist={index.nlist}, {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    truth = [set(search.top_k(matrix, q, k=args.k)[0].tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"Exact: {exact_ms:.2f} ms/query")
+
+    print(f"{'nprobe':>6} {'recall@' + str(args.k):>10} {'ms/query':>9} {'speedup':>8}")
+    for nprobe in (int(x) for x in args.nprobe.split(",")):
+        start = time.perf_counter()
+        found = [index.search(matrix, q, k=args.k, nprobe=nprobe)[0] for q in queries]
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(truth[i] & set(f.tolist())) / len(truth[i]) for i, f in enumerate(found)])
+        print(f"{nprobe:>6} {recall:>10.3f} {ms:>9.2f} {exact_ms / ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Build time, size and query latency of the call graph on a synthetic codebase.
+
+    python3 -m benchmarks.callgraph                       # 100k entities, ~1M call edges
+    python3 -m benchmarks.callgraph -n 20000 --calls 5
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from src.callgraph import CallGraph
+
+def synthetic_records(n, calls, files_per_dir=20, funcs_per_file=25, seed=0):
+    # Частина функцій викликається значно частіше (утиліти) - степеневий розподіл
+    rng = np.random.default_rng(seed)
+    popular = rng.zipf(1.3, size=(n, calls)) % n
+    uniform = rng.integers(0, n, size=(n, calls))
+    callees = np.where(rng.random((n, calls)) < 0.5, popular, uniform)
+    for i in range(n):
+        f = i // funcs_per_file
+        path = f"pkg{f // files_per_dir}/mod{f}.py"
+        yield {"id": f"{path}:func{i}", "symbol": f"func{i}", "path": path,
+               "calls": [f"func{j}" for j in callees[i]]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Call graph benchmark")
+    parser.add_argument("-n", type=int, default=100000, help="Synthetic entities")
+    parser.add_argument("--calls", type=int, default=10, help="Call sites per entity")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--depth", default="1,2,3")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = CallGraph.build(synthetic_records(args.n, args.calls))
+    print(f"Build: {args.n} entities, {graph.edges} edges, {time.perf_counter() - start:.2f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "callgraph.npz")
+        graph.save(path)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        graph = CallGraph.load(path)
+        load_ms = (time.perf_counter() - start) * 1000
+        print(f"File: {size / 2**20:.1f} MiB ({size / max(1, graph.edges):.1f} B/edge), load {load_ms:.1f} ms")
+
+        rng = np.random.default_rng(1)
+        sample = [graph.ids[i] for i in rng.choice(args.n, size=min(args.queries, args.n), replace=False)]
+        graph.index(sample[0])  # словник id -> індекс будується при першому запиті
+        print(f"{'depth':>5} {'direction':>9} {'avg found':>10} {'ms/query':>9}")
+        for depth in (int(x) for x in args.depth.split(",")):
+            for reverse in (False, True):
+                start = time.perf_counter()
+                found = [len(graph.walk(eid, depth=depth, reverse=reverse)) for eid in sample]
+                ms = (time.perf_counter() - start) * 1000 / len(sample)
+                print(f"{depth:>5} {'callers' if reverse else 'callees':>9} {np.mean(found):>10.0f} {ms:>9.2f}")
+
+if __name__ == "__main__":
+    main()
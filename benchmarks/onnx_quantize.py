@@ -0,0 +1,72 @@
+"""
+fp32 model.onnx vs. its int8 quantization (model.int8.onnx from 'quantize-model'):
+size, load time, encode throughput and agreement of the vectors on a fixed text set.
+
+    python3 -m benchmarks.onnx_quantize                      # models/all-MiniLM-L6-v2-onnx
+    python3 -m benchmarks.onnx_quantize --texts 2000 --threads 4
+    python3 -m benchmarks.onnx_quantize --requantize --per-channel
+
+Agreement: cosine between the fp32 and int8 vector of each text, and overlap of the
+top-k neighbours of every text within the set (what search would return).
+"""
+import os
+import time
+import argparse
+import numpy as np
+from src import search
+from src.providers.embed_onnx import OnnxEmbedder, quantize_model, FP32_MODEL, QUANTIZED_MODEL
+from benchmarks.onnx_workers import make_texts
+
+def run(model_dir, model_file, texts, batch_size, threads):
+    start = time.perf_counter()
+    embedder = OnnxEmbedder(model_dir, batch_size=batch_size, verbose=False, model_file=model_file, intra_op_threads=threads)
+    load = time.perf_counter() - start
+    embedder.encode(texts[:batch_size])  # розігрів
+    start = time.perf_counter()
+    vectors = embedder.encode(texts)
+    return vectors, load, len(texts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="int8 vs fp32 ONNX embedding benchmark")
+    parser.add_argument("--model", default="models/all-MiniLM-L6-v2-onnx", help="Model dir with model.onnx")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_threads (default: onnxruntime)")
+    parser.add_argument("-k", type=int, default=10, help="k for the neighbour overlap")
+    parser.add_argument("--requantize", action="store_true", help="Rebuild model.int8.onnx even if it exists")
+    parser.add_argument("--per-channel", action="store_true")
+    args = parser.parse_args()
+
+    quantized = os.path.join(args.model, QUANTIZED_MODEL)
+    if args.requantize or not os.path.exists(quantized):
+        start = time.perf_counter()
+        quantize_model(args.model, per_channel=args.per_channel)
+        print(f"Quantized in {time.perf_counter() - start:.1f}s")
+
+    texts = make_texts(args.texts)
+    print(f"{args.texts} texts, batch {args.batch_size}, {os.cpu_count()} cores, model {args.model}")
+    print(f"{'model':<16} {'MiB':>7} {'load s':>7} {'texts/s':>9} {'speedup':>8}")
+    import transformers  # імпорт (~1 с) не входить у час завантаження першої моделі
+    results, base_rate = {}, None
+    for model_file in (FP32_MODEL, QUANTIZED_MODEL):
+        vectors, load, rate = run(args.model, model_file, texts, args.batch_size, args.threads)
+        results[model_file] = vectors
+        size = os.path.getsize(os.path.join(args.model, model_file)) / 2**20
+        base_rate = base_rate or rate
+        print(f"{model_file:<16} {size:>7.1f} {load:>7.2f} {rate:>9.1f} {rate / base_rate:>7.2f}x")
+
+    fp32, int8 = results[FP32_MODEL], results[QUANTIZED_MODEL]
+    cosine = np.sum(fp32 * int8, axis=1) / (np.linalg.norm(fp32, axis=1) * np.linalg.norm(int8, axis=1))
+    print(f"Cosine fp32 vs int8: mean {cosine.mean():.4f}, p5 {np.percentile(cosine, 5):.4f}, min {cosine.min():.4f}")
+
+    # Сусіди кожного тексту серед інших (сам текст виключаємо)
+    k = min(args.k, len(texts) - 1)
+    overlap = 0.0
+    for i in range(len(texts)):
+        truth = set(search.top_k(fp32, fp32[i], k=k + 1)[0].tolist()) - {i}
+        found = set(search.top_k(int8, int8[i], k=k + 1)[0].tolist()) - {i}
+        overlap += len(truth & found) / max(1, len(truth))
+    print(f"top-{k} neighbour overlap: {overlap / len(texts):.3f}")
+
+if __name__ == "__main__":
+    main()
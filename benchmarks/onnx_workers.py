@@ -0,0 +1,78 @@
+"""
+ONNX embedding throughput vs. number of worker processes (one session each), plus
+session load time with and without the cached optimized graph.
+
+    python3 -m benchmarks.onnx_workers                                 # models/all-MiniLM-L6-v2-onnx
+    python3 -m benchmarks.onnx_workers --workers 1,2,4,8 --texts 4000
+    python3 -m benchmarks.onnx_workers --threads 2                     # intra-op threads per session
+"""
+import os
+import time
+import random
+import argparse
+import numpy as np
+from src.providers.embed_onnx import OnnxEmbedder, OnnxEmbedderPool, optimized_model_path
+from benchmarks.synthetic_repo import _name, _sentence
+
+def make_texts(n: int, seed: int = 0):
+    """Texts shaped like the ones 'embed' encodes: 'Entity <symbol>: <one to six sentences>'."""
+    rng = random.Random(seed)
+    return [f"Entity {_name(rng)}: " + " ".join(_sentence(rng) for _ in range(rng.randint(1, 6))) for _ in range(n)]
+
+def load_time(model_dir, **options):
+    start = time.perf_counter()
+    OnnxEmbedder(model_dir, verbose=False, **options)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX embedding worker pool benchmark")
+    parser.add_argument("--model", default="models/all-MiniLM-L6-v2-onnx", help="Model dir with model.onnx")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", default=None, help="Comma-separated worker counts (default: 1,2,4,... up to cores)")
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_threads per session (default: cores / workers)")
+    parser.add_argument("--optimization", default="all", help="graph_optimization level")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    counts = [int(w) for w in args.workers.split(",")] if args.workers else [1 << i for i in range(cores.bit_length()) if 1 << i <= cores]
+    texts = make_texts(args.texts)
+    options = {"graph_optimization": args.optimization, "intra_op_threads": args.threads}
+    print(f"{args.texts} texts, batch {args.batch_size}, {cores} cores, model {args.model}")
+
+    # Старт сесії: оптимізація графа щоразу vs. готовий граф з кешу
+    onnx_file = os.path.join(args.model, "model.onnx")
+    import onnxruntime as ort
+    cached = optimized_model_path(onnx_file, args.optimization, ort.__version__)
+    if os.path.exists(cached):
+        os.remove(cached)
+    no_cache = load_time(args.model, optimized_cache=False, **options)
+    load_time(args.model, **options)  # пише кеш
+    with_cache = load_time(args.model, **options)
+    print(f"Session load: {no_cache:.2f}s optimizing, {with_cache:.2f}s from cache ({no_cache / with_cache:.1f}x)")
+
+    print(f"{'workers':>7} {'threads':>7} {'start s':>8} {'texts/s':>9} {'speedup':>8} {'max |diff|':>11}")
+    base_rate, reference = None, None
+    for workers in counts:
+        start = time.perf_counter()
+        if workers == 1:
+            embedder = OnnxEmbedder(args.model, batch_size=args.batch_size, verbose=False, **options)
+            threads = args.threads or "auto"
+        else:
+            embedder = OnnxEmbedderPool(args.model, workers, batch_size=args.batch_size, **options)
+            threads = args.threads or max(1, cores // workers)
+        # Розігрів: кожен воркер піднімає сесію на першому батчі - це час старту, а не пропускна здатність
+        embedder.encode(texts[:args.batch_size * workers * 2])
+        startup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectors = embedder.encode(texts)
+        rate = len(texts) / (time.perf_counter() - start)
+        embedder.close()
+        if reference is None:
+            base_rate, reference = rate, vectors
+        diff = float(np.abs(vectors - reference).max())
+        print(f"{workers:>7} {threads:>7} {startup:>8.2f} {rate:>9.1f} {rate / base_rate:>7.2f}x {diff:>11.2e}")
+
+if __name__ == "__main__":
+    main()
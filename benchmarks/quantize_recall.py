@@ -0,0 +1,52 @@
+"""
+Size and recall@k of sq8/pq codes against exact float32 search, with and without rescoring.
+
+    python3 -m benchmarks.quantize_recall                      # synthetic clustered vectors
+    python3 -m benchmarks.quantize_recall --index .code-index  # real embeddings.npy
+"""
+import os
+import time
+import argparse
+import numpy as np
+from src import search
+from src.quantize import QuantizedIndex
+from benchmarks.ann_recall import synthetic, make_queries
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantization recall@k benchmark")
+    parser.add_argument("--index", help="Index dir with embeddings.npy (default: synthetic data)")
+    parser.add_argument("-n", type=int, default=100000, help="Synthetic vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, default=10, help="Rescore k * N candidates exactly")
+    parser.add_argument("--methods", default="sq8,pq")
+    args = parser.parse_args()
+
+    if args.index:
+        matrix = np.load(os.path.join(args.index, "embeddings.npy"), mmap_mode="r")
+    else:
+        matrix = synthetic(args.n, args.dim, args.clusters)
+    queries = make_queries(matrix, min(args.queries, len(matrix)))
+    print(f"Data: {matrix.shape[0]} x {matrix.shape[1]}, float32 {matrix.nbytes / 2**20:.1f} MiB, k={args.k}")
+
+    start = time.perf_counter()
+    truth = [set(search.top_k(matrix, q, k=args.k)[0].tolist()) for q in queries]
+    print(f"Exact: {(time.perf_counter() - start) * 1000 / len(queries):.2f} ms/query")
+
+    print(f"{'method':>6} {'MiB':>7} {'ratio':>6} {'build s':>8} {'rescore':>8} {'recall@' + str(args.k):>10} {'ms/query':>9}")
+    for method in args.methods.split(","):
+        start = time.perf_counter()
+        index = QuantizedIndex.build(matrix, method)
+        build = time.perf_counter() - start
+        for rescore in (0, args.rescore):
+            start = time.perf_counter()
+            found = [index.search(q, k=args.k, matrix=matrix if rescore else None, rescore=rescore)[0] for q in queries]
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+            recall = np.mean([len(truth[i] & set(f.tolist())) / len(truth[i]) for i, f in enumerate(found)])
+            print(f"{method:>6} {index.nbytes / 2**20:>7.1f} {matrix.nbytes / index.nbytes:>5.1f}x {build:>8.1f} "
+                  f"{'x' + str(rescore) if rescore else '-':>8} {recall:>10.3f} {ms:>9.2f}")
+
+if __name__ == "__main__":
+    main()
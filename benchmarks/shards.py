@@ -0,0 +1,78 @@
+"""
+Fan-out search over shards: thread pool vs. one shard after another vs. one big matrix.
+Also checks that the merged top-k equals exact search over all vectors together.
+
+    python3 -m benchmarks.shards                          # 8 shards x 50k x 384
+    python3 -m benchmarks.shards --shards 4 -n 200000 --workers 4
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+from src import search
+from src.shards import ShardedSearcher
+from benchmarks.ann_recall import synthetic, make_queries
+
+def write_shard(index_dir, name, n, dim, seed):
+    os.makedirs(index_dir)
+    matrix = np.lib.format.open_memmap(os.path.join(index_dir, "embeddings.npy"), mode="w+", dtype=np.float32, shape=(n, dim))
+    synthetic(n, dim, clusters=max(10, n // 200), seed=seed, out=matrix)
+    matrix.flush()
+    with open(os.path.join(index_dir, "ids.json"), "w") as f:
+        json.dump([f"{name}:{i}" for i in range(n)], f)
+    with open(os.path.join(index_dir, "embeddings_meta.json"), "w") as f:
+        json.dump({"embedder": "synthetic", "normalized": True}, f)
+    return matrix
+
+def timed_queries(index, queries, k):
+    start = time.perf_counter()
+    found = [index.query("", q, k=k, mode="dense", exact=True) for q in queries]
+    return found, (time.perf_counter() - start) * 1000 / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded search benchmark")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("-n", type=int, default=50000, help="Vectors per shard")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=0, help="Threads (default: min(shards, cores))")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog, matrices = {}, []
+        for s in range(args.shards):
+            name = f"shard{s}"
+            path = os.path.join(tmp, name)
+            matrices.append(write_shard(path, name, args.n, args.dim, seed=s))
+            catalog[name] = {"path": path}
+        print(f"{args.shards} shards x {args.n} x {args.dim} ({args.shards * args.n} vectors), {os.cpu_count()} cores")
+
+        queries = make_queries(matrices[0], args.queries)
+        combined = np.concatenate(matrices)
+        start = time.perf_counter()
+        truth = [search.top_k(combined, q, k=args.k)[0] for q in queries]
+        single_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        del combined
+
+        sequential = ShardedSearcher(catalog, workers=1)
+        _, seq_ms = timed_queries(sequential, queries, args.k)
+        sequential.close()
+
+        parallel = ShardedSearcher(catalog, workers=args.workers)
+        found, par_ms = timed_queries(parallel, queries, args.k)
+        workers = parallel.pool._max_workers
+        parallel.close()
+
+        # Id шарду -> рядок об'єднаної матриці
+        expected = [[f"shard{i // args.n}:{i % args.n}" for i in idx] for idx in truth]
+        same = np.mean([[eid for _, eid, _ in f] == e for f, e in zip(found, expected)])
+        print(f"{'one matrix':<22} {single_ms:>8.2f} ms/query")
+        print(f"{'shards, sequential':<22} {seq_ms:>8.2f} ms/query")
+        print(f"{f'shards, {workers} threads':<22} {par_ms:>8.2f} ms/query ({seq_ms / par_ms:.2f}x vs sequential)")
+        print(f"Merged top-{args.k} identical to exact search over all vectors: {same:.0%} of queries")
+
+if __name__ == "__main__":
+    main()
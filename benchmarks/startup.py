@@ -0,0 +1,82 @@
+"""
+Startup cost of the CLI: wall time and the import time of main.py's own imports
+(python -X importtime, everything after the interpreter's 'site').
+
+    python3 -m benchmarks.startup                         # --help, status, config
+    python3 -m benchmarks.startup --cmd=--help            # options as values need "="
+    python3 -m benchmarks.startup --cmd "search foo --mode lexical --local"
+    python3 -m benchmarks.startup --budget 100            # exit 1 if over budget
+
+Run it from an indexed project directory to measure 'status' on a real index.
+Exits with status 1 if any command's import time exceeds --budget (ms).
+"""
+import os
+import re
+import sys
+import time
+import shlex
+import argparse
+import statistics
+import subprocess
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+DEFAULT_COMMANDS = ["--help", "status", "config"]
+
+# "import time:  self [us] | cumulative | imported package" - верхній рівень без відступу
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\S.*)$")
+
+def import_profile(stderr: str):
+    """[(module, cumulative us)] of top-level imports done after 'site' (i.e. by the script)."""
+    modules = []
+    after_site = False
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if not m: continue
+        name = m.group(3)
+        if name == "site":
+            after_site = True
+        elif after_site:
+            modules.append((name, int(m.group(2))))
+    return modules
+
+def measure(argv, runs):
+    walls, imports, profile = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", MAIN] + argv,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        walls.append((time.perf_counter() - start) * 1000)
+        profile = import_profile(proc.stderr)
+        imports.append(sum(us for _, us in profile) / 1000)
+    return statistics.median(walls), statistics.median(imports), profile
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup time benchmark")
+    parser.add_argument("--cmd", action="append", help="Command line to measure (repeatable; default: --help, status, config)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=100.0, help="Max import time per command, ms")
+    parser.add_argument("--top", type=int, default=5, help="Slowest top-level imports to show")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.runs):
+        subprocess.run([sys.executable, "-c", "pass"])
+    baseline = (time.perf_counter() - start) * 1000 / args.runs
+    print(f"Interpreter alone: {baseline:.0f} ms, budget for main.py imports: {args.budget:.0f} ms")
+
+    over = []
+    for cmd in args.cmd or DEFAULT_COMMANDS:
+        wall, imported, profile = measure(shlex.split(cmd), args.runs)
+        status = "ok" if imported <= args.budget else "OVER BUDGET"
+        print(f"\n{cmd}: {wall:.0f} ms wall, {imported:.1f} ms imports [{status}]")
+        for name, us in sorted(profile, key=lambda p: p[1], reverse=True)[:args.top]:
+            print(f"  {us / 1000:>7.1f} ms  {name}")
+        if imported > args.budget:
+            over.append(cmd)
+
+    if over:
+        print(f"\n❌ Over the {args.budget:.0f} ms budget: {', '.join(over)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
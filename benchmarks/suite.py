@@ -0,0 +1,285 @@
+"""
+Offline benchmark suite: parse, storage, embed (stub model) and search on synthetic data.
+Prints a summary to stderr and writes JSON, so runs can be compared across commits.
+
+    python3 -m benchmarks.suite --out base.json                   # default sizes
+    python3 -m benchmarks.suite --out new.json --compare base.json
+    python3 -m benchmarks.suite --only parse,storage --files 500  # quick run
+    python3 -m benchmarks.suite --sizes 10000,100000,1000000      # search up to 1M vectors
+
+No model downloads: embeddings come from a deterministic stub BaseEmbedder.
+Everything runs in a temporary directory (.code-index included).
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from src import search, storage, scanner
+from src.ann import IVFIndex
+from src.callgraph import CallGraph
+from src.lexical import LexicalIndex
+from src.parser import CodeParser
+from src.quantize import QuantizedIndex
+from src.walker import Walker, walk_files
+from src.providers.base import BaseEmbedder
+from benchmarks.ann_recall import synthetic, make_queries
+from benchmarks.synthetic_repo import generate
+
+SECTIONS = ("parse", "storage", "embed", "search")
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class StubEmbedder(BaseEmbedder):
+    """Deterministic vectors seeded by the text hash; no model, no downloads."""
+
+    def __init__(self, dim: int = 384, batch_size: int = 32):
+        self._dimension = dim
+        self.batch_size = batch_size
+
+    def encode_batch(self, texts):
+        out = np.empty((len(texts), self._dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            out[i] = np.random.default_rng(seed).standard_normal(self._dimension, dtype=np.float32)
+        return out
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def per_query_ms(fn, queries):
+    """Mean and p50 latency of fn(q) over the queries, ms."""
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        times.append((time.perf_counter() - start) * 1000)
+    return round(float(np.mean(times)), 3), round(float(np.median(times)), 3)
+
+def log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+# --- Секції ---
+
+def bench_parse(repo, files):
+    p = CodeParser()
+    # Граматики вантажаться ліниво - перший файл кожної мови прогріває кеш
+    for ext in p.GRAMMARS:
+        first = next((f for f in files if f.endswith(ext)), None)
+        if first: p.parse_file(first)
+
+    entities, size = 0, 0
+    by_lang = {}
+    start = time.perf_counter()
+    for path in files:
+        t = time.perf_counter()
+        found = p.parse_file(path)
+        ext = os.path.splitext(path)[1]
+        stat = by_lang.setdefault(ext, [0, 0.0])
+        stat[0] += 1
+        stat[1] += time.perf_counter() - t
+        entities += len(found)
+        size += os.path.getsize(path)
+    elapsed = time.perf_counter() - start
+
+    _, walk = timed(lambda: sum(1 for _ in Walker(repo)))
+    _, cold = timed(scanner.incremental_scan, repo, CodeParser(), {}, {})
+    found, manifest, _ = scanner.incremental_scan(repo, p, {}, {})
+    entity_map = {e.id: e for e in found}
+    _, warm = timed(scanner.incremental_scan, repo, p, entity_map, manifest)
+    return {
+        "files": len(files), "entities": entities, "mib": round(size / 2**20, 2),
+        "parse_files_per_s": round(len(files) / elapsed, 1),
+        "parse_mib_per_s": round(size / 2**20 / elapsed, 2),
+        "parse_entities_per_s": round(entities / elapsed, 1),
+        "files_per_s_by_language": {ext: round(n / t, 1) for ext, (n, t) in sorted(by_lang.items())},
+        "walk_ms": round(walk * 1000, 2),
+        "scan_cold_s": round(cold, 3),
+        "scan_unchanged_s": round(warm, 3),
+    }, found
+
+def bench_storage(entities):
+    _, save = timed(storage.save_entities, entities)
+    store, load = timed(storage.load_entities)
+    records, iterate = timed(lambda: list(storage.iter_entity_records(store)))
+    ids = random.Random(0).sample(list(store), min(1000, len(store)))
+    fresh = storage.load_entities()
+    _, lookup = timed(lambda: [fresh[eid] for eid in ids])
+    manifest = {f"file{i}.py": {"size": i, "mtime_ns": i, "hash": "0" * 32, "parser": 2,
+                                "entities": [e.id for e in entities[i::1000]]} for i in range(min(1000, len(entities)))}
+    _, save_manifest = timed(storage.save_manifest, manifest)
+    _, load_manifest = timed(storage.load_manifest)
+    lexical, lexical_build = timed(LexicalIndex.build, records)
+    graph, graph_build = timed(CallGraph.build, records)
+    return {
+        "entities": len(entities),
+        "save_entities_s": round(save, 3),
+        "load_entities_ms": round(load * 1000, 2),
+        "iterate_records_s": round(iterate, 3),
+        "decode_1000_random_ms": round(lookup * 1000, 2),
+        "save_manifest_ms": round(save_manifest * 1000, 2),
+        "load_manifest_ms": round(load_manifest * 1000, 2),
+        "lexical_build_s": round(lexical_build, 3),
+        "callgraph_build_s": round(graph_build, 3),
+        "callgraph_edges": graph.edges,
+    }, records, lexical
+
+def bench_embed(records, dim):
+    texts = [f"Entity {r['symbol']}: {r.get('responsibility') or r['path']}" for r in records]
+    embedder = StubEmbedder(dim)
+    matrix = storage.open_embeddings_output((len(texts), dim))
+    _, encode = timed(embedder.encode, texts, out=matrix)
+    _, normalize = timed(search.normalize_rows, matrix)
+    _, save = timed(storage.save_embeddings, [r["id"] for r in records], matrix, meta={"normalized": True})
+    (_, loaded), load = timed(storage.load_embeddings, mmap_mode="r")
+    return {
+        "texts": len(texts), "dim": dim,
+        "encode_texts_per_s": round(len(texts) / encode, 1),
+        "normalize_ms": round(normalize * 1000, 2),
+        "save_ms": round(save * 1000, 2),
+        "load_mmap_ms": round(load * 1000, 2),
+    }
+
+def bench_search(sizes, dim, queries, k, lexical, records, workdir):
+    out = {}
+    for n in sizes:
+        log(f"  search: {n} x {dim}")
+        path = os.path.join(workdir, f"vectors_{n}.npy")
+        matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, dim))
+        synthetic(n, dim, clusters=max(10, n // 200), out=matrix)
+        matrix.flush()
+        # Менше запитів для великих матриць: точний скан 1M x 384 - сотні мс
+        qs = make_queries(matrix, min(queries, max(10, queries * 10000 // n)))
+        truth = [set(search.top_k(matrix, q, k=k)[0].tolist()) for q in qs]
+        recall = lambda found: round(float(np.mean([len(t & set(f.tolist())) / k for t, f in zip(truth, found)])), 4)
+
+        row = {"queries": len(qs)}
+        row["exact_ms"], row["exact_p50_ms"] = per_query_ms(lambda q: search.top_k(matrix, q, k=k), qs)
+        _, batch = timed(search.top_k_batch, matrix, qs, k=k)
+        row["batch_ms_per_query"] = round(batch * 1000 / len(qs), 3)
+
+        ivf, row["ivf_build_s"] = timed(IVFIndex.build, matrix)
+        row["ivf_ms"], row["ivf_p50_ms"] = per_query_ms(lambda q: ivf.search(matrix, q, k=k), qs)
+        row["ivf_recall"] = recall([ivf.search(matrix, q, k=k)[0] for q in qs])
+
+        sq8, row["sq8_build_s"] = timed(QuantizedIndex.build, matrix, "sq8")
+        row["sq8_ms"], row["sq8_p50_ms"] = per_query_ms(lambda q: sq8.search(q, k=k, matrix=matrix), qs)
+        row["sq8_recall"] = recall([sq8.search(q, k=k, matrix=matrix)[0] for q in qs])
+        row = {key: round(v, 3) if isinstance(v, float) else v for key, v in row.items()}
+        out[str(n)] = row
+        del matrix, ivf, sq8
+        os.remove(path)
+
+    if lexical is not None:
+        rng = random.Random(1)
+        sample = rng.sample(records, min(200, len(records)))
+        ident = [r["symbol"] for r in sample]
+        words = [" ".join(r["symbol"].split("_")[:2]) for r in sample]
+        out["lexical"] = {
+            "documents": len(records),
+            "identifier_ms": per_query_ms(lambda q: lexical.search(q, k), ident)[0],
+            "words_ms": per_query_ms(lambda q: lexical.search(q, k), words)[0],
+        }
+    return out
+
+# --- JSON і порівняння ---
+
+def environment(args):
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], cwd=REPO, capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+        "numpy": np.__version__, "platform": platform.platform(), "cpus": os.cpu_count(),
+        "args": vars(args),
+    }
+
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(old, new):
+    """Prints every shared numeric metric with its relative change (old -> new)."""
+    a, b = flatten(old["results"]), flatten(new["results"])
+    log(f"\nCompare {old['env'].get('commit') or '?'} -> {new['env'].get('commit') or '?'}")
+    for key in sorted(a.keys() & b.keys()):
+        if not a[key] or a[key] == b[key]: continue
+        change = (b[key] - a[key]) / abs(a[key]) * 100
+        # _per_s і recall: більше - краще; час (_s, _ms): менше - краще
+        better = key.endswith("_per_s") or "recall" in key
+        timing = key.endswith("_s") or key.endswith("_ms") or "_ms_" in key
+        verdict = ("better" if (change > 0) == better else "worse") if (better or timing) else ""
+        log(f"  {key:<55} {a[key]:>12} -> {b[key]:<12} {change:+7.1f}% {verdict}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite (JSON output)")
+    parser.add_argument("--files", type=int, default=2000, help="Files in the synthetic repo")
+    parser.add_argument("--sizes", default="10000,100000", help="Vector counts for search (e.g. 10000,100000,1000000)")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help=f"Comma-separated sections ({', '.join(SECTIONS)})")
+    parser.add_argument("--out", help="Write JSON here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Previous JSON to compare against")
+    args = parser.parse_args()
+    only = set(args.only.split(",")) if args.only else set(SECTIONS)
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="code-indexer-bench-") as tmp:
+        repo = os.path.join(tmp, "repo")
+        stats, gen_time = timed(generate, repo, args.files, args.seed)
+        log(f"Synthetic repo: {stats['files']} files, {stats['functions']} functions ({gen_time:.1f}s)")
+        files = sorted(walk_files(repo))
+        # storage пише в відносний .code-index - працюємо в тимчасовій папці
+        os.chdir(tmp)
+        try:
+            log("parse...")
+            parsed, entities = bench_parse(repo, files)
+            if "parse" in only: results["parse"] = parsed
+            records = lexical = None
+            if only & {"storage", "embed", "search"}:
+                log("storage...")
+                stored, records, lexical = bench_storage(entities)
+                if "storage" in only: results["storage"] = stored
+            if "embed" in only:
+                log("embed...")
+                results["embed"] = bench_embed(records, args.dim)
+            if "search" in only:
+                log("search...")
+                sizes = [int(x) for x in args.sizes.split(",") if x]
+                results["search"] = bench_search(sizes, args.dim, args.queries, args.k, lexical, records, tmp)
+        finally:
+            os.chdir(cwd)
+
+    report = {"env": environment(args), "repo": stats, "results": results}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        log(f"✅ Results written to {args.out}")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
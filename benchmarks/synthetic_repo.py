@@ -0,0 +1,214 @@
+"""
+Deterministic synthetic multi-language repository (.py / .go / .kt) for benchmarks.
+The same (n, seed) always produces byte-identical files.
+
+    python3 -m benchmarks.synthetic_repo /tmp/synth -n 2000
+"""
+import os
+import random
+import argparse
+
+# Частки мов і розподіли розмірів - приблизно як у типовому сервісі
+LANGUAGES = [(".py", 0.6), (".go", 0.25), (".kt", 0.15)]
+FILES_PER_DIR = 20
+RESPONSIBILITY_RATE = 0.25   # частка функцій з "Responsibility:" (стають high confidence)
+
+WORDS = (
+    "load save parse index build fetch update delete merge split encode decode render "
+    "validate resolve compute apply filter sort group flush sync scan read write open close "
+    "user order payment invoice session token cache queue event report config account item "
+    "price stock batch record entry node graph path file buffer stream client server request"
+).split()
+
+def _name(rng, parts=2):
+    return "_".join(rng.choice(WORDS) for _ in range(parts))
+
+def _camel(snake, upper=False):
+    head, *tail = snake.split("_")
+    out = head + "".join(w.capitalize() for w in tail)
+    return out[0].upper() + out[1:] if upper else out
+
+def _count(rng, mean, cap):
+    # Геометричний розподіл: багато маленьких файлів/класів, довгий хвіст великих
+    n = 1
+    while n < cap and rng.random() > 1 / mean:
+        n += 1
+    return n
+
+def _body_lines(rng):
+    # Логнормальна довжина тіла: медіана ~8 рядків, зрідка сотні
+    return max(1, min(200, int(rng.lognormvariate(2.1, 0.7))))
+
+def _sentence(rng):
+    return f"{rng.choice(WORDS).capitalize()}s the {rng.choice(WORDS)} {rng.choice(WORDS)} for the {rng.choice(WORDS)}."
+
+class _Gen:
+    def __init__(self, rng):
+        self.rng = rng
+        # Імена, вже визначені раніше - тіла викликають їх (граф викликів не порожній)
+        self.defined = []
+
+    def callee(self):
+        if self.defined and self.rng.random() < 0.7:
+            return self.rng.choice(self.defined)
+        return _name(self.rng)
+
+    # --- Python ---
+    def py_function(self, name, indent="", method=False):
+        rng = self.rng
+        pad = indent + "    "
+        args = "self, value" if method else "value"
+        lines = [f"{indent}def {name}({args}):", f'{pad}"""{_sentence(rng)}"""']
+        if rng.random() < RESPONSIBILITY_RATE:
+            lines.append(f"{pad}# Responsibility: {_sentence(rng)}")
+        var = "result"
+        lines.append(f"{pad}{var} = value")
+        for _ in range(_body_lines(rng)):
+            kind = rng.random()
+            if kind < 0.45:
+                call = self.callee()
+                target = f"self.{call}" if method and rng.random() < 0.3 else call
+                lines.append(f"{pad}{var} = {target}({var})")
+            elif kind < 0.7:
+                lines.append(f"{pad}if {var} > {rng.randint(0, 99)}:")
+                lines.append(f"{pad}    {var} -= {rng.randint(1, 9)}")
+            elif kind < 0.85:
+                lines.append(f"{pad}for i in range({rng.randint(2, 20)}):")
+                lines.append(f"{pad}    {var} += i * {rng.randint(1, 5)}")
+            else:
+                lines.append(f"{pad}{_name(rng)} = [{var}, {rng.randint(0, 999)}, '{rng.choice(WORDS)}']")
+        lines.append(f"{pad}return {var}")
+        return lines
+
+    def py_file(self, funcs, classes):
+        rng = self.rng
+        lines = ["import os", "import json", ""]
+        for _ in range(funcs):
+            name = _name(rng)
+            lines += self.py_function(name) + ["", ""]
+            self.defined.append(name)
+        for methods in classes:
+            cls = _camel(_name(rng), upper=True)
+            lines += [f"class {cls}:", f'    """{_sentence(rng)}"""', ""]
+            for _ in range(methods):
+                name = _name(rng)
+                lines += self.py_function(name, indent="    ", method=True) + [""]
+                self.defined.append(name)
+            lines.append("")
+        return "\n".join(lines) + "\n"
+
+    # --- Go ---
+    def go_function(self, header):
+        rng = self.rng
+        lines = [header]
+        if rng.random() < RESPONSIBILITY_RATE:
+            lines.append(f"\t// Responsibility: {_sentence(rng)}")
+        lines.append("\tresult := value")
+        for _ in range(_body_lines(rng)):
+            kind = rng.random()
+            if kind < 0.5:
+                lines.append(f"\tresult = {_camel(self.callee(), upper=True)}(result)")
+            elif kind < 0.75:
+                lines += [f"\tif result > {rng.randint(0, 99)} {{", f"\t\tresult -= {rng.randint(1, 9)}", "\t}"]
+            else:
+                lines += [f"\tfor i := 0; i < {rng.randint(2, 20)}; i++ {{", f"\t\tresult += i * {rng.randint(1, 5)}", "\t}"]
+        lines += ["\treturn result", "}"]
+        return lines
+
+    def go_file(self, pkg, funcs, classes):
+        rng = self.rng
+        lines = [f"package {pkg}", "", 'import "fmt"', "", "var _ = fmt.Sprintf", ""]
+        for _ in range(funcs):
+            name = _name(rng)
+            lines += [f"// {_camel(name, upper=True)} {_sentence(rng).lower()}"]
+            lines += self.go_function(f"func {_camel(name, upper=True)}(value int) int {{") + [""]
+            self.defined.append(name)
+        for methods in classes:
+            cls = _camel(_name(rng), upper=True)
+            lines += [f"type {cls} struct {{", "\tcount int", "}", ""]
+            for _ in range(methods):
+                name = _name(rng)
+                lines += self.go_function(f"func (s *{cls}) {_camel(name, upper=True)}(value int) int {{") + [""]
+                self.defined.append(name)
+        return "\n".join(lines) + "\n"
+
+    # --- Kotlin ---
+    def kt_function(self, name, indent=""):
+        rng = self.rng
+        pad = indent + "    "
+        lines = [f"{indent}fun {_camel(name)}(value: Int): Int {{"]
+        if rng.random() < RESPONSIBILITY_RATE:
+            lines.append(f"{pad}// Responsibility: {_sentence(rng)}")
+        lines.append(f"{pad}var result = value")
+        for _ in range(_body_lines(rng)):
+            kind = rng.random()
+            if kind < 0.5:
+                lines.append(f"{pad}result = {_camel(self.callee())}(result)")
+            elif kind < 0.75:
+                lines += [f"{pad}if (result > {rng.randint(0, 99)}) {{", f"{pad}    result -= {rng.randint(1, 9)}", f"{pad}}}"]
+            else:
+                lines += [f"{pad}for (i in 0 until {rng.randint(2, 20)}) {{", f"{pad}    result += i * {rng.randint(1, 5)}", f"{pad}}}"]
+        lines += [f"{pad}return result", f"{indent}}}"]
+        return lines
+
+    def kt_file(self, pkg, funcs, classes):
+        rng = self.rng
+        lines = [f"package {pkg}", ""]
+        for _ in range(funcs):
+            name = _name(rng)
+            lines += self.kt_function(name) + [""]
+            self.defined.append(name)
+        for methods in classes:
+            cls = _camel(_name(rng), upper=True)
+            lines.append(f"class {cls} {{")
+            for _ in range(methods):
+                name = _name(rng)
+                lines += self.kt_function(name, indent="    ") + [""]
+                self.defined.append(name)
+            lines += ["}", ""]
+        return "\n".join(lines) + "\n"
+
+def generate(root: str, n_files: int, seed: int = 0) -> dict:
+    """Writes n_files source files under root. Returns {files, bytes, functions, classes, by_language}."""
+    rng = random.Random(seed)
+    gen = _Gen(rng)
+    exts = [e for e, _ in LANGUAGES]
+    weights = [w for _, w in LANGUAGES]
+    stats = {"files": 0, "bytes": 0, "functions": 0, "classes": 0, "by_language": {e: 0 for e in exts}}
+
+    for i in range(n_files):
+        ext = rng.choices(exts, weights)[0]
+        folder = os.path.join(root, f"pkg{i // (FILES_PER_DIR * 10)}", f"mod{i // FILES_PER_DIR}")
+        pkg = f"mod{i // FILES_PER_DIR}"
+        funcs = _count(rng, mean=6, cap=60)
+        classes = [_count(rng, mean=4, cap=30) for _ in range(_count(rng, mean=1.5, cap=5))] if rng.random() < 0.35 else []
+        if ext == ".py":
+            text = gen.py_file(funcs, classes)
+        elif ext == ".go":
+            text = gen.go_file(pkg, funcs, classes)
+        else:
+            text = gen.kt_file(pkg, funcs, classes)
+
+        os.makedirs(folder, exist_ok=True)
+        data = text.encode("utf-8")
+        with open(os.path.join(folder, f"{_name(rng)}_{i}{ext}"), "wb") as f:
+            f.write(data)
+        stats["files"] += 1
+        stats["bytes"] += len(data)
+        stats["functions"] += funcs + sum(classes)
+        stats["classes"] += len(classes)
+        stats["by_language"][ext] += 1
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic multi-language repo generator")
+    parser.add_argument("root")
+    parser.add_argument("-n", type=int, default=1000, help="Number of files")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    stats = generate(args.root, args.n, args.seed)
+    print(f"Wrote {stats['files']} files ({stats['bytes'] / 2**20:.1f} MiB): "
+          f"{stats['functions']} functions/methods, {stats['classes']} classes, {stats['by_language']}")
+
+if __name__ == "__main__":
+    main()
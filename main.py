@@ -1,101 +1,178 @@
 #!/usr/bin/env python3
 import argparse
+import itertools
+import json
 import os
 import sys
-import numpy as np
-from src import config, storage, parser, intents, ai
-from src.schema import CodeEntity, EntitySummary
+import time
+from src import config, metrics
+
+# Важкі модулі (numpy, pydantic, tree-sitter, клієнт LLM) імпортуються всередині
+# команд, яким вони потрібні: '--help' і 'status' не мають за них платити.
+# Бюджет часу старту перевіряє benchmarks/startup.py.
 
 def cmd_scan(args):
-    print(f"🚀 Scanning {args.root}...")
+    from src import storage, parser, scanner
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    print(f"🚀 Scanning {args.root}..." + (f" ({args.jobs} jobs)" if args.jobs > 1 else ""))
     p = parser.CodeParser()
-    new_entities = []
-    
-    # 1. Scan filesystem
-    for root, _, files in os.walk(args.root):
-        if any(x in root for x in [".git", "node_modules", "venv", "__pycache__"]): continue
-        for file in files:
-            path = os.path.join(root, file)
-            found = p.parse_file(path)
-            new_entities.extend(found)
-
-    # 2. Merge with existing (preserve manual edits if needed, logic simplified here)
-    # В канонічному flow ми перезаписуємо scan, бо human-edits повинні бути в коді
-    storage.save_entities(new_entities)
-    print(f"✅ Scanned {len(new_entities)} entities. Saved to entities.json")
+
+    # 1. Scan filesystem (тільки змінені файли, решта береться з маніфесту).
+    #    Потік: сутності серіалізуються одразу після парсингу, незмінені копіюються
+    #    зі старого індексу як є; новий індекс публікується атомарно в кінці
+    #    Маніфест зберігається разом із сутностями (для SQLite - в тій самій транзакції)
+    with metrics.span("scan.load"):
+        old_entities = storage.load_entities()
+        manifest = storage.load_manifest()
+    try:
+        scan = scanner.ScanStream(args.root, p, old_entities, manifest, jobs=args.jobs)
+        with metrics.span("scan.save"):
+            total = storage.save_scan(old_entities, scan, scan.manifest)
+    finally:
+        if hasattr(old_entities, "close"):
+            old_entities.close()
+    stats = scan.stats
+    for key in ("reparsed", "skipped", "removed", "preserved"):
+        metrics.count(f"scan.files_{key}" if key != "preserved" else "scan.summaries_preserved", stats[key])
+
+    # 2. Похідні індекси будуються з записів, без pydantic-об'єктів
+    with storage.open_entities() as saved:
+        with metrics.span("scan.lexical_index"):
+            storage.build_lexical_index(saved)
+        with metrics.span("scan.callgraph"):
+            graph = storage.build_call_graph(saved)
+    print(f"✅ Scanned {total} entities. Saved to {storage.INDEX_DIR}")
+    print(f"   Files reparsed: {stats['reparsed']}, skipped: {stats['skipped']}, removed: {stats['removed']}"
+          + (f", over max_file_size: {stats['too_large']}" if stats["too_large"] else ""))
+    print(f"   Kept summaries for {stats['preserved']} unchanged entities. Took {stats['elapsed']:.2f}s")
+    print(f"   Call graph: {graph.edges} edges.")
     print("\n--- Next Recommended Step ---")
     print("1. Run 'code-indexer intents' if you have documentation in docs/intents/.")
     print("2. Run 'code-indexer summarize' to generate AI descriptions.")
     print("3. Run 'code-indexer embed' to create search vectors.")
 
+def cmd_watch(args):
+    from src import storage, parser, scanner, watcher
+    p = parser.CodeParser()
+
+    # Спочатку синхронізуємо індекс з диском, далі тільки інкрементальні оновлення
+    with storage.open_entities() as old_entities:
+        scan = scanner.ScanStream(args.root, p, old_entities, storage.load_manifest())
+        total = storage.save_scan(old_entities, scan, scan.manifest)
+    print(f"✅ Index synced: {total} entities ({scan.stats['reparsed']} files reparsed).")
+
+    watcher.watch(args.root, p, debounce=args.debounce, force_polling=args.poll)
+
 def cmd_intents(args):
+    from src import storage, intents
     print("📘 Parsing intents from docs/intents/...")
     p = intents.IntentParser()
     items = p.parse_all()
     
     # Validation: check if mapped entities exist
-    entities_map = storage.load_entities()
     valid_intents = []
-    
-    for intent in items:
-        missing = [e for e in intent.mapped_entities if e not in entities_map]
-        if missing:
-            print(f"⚠️  Intent '{intent.id}' maps to unknown entities: {missing}")
-        valid_intents.append(intent)
+    with storage.open_entities() as entities_map:
+        for intent in items:
+            missing = [e for e in intent.mapped_entities if e not in entities_map]
+            if missing:
+                print(f"⚠️  Intent '{intent.id}' maps to unknown entities: {missing}")
+            valid_intents.append(intent)
         
     storage.save_intents(valid_intents)
     print(f"✅ Saved {len(valid_intents)} intents.")
 
 def cmd_summarize(args):
+    from src import storage, parser, ai, cache
+    from src.schema import EntitySummary
     # Тільки для low confidence
-    entities_map = storage.load_entities()
-    entities = list(entities_map.values())
-    
-    to_process = [e for e in entities if e.confidence == "low"]
-    if not to_process:
-        print("Nothing to summarize (all entities have medium/high confidence).")
-        return
+    with storage.open_entities() as entities_map:
+        # Декодуються тільки low-сутності, решта записів лишається в сховищі як є
+        to_process = [entities_map[eid] for eid in storage.entity_ids(entities_map, confidence="low")]
+        if not to_process:
+            print("Nothing to summarize (all entities have medium/high confidence).")
+            return
+
+        concurrency = args.concurrency or config.LLM_CONCURRENCY
+        print(f"🧠 Generating AI summaries for {len(to_process)} entities (concurrency {concurrency})...")
+        engine = ai.AIEngine(load_embedder=False)
+        summary_cache = cache.SummaryCache()
+        cache_keys = {}
+
+        processed_count = 0
+        failed_count = 0
+        cached_count = 0
+        # Змінені з останнього checkpoint (SQLite пише тільки ці рядки)
+        pending = []
+
+        def sources():
+            nonlocal cached_count
+            # В entities.json коду немає (економія місця), тому вирізаємо тіло
+            # сутності з файлу за byte span; кожен файл відкривається один раз.
+            for e, code in parser.read_entity_sources(to_process):
+                if isinstance(code, Exception):
+                    print(f"Error reading {e.path}: {code}")
+                    continue
+
+                # Той самий код (навіть після переносу файлу) вже описаний -> без LLM
+                key = cache.SummaryCache.make_key(code, engine.llm.model_name, engine.llm.prompt_version)
+                cached = summary_cache.get(key)
+                if cached is not None:
+                    e.summary = EntitySummary(text=cached, source="llm")
+                    e.update_confidence()
+                    pending.append(e)
+                    cached_count += 1
+                    metrics.count("summarize.cache_hits")
+                    continue
+                metrics.count("summarize.cache_misses")
+                cache_keys[id(e)] = key
+                yield e, code
+
+        try:
+            # Результати приходять у порядку подачі, тож checkpoint завжди зберігає цілісний префікс
+            for e, summary_text, error in engine.generate_summaries(sources(), concurrency=concurrency):
+                if error is not None:
+                    # Сутність лишається low і буде оброблена наступним запуском
+                    print(f"Error summarizing {e.id}: {error}")
+                    failed_count += 1
+                    metrics.count("summarize.failed")
+                    continue
 
-    print(f"🧠 Generating AI summaries for {len(to_process)} entities...")
-    engine = ai.AIEngine(load_embedder=False)
-    
-    processed_count = 0
-    try:
-        # Тут треба читати сирий файл, щоб дати код LLM. 
-        # В entities.json коду немає (економія місця).
-        for e in to_process:
-            try:
-                with open(e.path, "r", encoding="utf-8") as f:
-                    code = f.read() # Спрощено, треба шукати по рядках
-                
-                summary_text = engine.generate_summary(code)
                 e.summary = EntitySummary(text=summary_text, source="llm")
                 e.update_confidence() # Стане medium
+                summary_cache.put(cache_keys.pop(id(e)), summary_text)
+                pending.append(e)
                 print(f"Processed {e.symbol}")
                 processed_count += 1
-                
+                metrics.count("summarize.processed")
+
                 if processed_count % 10 == 0:
-                    storage.save_entities(entities)
+                    with metrics.span("summarize.checkpoint", entities=len(pending)):
+                        storage.upsert_entities(entities_map, pending)
+                        pending.clear()
+                        summary_cache.save()
                     print(f"Saved progress ({processed_count}/{len(to_process)}).")
+        except KeyboardInterrupt:
+            print("\nInterrupted. Saving progress...")
+            storage.upsert_entities(entities_map, pending)
+            summary_cache.save()
+            sys.exit(0)
 
-            except Exception as ex:
-                print(f"Error reading {e.path}: {ex}")
-    except KeyboardInterrupt:
-        print("\nInterrupted. Saving progress...")
-        storage.save_entities(entities)
-        sys.exit(0)
-
-    storage.save_entities(entities)
-    print("✅ Summarization complete.")
-    print("\n--- Next Recommended Step ---")
-    print("Run 'code-indexer embed' to update the search index with these new descriptions.")
+        summary_cache.save()
+        if cached_count:
+            print(f"♻️  {cached_count} summaries reused from cache (no LLM call).")
+        if failed_count:
+            print(f"⚠️  {failed_count} entities failed and stay 'low'. Re-run 'summarize' to retry them.")
+        storage.upsert_entities(entities_map, pending)
+        print("✅ Summarization complete.")
+        print("\n--- Next Recommended Step ---")
+        print("Run 'code-indexer embed' to update the search index with these new descriptions.")
 
 def cmd_embed(args):
+    from src import storage, ai, search
     print("Geometry is everything. Embedding data...")
-    entities_map = storage.load_entities()
     intent_list = storage.load_intents()
-    
-    engine = ai.AIEngine(load_embedder=True)
+    engine = ai.AIEngine(load_embedder=False)
     
     ids = []
     texts = []
@@ -107,60 +184,461 @@ def cmd_embed(args):
         texts.append(f"Intent: {i.description}")
         
     # 2. Embed Entities (тільки важливе)
-    for e in entities_map.values():
-        if e.summary:
-            ids.append(e.id)
-            # Векторизуємо Responsibility або Summary
-            txt = e.responsibility if e.responsibility else e.summary.text
-            texts.append(f"Entity {e.symbol}: {txt}")
+    with storage.open_entities() as entities_map:
+        # Лексичний індекс бачить свіжі summary (після summarize), навіть якщо векторів не треба
+        with metrics.span("embed.lexical_index"):
+            storage.build_lexical_index(entities_map)
+        for rec in storage.iter_entity_records(entities_map):
+            if rec.get("summary"):
+                ids.append(rec["id"])
+                # Векторизуємо Responsibility або Summary
+                txt = rec.get("responsibility") or rec["summary"]["text"]
+                texts.append(f"Entity {rec['symbol']}: {txt}")
 
     if not texts:
         print("Nothing to embed.")
         return
 
-    matrix = engine.embed_texts(texts)
-    storage.save_embeddings(ids, matrix)
-    print(f"✅ Embedded {len(texts)} items.")
+    # 3. Перевикористовуємо вектори незмінених текстів з попереднього embed
+    identity = engine.embedder_identity()
+    hashes = [ai.text_hash(identity, t) for t in texts]
+    old_ids, old_matrix = storage.load_embeddings(mmap_mode="r")
+    old_hashes = storage.load_embeddings_meta().get("hashes", [])
+    reusable = {}
+    if old_matrix is not None and len(old_hashes) == len(old_matrix):
+        reusable = {h: row for row, h in enumerate(old_hashes)}
 
-def cmd_search(args):
-    ids, matrix = storage.load_embeddings()
+    reused = [i for i, h in enumerate(hashes) if h in reusable]
+    missing = [i for i, h in enumerate(hashes) if h not in reusable]
+    metrics.count("embed.reused", len(reused))
+    metrics.count("embed.encoded", len(missing))
+    if not missing and old_ids == ids:
+        print(f"✅ Index up to date ({len(ids)} items, nothing to re-encode).")
+        if _ann_wanted(len(ids)) and storage.load_ann_index(rows=len(ids)) is None:
+            build_ann_index(old_matrix)
+        if config.QUANT_METHOD != "none" and storage.load_quantized(rows=len(ids)) is None:
+            build_quantized(old_matrix, config.QUANT_METHOD)
+        return
+
+    # 4. Нова матриця пишеться у memory-mapped файл у порядку ids: перевикористані рядки
+    #    копіюються на свої місця, нові вектори кодуються частинами і розкладаються по своїх.
+    #    Пам'ять обмежена розміром частини, а не корпусу; незмінений корпус наступного
+    #    разу дає old_ids == ids (шлях "up to date" вище)
+    if missing:
+        workers = config.ONNX_WORKERS if args.workers is None else args.workers
+        # Процеси є сенс піднімати, лише якщо батчів вистачить на всіх
+        workers = min(workers or os.cpu_count() or 1, -(-len(missing) // config.EMBED_BATCH_SIZE))
+        with metrics.span("embed.load_model", workers=workers):
+            engine.load_embedder(workers=workers)
+            dim = engine.embedder.dimension()
+    else:
+        dim = old_matrix.shape[1]
+    matrix = storage.open_embeddings_output((len(texts), dim))
+
+    chunk = 4096
+    encode_rows = 16384  # нові вектори - частинами (буфер ~24 MiB при dim 384)
+    with metrics.span("embed.copy_reused", rows=len(reused)):
+        for start in range(0, len(reused), chunk):
+            rows = reused[start:start + chunk]
+            matrix[rows] = old_matrix[[reusable[hashes[i]] for i in rows]]
+    if missing:
+        try:
+            with metrics.span("embed.encode", texts=len(missing)):
+                for start in range(0, len(missing), encode_rows):
+                    rows = missing[start:start + encode_rows]
+                    batch = [texts[i] for i in rows]
+                    if rows[-1] - rows[0] + 1 == len(rows):
+                        # Суцільний діапазон (зокрема перший embed) - прямо у свій зріз
+                        engine.embed_texts(batch, out=matrix[rows[0]:rows[-1] + 1])
+                    else:
+                        matrix[rows] = engine.embed_texts(batch)
+        finally:
+            engine.close()
+
+    # Зберігаємо одиничні вектори: пошук - це просто dot product
+    with metrics.span("embed.normalize"):
+        search.normalize_rows(matrix)
+
+    with metrics.span("embed.save"):
+        storage.save_embeddings(ids, matrix, meta={"embedder": identity, "hashes": hashes, "normalized": True})
+    dropped = len(set(old_ids) - set(ids))
+    print(f"✅ Embedded {len(missing)} new/changed items, reused {len(reused)}, dropped {dropped}.")
+    if _ann_wanted(len(ids)):
+        build_ann_index(matrix)
+    if config.QUANT_METHOD != "none":
+        build_quantized(matrix, config.QUANT_METHOD)
+
+def _ann_wanted(rows: int) -> bool:
+    return config.ANN_ENABLED and rows >= config.ANN_MIN_SIZE
+
+def build_ann_index(matrix):
+    from src import storage, ann
+    start = time.time()
+    with metrics.span("ann.build"):
+        index = ann.IVFIndex.build(matrix, nlist=config.ANN_NLIST or None)
+        storage.save_ann_index(index)
+    print(f"🧭 ANN index: {index.nlist} lists over {index.rows} vectors ({time.time() - start:.1f}s).")
+
+def build_quantized(matrix, method, m=0):
+    from src import storage, quantize
+    start = time.time()
+    with metrics.span("quantize.build", method=method):
+        index = quantize.QuantizedIndex.build(matrix, method, m=m or config.QUANT_PQ_M,
+                                              alloc=storage.open_quant_codes_output)
+        storage.save_quantized(index)
+    print(f"🗜️  {method} codes: {index.nbytes / 2**20:.1f} MiB vs {matrix.nbytes / 2**20:.1f} MiB float32 "
+          f"({matrix.nbytes / index.nbytes:.1f}x smaller, {time.time() - start:.1f}s).")
+    return index
+
+def cmd_quantize(args):
+    import numpy as np
+    from src import storage, search
+    ids, matrix = storage.load_embeddings(mmap_mode="r")
     if matrix is None:
         print("Index empty. Run 'embed'.")
         return
+    if not storage.load_embeddings_meta().get("normalized"):
+        print("Embeddings are not normalized (built by an older version). Run 'embed' first.")
+        return
+    method = args.method or (config.QUANT_METHOD if config.QUANT_METHOD != "none" else "sq8")
+    index = build_quantized(matrix, method, m=args.m)
+
+    # Оцінка втрат: випадкові рядки як запити, сам рядок з результатів виключаємо
+    rng = np.random.default_rng(0)
+    queries = rng.choice(len(matrix), size=min(args.eval, len(matrix)), replace=False)
+    k = args.k
+    recall_codes = recall_rescored = 0.0
+    for row in queries:
+        q = np.asarray(matrix[row])
+        truth = set(search.top_k(matrix, q, k=k + 1)[0].tolist()) - {row}
+        codes = set(index.search(q, k=k + 1)[0].tolist()) - {row}
+        rescored = set(index.search(q, k=k + 1, matrix=matrix, rescore=config.QUANT_RESCORE)[0].tolist()) - {row}
+        recall_codes += len(truth & codes) / max(1, len(truth))
+        recall_rescored += len(truth & rescored) / max(1, len(truth))
+    print(f"recall@{k} over {len(queries)} queries: codes only {recall_codes / len(queries):.3f}, "
+          f"with exact rescoring (x{config.QUANT_RESCORE}) {recall_rescored / len(queries):.3f}")
+
+def cmd_quantize_model(args):
+    from src import ai
+    from src.providers import embed_onnx
+    model_dir = args.model or ai.AIEngine.embedder_source()
+    if not os.path.isdir(model_dir):
+        # Назва моделі з HF (torch) - беремо папку, куди її кладе download_onnx.py
+        model_dir = "models/all-MiniLM-L6-v2-onnx"
+    dst = os.path.join(model_dir, embed_onnx.QUANTIZED_MODEL)
+    if os.path.exists(dst) and not args.force:
+        print(f"{dst} already exists. Use --force to rebuild it.")
+        return
+    print(f"Quantizing {os.path.join(model_dir, embed_onnx.FP32_MODEL)} to int8 ({args.weight_type}"
+          f"{', per channel' if args.per_channel else ''})...")
+    try:
+        with metrics.span("quantize_model"):
+            dst = embed_onnx.quantize_model(model_dir, weight_type=args.weight_type, per_channel=args.per_channel)
+    except (ImportError, FileNotFoundError) as e:
+        print(f"❌ {e}")
+        return
+    fp32_size = os.path.getsize(os.path.join(model_dir, embed_onnx.FP32_MODEL))
+    print(f"✅ {dst}: {os.path.getsize(dst) / 2**20:.1f} MiB (fp32 {fp32_size / 2**20:.1f} MiB).")
+    # Повідомлення лише про те, що справді вантажить налаштований embedder (get_embedder)
+    source = ai.AIEngine.embedder_source()
+    loads_dir = (os.path.isdir(source) and os.path.abspath(source) == os.path.abspath(model_dir)
+                 and (config.PROVIDER == "onnx" or (config.PROVIDER == "auto" and embed_onnx.resolve_model_file(source))))
+    if not loads_dir:
+        print(f"The configured embedder ({config.PROVIDER}: {source}) does not load {model_dir}. To use the int8 model, "
+              f"set models.provider: onnx and models.embedding: {model_dir}.")
+    elif config.ONNX_MODEL_FILE == "auto":
+        print("The int8 model is now used by default (onnx.model_file: auto); the next 'embed' re-encodes all texts.")
+    else:
+        print(f"onnx.model_file is {config.ONNX_MODEL_FILE}; set it to auto or {embed_onnx.QUANTIZED_MODEL} to use the int8 model.")
+
+def cmd_search(args):
+    if args.shards:
+        cmd_search_shards(args)
+        return
+    if args.batch:
+        cmd_search_batch(args)
+        return
+    from src import client
+
+    # Якщо запущений 'serve' - модель і матриця вже в пам'яті демона
+    if not args.local:
+        with metrics.span("search.daemon"):
+            reply = client.search(config.INDEX_DIR, args.query, k=args.top_k, min_score=args.min_score,
+                                  nprobe=args.nprobe, exact=args.exact, mode=args.mode)
+        if reply is not None and "error" not in reply:
+            print(f"\n🔍 Results for: '{args.query}' (served in {reply['elapsed_ms']:.0f} ms)")
+            for r in reply["results"]:
+                print(f"[{r['score']:.4f}] {r['id']}")
+            return
+
+    from src.vector_index import Searcher
+    with metrics.span("search.load_index"):
+        index = Searcher()
+    if index.empty:
+        print("Index empty. Run 'scan' and 'embed'.")
+        return
         
-    engine = ai.AIEngine(load_embedder=True)
-    q_vec = engine.embed_texts([args.query])[0]
-    
-    # Cosine sim
-    norm_mat = np.linalg.norm(matrix, axis=1)
-    norm_q = np.linalg.norm(q_vec)
-    scores = np.dot(matrix, q_vec) / (norm_mat * norm_q)
-    
-    top_k = scores.argsort()[-5:][::-1]
+    # Лише лексичний пошук (ще немає ембедингів або --mode lexical) - модель не вантажимо
+    q_vec = None
+    if index.needs_embedding(args.mode):
+        from src import ai
+        with metrics.span("search.load_model"):
+            engine = ai.AIEngine(load_embedder=True)
+        with metrics.span("search.embed_query"):
+            q_vec = engine.embed_texts([args.query])[0]
+    found = index.query(args.query, q_vec, k=args.top_k, min_score=args.min_score,
+                        nprobe=args.nprobe, exact=args.exact, mode=args.mode)
     
     print(f"\n🔍 Results for: '{args.query}'")
-    for idx in top_k:
-        obj_id = ids[idx]
-        score = scores[idx]
-        print(f"[{score:.4f}] {obj_id}")
+    for eid, score in found:
+        print(f"[{score:.4f}] {eid}")
+
+def read_batch_queries(path):
+    """
+    Yields (id, query) from a text file or stdin ("-"): one query per line, or JSONL
+    with "query"/"text" (or "title" + "body", as in requests.jsonl) and an optional id.
+    JSON objects without any query text are skipped with a warning on stderr.
+    """
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line: continue
+            item = None
+            if line.startswith("{"):
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    pass
+            if not isinstance(item, dict):
+                yield n, line
+                continue
+            query = item.get("query") or item.get("text") or "\n".join(
+                x for x in (item.get("title"), item.get("body")) if x)
+            if not isinstance(query, str) or not query.strip():
+                print(f"⚠️  Line {n}: no query/text/title/body, skipped.", file=sys.stderr)
+                continue
+            yield item.get("id") or item.get("request_id") or n, query
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def cmd_search_batch(args, chunk=256):
+    """Streams one JSONL line per query to stdout; timings go to stderr."""
+    from src import client
+    start = time.time()
+    total = 0
+    options = dict(k=args.top_k, min_score=args.min_score, nprobe=args.nprobe, exact=args.exact, mode=args.mode)
+    index = engine = entities = None
+    load_time = 0.0
+    queries = read_batch_queries(args.batch)
+
+    while True:
+        batch = list(itertools.islice(queries, chunk))
+        if not batch: break
+        texts = [q for _, q in batch]
+
+        metrics.count("search.batch.queries", len(batch))
+        reply = None
+        if not args.local:
+            with metrics.span("search.daemon", queries=len(texts)):
+                reply = client.search_batch(config.INDEX_DIR, texts, **options)
+        if reply is not None and "error" not in reply:
+            hits = reply["results"]
+        else:
+            # Локально: модель і індекс вантажимо один раз на весь прогін
+            from src import storage
+            from src.vector_index import Searcher, result_record
+            if index is None:
+                load_start = time.time()
+                with metrics.span("search.load_index"):
+                    index = Searcher()
+                if index.empty:
+                    print("Index empty. Run 'scan' and 'embed'.", file=sys.stderr)
+                    return
+                if index.needs_embedding(args.mode):
+                    from src import ai
+                    with metrics.span("search.load_model"):
+                        engine = ai.AIEngine(load_embedder=True)
+                entities = storage.load_entities()
+                load_time = time.time() - load_start
+            q_vecs = None
+            if engine:
+                with metrics.span("search.embed_query", queries=len(texts)):
+                    q_vecs = engine.embed_texts(texts)
+            hits = [[result_record(entities, eid, s) for eid, s in found]
+                    for found in index.query_batch(texts, q_vecs, **options)]
+
+        for (qid, text), results in zip(batch, hits):
+            print(json.dumps({"id": qid, "query": text, "results": results}, ensure_ascii=False))
+        sys.stdout.flush()
+        total += len(batch)
+    if hasattr(entities, "close"):
+        entities.close()
+
+    elapsed = time.time() - start
+    per_query = f"{elapsed * 1000 / total:.2f} ms/query" if total else "n/a"
+    loading = f", model/index load {load_time:.2f}s" if load_time else ""
+    print(f"✅ {total} queries in {elapsed:.2f}s ({per_query}{loading})", file=sys.stderr)
+
+def cmd_search_shards(args, chunk=256):
+    """search --shards: every selected shard on a thread pool, top-k merged (local only, no daemon)."""
+    from src import shards
+    try:
+        catalog = shards.select(args.shards)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    if not catalog:
+        print("No shards registered. Add one with 'shards add NAME PATH'.")
+        return
+
+    start = time.time()
+    with metrics.span("search.load_index", shards=len(catalog)):
+        index = shards.ShardedSearcher(catalog)
+    try:
+        if index.empty:
+            print("All selected shards are empty. Run 'scan' and 'embed' in them.", file=sys.stderr)
+            return
+        engine = None
+        if index.needs_embedding(args.mode):
+            from src import ai
+            with metrics.span("search.load_model"):
+                engine = ai.AIEngine(load_embedder=True)
+            # Вектори шарду з іншої моделі не порівнянні із запитом - такий шард шукаємо лише лексично
+            identity = engine.embedder_identity()
+            for name, reason in index.use_query_model(identity, engine.embedder.dimension()).items():
+                fallback = "lexical only" if index.searchers[name].lexical is not None else "skipped (no lexical index)"
+                print(f"⚠️  Shard '{name}' {reason} (query model: {identity}): {fallback}. "
+                      f"Re-run 'embed' there to search it densely.", file=sys.stderr)
+        load_time = time.time() - start
+        options = dict(k=args.top_k, min_score=args.min_score, nprobe=args.nprobe, exact=args.exact, mode=args.mode)
+
+        def run(texts):
+            q_vecs = None
+            if engine:
+                with metrics.span("search.embed_query", queries=len(texts)):
+                    q_vecs = engine.embed_texts(texts)
+            return index.query_batch(texts, q_vecs, **options)
+
+        if not args.batch:
+            found = run([args.query])[0]
+            print(f"\n🔍 Results for: '{args.query}' ({len(catalog)} shards)")
+            for shard, eid, score in found:
+                print(f"[{score:.4f}] {shard}  {eid}")
+            return
+
+        # Як cmd_search_batch: JSONL у stdout, у кожному результаті - ще й ім'я шарду
+        queries = read_batch_queries(args.batch)
+        total = 0
+        while True:
+            batch = list(itertools.islice(queries, chunk))
+            if not batch: break
+            metrics.count("search.batch.queries", len(batch))
+            hits = run([q for _, q in batch])
+            for (qid, text), found in zip(batch, hits):
+                results = [index.record(shard, eid, score) for shard, eid, score in found]
+                print(json.dumps({"id": qid, "query": text, "results": results}, ensure_ascii=False))
+            sys.stdout.flush()
+            total += len(batch)
+        elapsed = time.time() - start
+        per_query = f"{(elapsed - load_time) * 1000 / total:.2f} ms/query" if total else "n/a"
+        print(f"✅ {total} queries over {len(catalog)} shards in {elapsed:.2f}s ({per_query}, load {load_time:.2f}s)",
+              file=sys.stderr)
+    finally:
+        index.close()
+
+def cmd_shards(args):
+    from src import shards
+    if args.action == "add":
+        if not args.name or not args.path:
+            print("Usage: shards add NAME PATH (a repository with an index, or the index dir itself)")
+            return
+        try:
+            index_dir = shards.add_shard(args.name, args.path)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        print(f"✅ Shard '{args.name}' -> {index_dir}")
+        return
+    if args.action == "remove":
+        if not args.name or not shards.remove_shard(args.name):
+            print(f"Unknown shard '{args.name}'.")
+            return
+        print(f"🗑️  Removed shard '{args.name}' (the index itself is untouched).")
+        return
+
+    catalog = shards.load_catalog()
+    if not catalog:
+        print("No shards registered. Add one with 'shards add NAME PATH'.")
+        return
+    print(f"{'Shard':<20} {'Entities':>9} {'Vectors':>9} {'Dim':>5}  {'Model':<28} Path")
+    models = set()
+    for name, entry in catalog.items():
+        info = shards.shard_info(entry["path"])
+        if not info["exists"]:
+            print(f"{name:<20} {'(missing)':>9} {'':>9} {'':>5}  {'':<28} {entry['path']}")
+            continue
+        if info["vectors"]:
+            models.add(info["embedder"])
+        print(f"{name:<20} {info['entities']:>9} {info['vectors']:>9} {info['dim'] or '-':>5}  "
+              f"{info['embedder'] or '-':<28} {entry['path']}")
+    if len(models) > 1:
+        print("⚠️  Shards use different embedding models; re-embed them with one model for dense search.")
+
+def cmd_serve(args):
+    from src import server
+    server.serve(host=args.host or config.SERVER_HOST, port=config.SERVER_PORT if args.port is None else args.port)
+
+def cmd_calls(args):
+    """'callers' / 'callees': entities reachable over call edges within --depth hops."""
+    from src import storage
+    with metrics.span("callgraph.load"):
+        graph = storage.load_call_graph()
+    if graph is None:
+        print("Call graph not found. Run 'scan'.")
+        return
+    matches = graph.find(args.id)
+    if not matches:
+        print(f"Unknown entity '{args.id}'.")
+        return
+    if len(matches) > 1:
+        print(f"'{args.id}' is ambiguous, pass one of:")
+        for eid in matches:
+            print(f"  {eid}")
+        return
+
+    reverse = args.cmd == "callers"
+    with metrics.span("callgraph.walk", depth=args.depth):
+        found = graph.walk(matches[0], depth=args.depth, reverse=reverse)
+    depth = "all" if args.depth <= 0 else args.depth
+    print(f"\n🔗 {'Callers' if reverse else 'Callees'} of {matches[0]} (depth {depth}): {len(found)}")
+    for eid, hops in found:
+        print(f"  {'  ' * (hops - 1)}[{hops}] {eid}")
 
 def cmd_status(args):
-    entities = storage.load_entities().values()
-    intents_list = storage.load_intents()
-    
-    counts = {"low": 0, "medium": 0, "high": 0}
-    for e in entities:
-        counts[e.confidence] += 1
+    from src import storage
+    # Лише агрегати з індексу сховища, записи сутностей не декодуються
+    counts = storage.entity_counts()
+    total = sum(counts.values())
+    intent_total = storage.intent_count()
         
     print("--- Code Index Status ---")
-    print(f"Intents: {len(intents_list)}")
-    print(f"Entities: {len(entities)}")
+    print(f"Intents: {intent_total}")
+    print(f"Entities: {total}")
     print(f"  High (Human):   {counts['high']}")
     print(f"  Medium (LLM):   {counts['medium']}")
     print(f"  Low (Raw):      {counts['low']}")
+
+    if os.path.exists(config.SUMMARY_CACHE_FILE):
+        from src import cache
+        sc = cache.SummaryCache()
+        lookups = sc.hits + sc.misses
+        rate = f"{sc.hits / lookups:.0%}" if lookups else "n/a"
+        print(f"Summary cache: {len(sc.entries)} entries, {sc.hits} hits / {sc.misses} misses (hit rate {rate})")
     
     print("\n--- Recommended Next Step ---")
-    if len(entities) == 0:
+    if total == 0:
         print("Run 'scan <path>' to index your codebase.")
     elif counts['low'] > 0:
         print(f"Run 'summarize' to analyze {counts['low']} new entities.")
@@ -170,25 +648,108 @@ def cmd_status(args):
     else:
         print("Index is up to date! Try 'search \"your query\"'.")
 
+def cmd_export(args):
+    from src import storage
+    out = args.out or config.ENTITIES_FILE
+    count = storage.export_entities_json(out)
+    print(f"✅ Exported {count} entities to {out}")
+
+def cmd_config(args):
+    if args.init:
+        created = config.write_default_config()
+        print(f"✅ Wrote defaults to {config.CONFIG_FILE}" if created else f"{config.CONFIG_FILE} already exists.")
+        return
+    state = "" if os.path.exists(config.CONFIG_FILE) else " (absent, using defaults; 'config --init' creates it)"
+    print(f"Config: {config.CONFIG_FILE}{state}")
+
 def main():
     parser = argparse.ArgumentParser(prog="code-indexer")
+    parser.add_argument("--metrics", metavar="FILE", help="Write per-stage timers, counters and histograms as JSON")
+    parser.add_argument("--trace", metavar="FILE", help="Write spans in Chrome trace format (chrome://tracing, Perfetto)")
     sub = parser.add_subparsers(dest="cmd", required=True)
     
-    sub.add_parser("scan").add_argument("root")
+    scan_p = sub.add_parser("scan")
+    scan_p.add_argument("root")
+    scan_p.add_argument("-j", "--jobs", type=int, default=1, help="Parallel parser processes (0 = all cores)")
+    watch_p = sub.add_parser("watch")
+    watch_p.add_argument("root")
+    watch_p.add_argument("--debounce", type=float, default=0.5, help="Seconds of quiet before a batch of changes is indexed")
+    watch_p.add_argument("--poll", action="store_true", help="Use polling instead of inotify")
     sub.add_parser("intents")
-    sub.add_parser("summarize") # --llm assumed
-    sub.add_parser("embed")
-    sub.add_parser("search").add_argument("query")
+    summarize_p = sub.add_parser("summarize") # --llm assumed
+    summarize_p.add_argument("-c", "--concurrency", type=int, default=None, help="Parallel Ollama requests (default: llm.concurrency from config)")
+    embed_p = sub.add_parser("embed")
+    embed_p.add_argument("-w", "--workers", type=int, default=None,
+                         help="ONNX sessions in worker processes (default: onnx.workers from config; 0 = all cores)")
+    search_p = sub.add_parser("search")
+    search_p.add_argument("query", nargs="?")
+    search_p.add_argument("--batch", metavar="FILE", help="Queries from FILE or '-' (lines or JSONL); writes JSONL results")
+    search_p.add_argument("-k", "--top-k", type=int, default=5, help="Number of results")
+    search_p.add_argument("--min-score", type=float, default=None,
+                          help="Drop dense candidates below this cosine score. In hybrid mode it applies "
+                          "before fusion (lexical hits are not filtered, printed scores are RRF); ignored in lexical mode")
+    search_p.add_argument("--nprobe", type=int, default=None, help="IVF lists to scan (default: ann.nprobe from config)")
+    search_p.add_argument("--exact", action="store_true", help="Ignore the ANN index and quantized codes, scan every vector")
+    search_p.add_argument("--local", action="store_true", help="Do not use a running 'serve' daemon")
+    search_p.add_argument("--mode", choices=config.SEARCH_MODES, default=None,
+                          help="hybrid (vectors + BM25, fused), dense or lexical (default: search.mode from config)")
+    search_p.add_argument("--shards", metavar="NAMES", default=None,
+                          help="Search registered shards instead of the local index: 'all' or a comma-separated list")
+    shards_p = sub.add_parser("shards")
+    shards_p.add_argument("action", nargs="?", choices=("list", "add", "remove"), default="list")
+    shards_p.add_argument("name", nargs="?")
+    shards_p.add_argument("path", nargs="?", help="add: repository root or index dir")
+    qmodel_p = sub.add_parser("quantize-model")
+    qmodel_p.add_argument("--model", default=None, help="ONNX model dir (default: the configured embedding model)")
+    qmodel_p.add_argument("--weight-type", choices=("qint8", "quint8"), default="qint8", help="int8 type of the weights")
+    qmodel_p.add_argument("--per-channel", action="store_true", help="One scale per output channel (more accurate, slower to build)")
+    qmodel_p.add_argument("--force", action="store_true", help="Overwrite an existing model.int8.onnx")
+    serve_p = sub.add_parser("serve")
+    serve_p.add_argument("--host", default=None, help="Bind address (default: server.host from config)")
+    serve_p.add_argument("--port", type=int, default=None, help="Port (default: server.port from config; 0 = any free port)")
+    quantize_p = sub.add_parser("quantize")
+    quantize_p.add_argument("--method", choices=config.QUANT_METHODS, default=None,
+                            help="sq8 (4x smaller) or pq (~16x smaller); default: quantize.method or sq8")
+    quantize_p.add_argument("--m", type=int, default=0, help="pq subspaces (default: quantize.pq_m or dim / 4)")
+    quantize_p.add_argument("-k", type=int, default=10, help="k for the reported recall@k")
+    quantize_p.add_argument("--eval", type=int, default=200, help="Sample queries for the recall estimate")
+    for name in ("callers", "callees"):
+        calls_p = sub.add_parser(name)
+        calls_p.add_argument("id", help="Entity id (path:symbol) or a unique symbol name")
+        calls_p.add_argument("--depth", type=int, default=1, help="Hops to follow (0 = no limit)")
     sub.add_parser("status")
+    sub.add_parser("config").add_argument("--init", action="store_true", help="Write the default config file if it does not exist")
+    sub.add_parser("export").add_argument("--out", default=None, help="Output JSON file (default: .code-index/entities.json)")
     
     args = parser.parse_args()
+    if args.cmd == "search" and not args.query and not args.batch:
+        search_p.error("a query or --batch FILE is required")
     
-    if args.cmd == "scan": cmd_scan(args)
-    elif args.cmd == "intents": cmd_intents(args)
-    elif args.cmd == "summarize": cmd_summarize(args)
-    elif args.cmd == "embed": cmd_embed(args)
-    elif args.cmd == "search": cmd_search(args)
-    elif args.cmd == "status": cmd_status(args)
+    if args.metrics or args.trace:
+        metrics.enable(trace=bool(args.trace))
+    try:
+        # Спан на всю команду; етапи всередині звітують свої
+        with metrics.span(f"cmd.{args.cmd}"):
+            if args.cmd == "scan": cmd_scan(args)
+            elif args.cmd == "watch": cmd_watch(args)
+            elif args.cmd == "intents": cmd_intents(args)
+            elif args.cmd == "summarize": cmd_summarize(args)
+            elif args.cmd == "embed": cmd_embed(args)
+            elif args.cmd == "search": cmd_search(args)
+            elif args.cmd == "quantize": cmd_quantize(args)
+            elif args.cmd == "quantize-model": cmd_quantize_model(args)
+            elif args.cmd == "serve": cmd_serve(args)
+            elif args.cmd == "shards": cmd_shards(args)
+            elif args.cmd in ("callers", "callees"): cmd_calls(args)
+            elif args.cmd == "status": cmd_status(args)
+            elif args.cmd == "export": cmd_export(args)
+            elif args.cmd == "config": cmd_config(args)
+    finally:
+        # І при Ctrl+C / sys.exit: частковий прогін теж варто проаналізувати
+        if args.metrics:
+            metrics.write(args.metrics, command=args.cmd, argv=sys.argv[1:])
+        if args.trace:
+            metrics.write_trace(args.trace)
 
 if __name__ == "__main__":
     main()
@@ -3,42 +3,79 @@ import os
 import json
 import numpy as np
 import time
+from src.search import top_k, row_norms
+from src.ann import IVFIndex
+from src.quantize import QuantizedIndex
+from src.lexical import LexicalIndex, hybrid_rank
+from src import client
+from src.providers.embed_onnx import resolve_model_file
 
 # Спрощена конфігурація
 INDEX_DIR = ".code-index"
 EMBEDDINGS_FILE = os.path.join(INDEX_DIR, "embeddings.npy")
 IDS_FILE = os.path.join(INDEX_DIR, "ids.json")
+EMBEDDINGS_META_FILE = os.path.join(INDEX_DIR, "embeddings_meta.json")
+ANN_FILE = os.path.join(INDEX_DIR, "ann_ivf.npz")
+QUANT_FILE = os.path.join(INDEX_DIR, "embeddings_quant.npz")
+QUANT_CODES_FILE = os.path.join(INDEX_DIR, "embeddings_codes.npy")
+LEXICAL_FILE = os.path.join(INDEX_DIR, "lexical.npz")
 ENTITIES_FILE = os.path.join(INDEX_DIR, "entities.json")
 
 def load_index():
-    if not os.path.exists(EMBEDDINGS_FILE):
+    # Досить або embeddings.npy, або квантизованих кодів (менше копіювати на телефон)
+    # Без векторів лишається лексичний пошук (lexical.npz)
+    has_codes = os.path.exists(QUANT_FILE) and os.path.exists(QUANT_CODES_FILE)
+    if not os.path.exists(IDS_FILE) or not (os.path.exists(EMBEDDINGS_FILE) or has_codes):
+        if os.path.exists(LEXICAL_FILE):
+            return [], None, None
         print(f"Error: Index not found at {INDEX_DIR}")
         print("Please copy the '.code-index' folder from your desktop to this directory.")
         exit(1)
         
     print("Loading index...", end=" ", flush=True)
     start = time.time()
-    matrix = np.load(EMBEDDINGS_FILE)
     with open(IDS_FILE, "r") as f:
         ids = json.load(f)
+    # mmap: на телефоні не копіюємо всю матрицю в RAM
+    matrix = np.load(EMBEDDINGS_FILE, mmap_mode="r") if os.path.exists(EMBEDDINGS_FILE) else None
+    normalized = False
+    if os.path.exists(EMBEDDINGS_META_FILE):
+        with open(EMBEDDINGS_META_FILE, "r") as f:
+            normalized = json.load(f).get("normalized", False)
+    norms = None if normalized or matrix is None else row_norms(matrix)
     print(f"Done ({time.time() - start:.2f}s)")
-    return ids, matrix
+    return ids, matrix, norms
 
 def load_entities_map():
+    # Бінарне сховище: читаємо тільки ті записи, які показуємо (без Pydantic)
+    if os.path.exists(os.path.join(INDEX_DIR, "entities.idx")):
+        from src.entity_store import EntityStore
+        store = EntityStore(INDEX_DIR)
+        return RecordMap(store)
     if not os.path.exists(ENTITIES_FILE): return {}
     with open(ENTITIES_FILE, "r") as f:
         data = json.load(f)
     # Повертаємо map {id: entity} (спрощено, без Pydantic)
     return {item["id"]: item for item in data}
 
+class RecordMap:
+    """dict-like .get() over EntityStore that returns plain records."""
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, obj_id, default=None):
+        return self.store.get_record(obj_id, default)
+
 class OnnxEmbedder:
     def __init__(self, model_dir):
         import onnxruntime as ort
         from transformers import AutoTokenizer
         
-        print(f"Loading ONNX model from {model_dir}...")
+        # model.int8.onnx ('quantize-model') швидший на телефоні; інакше fp32 model.onnx
+        model_file = resolve_model_file(model_dir) or os.path.join(model_dir, "model.onnx")
+        print(f"Loading ONNX model from {model_dir} ({os.path.basename(model_file)})...")
         self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
-        self.session = ort.InferenceSession(os.path.join(model_dir, "model.onnx"), providers=["CPUExecutionProvider"])
+        self.session = ort.InferenceSession(model_file, providers=["CPUExecutionProvider"])
 
     def encode(self, text):
         inputs = self.tokenizer([text], padding=True, truncation=True, return_tensors="np")
@@ -61,36 +98,83 @@ def main():
     parser = argparse.ArgumentParser(description="Lightweight Code Search")
     parser.add_argument("query", help="Search query")
     parser.add_argument("--model", default="models/all-MiniLM-L6-v2-onnx", help="Path to ONNX model")
+    parser.add_argument("-k", "--top-k", type=int, default=5, help="Number of results")
+    parser.add_argument("--min-score", type=float, default=None,
+                        help="Drop dense candidates below this cosine score (hybrid: before fusion, lexical hits are kept)")
+    parser.add_argument("--nprobe", type=int, default=32, help="IVF lists to scan when an ANN index exists")
+    parser.add_argument("--exact", action="store_true", help="Ignore the ANN index and quantized codes, scan every vector")
+    parser.add_argument("--rescore", type=int, default=10, help="Quantized search: rescore k * N candidates exactly")
+    parser.add_argument("--local", action="store_true", help="Do not use a running 'serve' daemon")
+    parser.add_argument("--mode", choices=("hybrid", "dense", "lexical"), default="hybrid",
+                        help="hybrid (vectors + BM25, fused), dense or lexical")
     args = parser.parse_args()
 
+    # 0. Демон 'serve' вже тримає модель і індекс у пам'яті
+    if not args.local:
+        reply = client.search(INDEX_DIR, args.query, k=args.top_k, min_score=args.min_score,
+                              nprobe=args.nprobe, exact=args.exact, mode=args.mode)
+        if reply is not None and "error" not in reply:
+            print(f"\nSearching for: '{args.query}' (served in {reply['elapsed_ms']:.0f} ms)")
+            print("\n--- Results ---")
+            for r in reply["results"]:
+                print_result(r["score"], r["symbol"] or r["id"], r["path"] or "unknown", r["summary"])
+            return
+
     # 1. Load Data
-    ids, matrix = load_index()
+    ids, matrix, norms = load_index()
+    qindex = None
+    if ids and norms is None and (matrix is None or not args.exact):
+        qindex = QuantizedIndex.load(QUANT_FILE, QUANT_CODES_FILE, rows=len(ids))
+    if ids and matrix is None and qindex is None:
+        print(f"Error: quantized codes in {INDEX_DIR} do not match ids.json")
+        exit(1)
+    index = None
+    if matrix is not None and qindex is None and norms is None and not args.exact:
+        index = IVFIndex.load(ANN_FILE, rows=len(matrix))
+    lexical = LexicalIndex.load(LEXICAL_FILE)
     entities = load_entities_map()
 
-    # 2. Load Model
-    try:
-        embedder = OnnxEmbedder(args.model)
-    except Exception as e:
-        print(f"\nError loading model: {e}")
-        print(f"Make sure the model exists at: {args.model}")
-        return
+    mode = args.mode
+    if not ids: mode = "lexical"
+    elif lexical is None: mode = "dense"
+
+    # 2. Load Model (не потрібна для лексичного пошуку)
+    embedder = None
+    if mode != "lexical":
+        try:
+            embedder = OnnxEmbedder(args.model)
+        except Exception as e:
+            print(f"\nError loading model: {e}")
+            if lexical is None:
+                print(f"Make sure the model exists at: {args.model}")
+                return
+            print("Falling back to lexical search.")
+            mode = "lexical"
 
     # 3. Search
     print(f"\nSearching for: '{args.query}'")
-    q_vec = embedder.encode(args.query)
-    
-    # Cosine Similarity
-    norm_mat = np.linalg.norm(matrix, axis=1)
-    norm_q = np.linalg.norm(q_vec)
-    scores = np.dot(matrix, q_vec) / (norm_mat * norm_q)
-    
-    top_k = scores.argsort()[-5:][::-1]
+    found = []
+    if mode != "lexical":
+        q_vec = embedder.encode(args.query)
+        n = args.top_k if mode == "dense" else max(args.top_k, 50)
+        # Cosine Similarity: dot product одиничних векторів + argpartition
+        if qindex is not None:
+            top_idx, scores = qindex.search(q_vec, k=n, min_score=args.min_score, matrix=matrix, rescore=args.rescore)
+        elif index is not None:
+            top_idx, scores = index.search(matrix, q_vec, k=n, nprobe=args.nprobe, min_score=args.min_score)
+        else:
+            top_idx, scores = top_k(matrix, q_vec, k=n, min_score=args.min_score, norms=norms)
+        found = [(ids[i], float(s)) for i, s in zip(top_idx, scores)]
+    if mode == "lexical":
+        lex_ids, lex_scores = lexical.search(args.query, args.top_k)
+        found = list(zip(lex_ids, lex_scores))
+    elif mode == "hybrid":
+        # Злиття рангів (RRF) з BM25 по symbol/шляху/summary
+        found = hybrid_rank(args.query, [eid for eid, _ in found], lexical.search(args.query, n)[0], k=args.top_k)
     
     print("\n--- Results ---")
-    for idx in top_k:
-        obj_id = ids[idx]
-        score = scores[idx]
-        entity = entities.get(obj_id, {{}})
+    for obj_id, score in found:
+        entity = entities.get(obj_id, {})
         
         path = entity.get('path', 'unknown')
         symbol = entity.get('symbol', obj_id)
@@ -101,11 +185,13 @@ def main():
             summary = entity['summary'].get('text', '')
         elif 'responsibility' in entity:
             summary = entity['responsibility']
-            
-        print(f"\n[{score:.4f}] {symbol}")
-        print(f"  File: {path}")
-        if summary:
-            print(f"  Desc: {summary}")
+        print_result(score, symbol, path, summary)
+
+def print_result(score, symbol, path, summary):
+    print(f"\n[{score:.4f}] {symbol}")
+    print(f"  File: {path}")
+    if summary:
+        print(f"  Desc: {summary}")
 
 if __name__ == "__main__":
     main()
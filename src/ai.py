@@ -1,31 +1,108 @@
-from typing import List
-from .config import EMBEDDING_MODEL, OLLAMA_MODEL, PROVIDER
+import os
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+from .config import EMBEDDING_MODEL, EMBED_BATCH_SIZE, ONNX_EMBEDDER_OPTIONS, ONNX_MODEL_FILE, OLLAMA_MODEL, PROVIDER, LLM_HOST, LLM_TIMEOUT, LLM_RETRIES
 from .providers import get_embedder, get_llm
 
+def text_hash(embedder_identity: str, text: str) -> str:
+    """Key of an embedded text: the same text under another model must be re-encoded."""
+    return hashlib.blake2b(f"{embedder_identity}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+
 class AIEngine:
     def __init__(self, load_embedder=False):
         self.embedder = None
-        self.llm = get_llm("ollama", OLLAMA_MODEL)
+        self.llm = get_llm("ollama", OLLAMA_MODEL, host=LLM_HOST, timeout=LLM_TIMEOUT, retries=LLM_RETRIES)
         
         if load_embedder:
-            # Визначаємо шлях до моделі для ONNX
-            # Якщо PROVIDER="onnx", то EMBEDDING_MODEL має вказувати на папку
-            # Або ми можемо хардкодити дефолтний шлях експорту, якщо це "auto" і "torch" назва
-            
-            model_source = EMBEDDING_MODEL
-            
-            # Якщо користувач хоче ONNX, але вказав назву з HF, спробуємо знайти локальну папку
-            if PROVIDER == "onnx" or (PROVIDER == "auto" and "sentence-transformers" in model_source):
-                 potential_onnx_path = "models/all-MiniLM-L6-v2-onnx"
-                 if os.path.exists(potential_onnx_path):
-                     model_source = potential_onnx_path
-
-            self.embedder = get_embedder(PROVIDER, model_source)
+            self.load_embedder()
+
+    @staticmethod
+    def embedder_source() -> str:
+        """Model name or local model dir the embedder is loaded from."""
+        # Визначаємо шлях до моделі для ONNX
+        # Якщо PROVIDER="onnx", то EMBEDDING_MODEL має вказувати на папку
+        # Або ми можемо хардкодити дефолтний шлях експорту, якщо це "auto" і "torch" назва
+        
+        model_source = EMBEDDING_MODEL
+        
+        # Якщо користувач хоче ONNX, але вказав назву з HF, спробуємо знайти локальну папку
+        if PROVIDER == "onnx" or (PROVIDER == "auto" and "sentence-transformers" in model_source):
+             potential_onnx_path = "models/all-MiniLM-L6-v2-onnx"
+             if os.path.exists(potential_onnx_path):
+                 model_source = potential_onnx_path
+        return model_source
+
+    def embedder_identity(self) -> str:
+        """Identifies the embedding model without loading it (used as part of vector cache keys)."""
+        source = self.embedder_source()
+        if not os.path.isdir(source):
+            return f"{PROVIDER}:{source}"
+        source = os.path.abspath(source)
+        identity = f"{PROVIDER}:{source}"
+        # int8-модель дає інші вектори, тож і інший ключ; fp32 model.onnx - без суфікса, як і раніше
+        if PROVIDER in ("onnx", "auto"):
+            from .providers.embed_onnx import resolve_model_file, FP32_MODEL
+            onnx_file = resolve_model_file(source, ONNX_MODEL_FILE)
+            if onnx_file and os.path.basename(onnx_file) != FP32_MODEL:
+                identity += f":{os.path.basename(onnx_file)}"
+        return identity
+
+    def load_embedder(self, workers: int = 1):
+        """workers > 1: ONNX sessions in worker processes (for bulk 'embed'; queries use one)."""
+        if self.embedder is None:
+            self.embedder = get_embedder(PROVIDER, self.embedder_source(), batch_size=EMBED_BATCH_SIZE,
+                                         onnx_options=ONNX_EMBEDDER_OPTIONS, workers=workers)
+        return self.embedder
+
+    def close(self):
+        if self.embedder is not None:
+            self.embedder.close()
+            self.embedder = None
 
     def generate_summary(self, code_snippet: str) -> str:
         return self.llm.generate_summary(code_snippet)
 
-    def embed_texts(self, texts: List[str]):
+    def generate_summaries(self, items: Iterable[Tuple[object, str]], concurrency: int = 1):
+        """
+        Summarizes (key, code) pairs with at most `concurrency` requests in flight.
+        Yields (key, summary, error) in input order, so callers can checkpoint
+        a consistent prefix. Items are pulled lazily from the iterable.
+        """
+        if concurrency <= 1:
+            for key, code in items:
+                try:
+                    yield key, self.generate_summary(code), None
+                except Exception as e:
+                    yield key, None, e
+            return
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            # Вікно трохи більше за кількість воркерів, щоб повільний запит
+            # на початку черги не простоював інші потоки
+            window = deque()
+            try:
+                for key, code in items:
+                    window.append((key, pool.submit(self.generate_summary, code)))
+                    if len(window) >= concurrency * 2:
+                        yield self._collect(*window.popleft())
+                while window:
+                    yield self._collect(*window.popleft())
+            finally:
+                # Ctrl+C / close(): не запускаємо запити, які ще в черзі
+                for _, future in window:
+                    future.cancel()
+
+    @staticmethod
+    def _collect(key, future):
+        try:
+            return key, future.result(), None
+        except Exception as e:
+            return key, None, e
+
+    def embed_texts(self, texts: List[str], out=None):
+        """out: optional preallocated (n, dim) array, e.g. a slice of a memory-mapped matrix."""
         if not self.embedder:
             raise ValueError("Embedder not loaded")
-        return self.embedder.encode(texts)
\ No newline at end of file
+        return self.embedder.encode(texts, out=out)
\ No newline at end of file
@@ -0,0 +1,106 @@
+import os
+import numpy as np
+from typing import Optional
+from .search import normalize, select_top_k
+
+# IVF-flat ANN-індекс на чистому NumPy (без config/pydantic, як і search.py).
+# Одиничні вектори кластеризуються spherical k-means на nlist центроїдів;
+# запит порівнюється з центроїдами, і точний cosine рахується лише для
+# рядків з nprobe найближчих списків. Самі вектори не копіюються -
+# індекс зберігає тільки центроїди і списки номерів рядків (CSR).
+
+FORMAT_VERSION = 1
+
+def default_nlist(n: int) -> int:
+    return max(1, int(round(2 * np.sqrt(n))))
+
+def assign(data: np.ndarray, centroids: np.ndarray, chunk: int = 16384) -> np.ndarray:
+    """Nearest centroid (max dot product) per row, chunk by chunk."""
+    labels = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), chunk):
+        labels[start:start + chunk] = np.argmax(data[start:start + chunk] @ centroids.T, axis=1)
+    return labels
+
+def train_centroids(matrix: np.ndarray, nlist: int, iters: int = 10, sample: Optional[int] = None, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a random sample of unit rows. Returns unit centroids (nlist x dim)."""
+    rng = np.random.default_rng(seed)
+    n = len(matrix)
+    size = min(n, sample or nlist * 64)
+    rows = np.sort(rng.choice(n, size=size, replace=False))
+    data = np.asarray(matrix[rows], dtype=np.float32)
+    centroids = data[rng.choice(size, nlist, replace=False)].copy()
+
+    for _ in range(iters):
+        labels = assign(data, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        present = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+        sums = np.zeros_like(centroids)
+        sums[present] = np.add.reduceat(data[order], starts, axis=0)
+        # Порожні кластери переініціалізуємо випадковими точками вибірки
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = data[rng.choice(size, int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+class IVFIndex:
+    """Inverted-file index over the rows of a unit-normalized matrix."""
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.order = order        # номери рядків, згруповані за списками
+        self.offsets = offsets    # список i = order[offsets[i]:offsets[i + 1]]
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def rows(self) -> int:
+        return len(self.order)
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, nlist: Optional[int] = None, iters: int = 10, seed: int = 0) -> "IVFIndex":
+        nlist = min(nlist or default_nlist(len(matrix)), len(matrix))
+        centroids = train_centroids(matrix, nlist, iters=iters, seed=seed)
+        labels = assign(matrix, centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=nlist), out=offsets[1:])
+        return cls(centroids, order, offsets)
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=FORMAT_VERSION, centroids=self.centroids, order=self.order, offsets=self.offsets)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, rows: Optional[int] = None) -> Optional["IVFIndex"]:
+        """Returns None if there is no index or it does not match a matrix of `rows` rows."""
+        if not os.path.exists(path): return None
+        with np.load(path) as data:
+            if int(data["version"]) != FORMAT_VERSION: return None
+            index = cls(data["centroids"], data["order"], data["offsets"])
+        if rows is not None and index.rows != rows: return None
+        return index
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row numbers from the nprobe lists closest to the (unit) query, sorted for mmap locality."""
+        nprobe = min(nprobe, self.nlist)
+        sims = self.centroids @ query
+        lists = np.argpartition(sims, self.nlist - nprobe)[self.nlist - nprobe:]
+        parts = [self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int = 5, nprobe: int = 8, min_score=None):
+        """Approximate cosine top-k. Exact when nprobe covers every list. Returns (indices, scores)."""
+        q = normalize(query).astype(matrix.dtype, copy=False)
+        if nprobe >= self.nlist:
+            return select_top_k(matrix @ q, k, min_score)
+        cand = self.candidates(q, nprobe)
+        idx, scores = select_top_k(matrix[cand] @ q, k, min_score)
+        return cand[idx], scores
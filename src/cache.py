@@ -0,0 +1,71 @@
+import os
+import json
+import hashlib
+import textwrap
+from collections import OrderedDict
+from typing import Optional
+from .config import SUMMARY_CACHE_FILE, SUMMARY_CACHE_MAX_ENTRIES
+
+def normalize_code(code: str) -> str:
+    """Drops indentation level, trailing whitespace and blank lines, so moved code hashes the same."""
+    # Тіло вирізане від start byte: перший рядок без відступу, тож dedent-имо лише решту
+    first, _, rest = code.partition("\n")
+    lines = [line.rstrip() for line in [first.strip()] + textwrap.dedent(rest).splitlines()]
+    return "\n".join(line for line in lines if line)
+
+class SummaryCache:
+    """
+    Content-addressed LLM summary cache with LRU eviction.
+    Key = hash(normalized body + model + prompt version), so summaries
+    survive file moves and directory renames.
+    """
+
+    def __init__(self, path: str = SUMMARY_CACHE_FILE, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @staticmethod
+    def make_key(code: str, model: str, prompt_version) -> str:
+        h = hashlib.sha256()
+        h.update(f"{model}\0{prompt_version}\0".encode("utf-8"))
+        h.update(normalize_code(code).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        text = self.entries.get(key)
+        if text is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        self.entries[key] = text
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _load(self):
+        if not os.path.exists(self.path): return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Записи збережені від найстарішого до найновішого (порядок LRU)
+        self.entries = OrderedDict(data.get("entries", []))
+        self.hits = data.get("stats", {}).get("hits", 0)
+        self.misses = data.get("stats", {}).get("misses", 0)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": 1,
+                "stats": {"hits": self.hits, "misses": self.misses},
+                "entries": list(self.entries.items()),
+            }, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
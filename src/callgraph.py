@@ -0,0 +1,153 @@
+import os
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+from .lexical import pack_strings, PackedStrings
+
+# Граф викликів між сутностями. Парсер пише в entity.calls імена викликаних
+# функцій як вони записані в коді; тут вони резолвляться в сутності таблицею
+# символів, один раз на scan. Граф зберігається як CSR (offsets + targets, int32)
+# в обидва боки: callees[i] = targets[offsets[i]:offsets[i + 1]], callers - так само
+# по зворотних масивах. Вершини - індекси сутностей, id лежать поруч як utf-8 blob.
+
+FORMAT_VERSION = 1
+AMBIGUOUS_LIMIT = 8  # ім'я, визначене в більшій кількості місць, без підказки (файл/пакет) не резолвимо
+
+class SymbolTable:
+    """symbol -> entity indices, narrowed to the caller's file, then its directory (package)."""
+
+    def __init__(self):
+        self.by_symbol: Dict[str, List[int]] = {}
+        self.paths: List[str] = []
+
+    def add(self, symbol: str, path: str) -> int:
+        idx = len(self.paths)
+        self.paths.append(path)
+        self.by_symbol.setdefault(symbol, []).append(idx)
+        return idx
+
+    def resolve(self, name: str, path: str) -> List[int]:
+        candidates = self.by_symbol.get(name)
+        if not candidates: return []
+        if len(candidates) == 1: return candidates
+        same_file = [c for c in candidates if self.paths[c] == path]
+        if same_file: return same_file
+        folder = os.path.dirname(path)
+        same_dir = [c for c in candidates if os.path.dirname(self.paths[c]) == folder]
+        if same_dir: return same_dir
+        return candidates if len(candidates) <= AMBIGUOUS_LIMIT else []
+
+def _csr(src: np.ndarray, dst: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(src, kind="stable")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+    return offsets, dst[order].astype(np.int32)
+
+def _gather(offsets: np.ndarray, targets: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """Concatenated neighbour lists of `nodes`, without a Python loop over them."""
+    starts = offsets[nodes]
+    counts = offsets[nodes + 1] - starts
+    total = int(counts.sum())
+    if not total: return np.empty(0, dtype=targets.dtype)
+    # позиція p у виході -> starts[j] + (p - початок j-го списку у виході)
+    shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return targets[np.arange(total) + shift]
+
+class CallGraph:
+    """Who calls whom, as forward and reverse CSR adjacency over entity indices."""
+
+    def __init__(self, ids, offsets: np.ndarray, targets: np.ndarray, rev_offsets: np.ndarray, rev_targets: np.ndarray):
+        self.ids = ids
+        self.offsets = offsets
+        self.targets = targets
+        self.rev_offsets = rev_offsets
+        self.rev_targets = rev_targets
+        self._index: Optional[Dict[str, int]] = None
+
+    @property
+    def edges(self) -> int:
+        return len(self.targets)
+
+    @classmethod
+    def build(cls, records: Iterable[dict]) -> "CallGraph":
+        """records: entity dicts with id, symbol, path and calls (callee names)."""
+        table = SymbolTable()
+        ids: List[str] = []
+        calls: List[Tuple[str, List[str]]] = []
+        for rec in records:
+            table.add(rec["symbol"], rec["path"])
+            ids.append(rec["id"])
+            calls.append((rec["path"], rec.get("calls") or []))
+
+        src: List[int] = []
+        dst: List[int] = []
+        for caller, (path, names) in enumerate(calls):
+            for name in names:
+                for callee in table.resolve(name, path):
+                    # Рекурсію не показуємо як ребро
+                    if callee != caller:
+                        src.append(caller)
+                        dst.append(callee)
+
+        n = len(ids)
+        # Дублікати (кілька імен резолвляться в ту саму сутність) прибираємо
+        keys = np.unique(np.asarray(src, dtype=np.int64) * max(n, 1) + np.asarray(dst, dtype=np.int64))
+        src_arr, dst_arr = keys // max(n, 1), keys % max(n, 1)
+        offsets, targets = _csr(src_arr, dst_arr, n)
+        rev_offsets, rev_targets = _csr(dst_arr, src_arr, n)
+        return cls(ids, offsets, targets, rev_offsets, rev_targets)
+
+    def index(self, eid: str) -> Optional[int]:
+        if self._index is None:
+            self._index = {eid: i for i, eid in enumerate(self.ids)}
+        return self._index.get(eid)
+
+    def find(self, query: str) -> List[str]:
+        """Ids matching an exact id, else a bare symbol name ('load_embeddings')."""
+        if self.index(query) is not None: return [query]
+        return [eid for eid in self.ids if eid.rsplit(":", 1)[-1] == query]
+
+    def walk(self, eid: str, depth: int = 1, reverse: bool = False) -> List[Tuple[str, int]]:
+        """
+        Entities reachable from eid within `depth` hops (0 = no limit), as (id, hops),
+        nearest first. reverse=True follows edges backwards (callers).
+        """
+        start = self.index(eid)
+        if start is None: return []
+        offsets, targets = (self.rev_offsets, self.rev_targets) if reverse else (self.offsets, self.targets)
+        seen = np.zeros(len(self.ids), dtype=bool)
+        seen[start] = True
+        frontier = np.array([start], dtype=np.int64)
+        found = []
+        hops = 0
+        while len(frontier) and (depth <= 0 or hops < depth):
+            hops += 1
+            # Весь рівень BFS за раз: сусіди всіх вершин фронту, без уже відвіданих
+            nxt = np.unique(_gather(offsets, targets, frontier))
+            nxt = nxt[~seen[nxt]]
+            seen[nxt] = True
+            found.extend((self.ids[i], hops) for i in nxt.tolist())
+            frontier = nxt
+        return found
+
+    def callees(self, eid: str, depth: int = 1) -> List[Tuple[str, int]]:
+        return self.walk(eid, depth)
+
+    def callers(self, eid: str, depth: int = 1) -> List[Tuple[str, int]]:
+        return self.walk(eid, depth, reverse=True)
+
+    def save(self, path: str):
+        id_blob, id_offsets = pack_strings(list(self.ids))
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=FORMAT_VERSION, id_blob=id_blob, id_offsets=id_offsets,
+                     offsets=self.offsets, targets=self.targets,
+                     rev_offsets=self.rev_offsets, rev_targets=self.rev_targets)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["CallGraph"]:
+        if not os.path.exists(path): return None
+        with np.load(path) as data:
+            if int(data["version"]) != FORMAT_VERSION: return None
+            ids = PackedStrings(data["id_blob"], data["id_offsets"])
+            return cls(ids, data["offsets"], data["targets"], data["rev_offsets"], data["rev_targets"])
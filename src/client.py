@@ -0,0 +1,46 @@
+import os
+import json
+from typing import Optional
+
+# Клієнт до 'serve' (тільки stdlib, без config/pydantic - його імпортує і search_index.py).
+# Якщо демон не запущений або не відповідає, request() повертає None і
+# виклик відпрацьовує локально.
+
+SERVER_FILE_NAME = "server.json"
+
+def server_info(index_dir: str) -> Optional[dict]:
+    """Contents of <index_dir>/server.json if the daemon process is still alive."""
+    try:
+        with open(os.path.join(index_dir, SERVER_FILE_NAME), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        os.kill(info["pid"], 0)
+    except (OSError, ValueError, KeyError):
+        # OSError покриває і ProcessLookupError (процес помер, файл лишився)
+        return None
+    return info
+
+def request(index_dir: str, endpoint: str, payload: Optional[dict] = None, timeout: float = 30) -> Optional[dict]:
+    """GET (payload=None) or POST a JSON request to the daemon. None if there is no usable daemon."""
+    info = server_info(index_dir)
+    if info is None: return None
+    # urllib (http.client, email, ...) імпортується лише коли демон справді є
+    import urllib.error
+    import urllib.request
+    # localhost не має йти через HTTP(S)_PROXY
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    url = f"http://{info['host']}:{info['port']}{endpoint}"
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with opener.open(req, timeout=timeout) as resp:
+            return json.load(resp)
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+def search(index_dir: str, query: str, **options) -> Optional[dict]:
+    """{"results": [{id, score, path, symbol, summary}], "elapsed_ms": ...} or None."""
+    return request(index_dir, "/search", {"query": query, **options})
+
+def search_batch(index_dir: str, queries, **options) -> Optional[dict]:
+    """{"results": [[hit, ...] per query], "elapsed_ms": ...} or None."""
+    return request(index_dir, "/search", {"queries": list(queries), **options}, timeout=300)
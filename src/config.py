@@ -1,20 +1,71 @@
 import os
-import yaml
 
 # Шлях до конфігурації в домашній папці
 CONFIG_DIR = os.path.expanduser("~/.config/code-indexer")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.yaml")
+# Каталог шардів (іменовані індекси різних репозиторіїв) - спільний для користувача
+SHARDS_FILE = os.path.join(CONFIG_DIR, "shards.json")
 
 # Дефолтні налаштування
 DEFAULT_CONFIG = {
     "models": {
         "provider": "auto",  # auto, torch, onnx
         "embedding": "all-MiniLM-L6-v2",
-        "ollama": "qwen2.5-coder:7b"
+        "ollama": "qwen2.5-coder:7b",
+        "batch_size": 32     # текстів на один батч embedder-а
+    },
+    "onnx": {
+        "model_file": "auto",         # auto (model.int8.onnx з 'quantize-model', якщо є), model.onnx, model.int8.onnx
+        "intra_op_threads": 0,        # потоків на оператор; 0 -> onnxruntime (усі фізичні ядра)
+        "inter_op_threads": 0,        # 0 -> onnxruntime
+        "graph_optimization": "all",  # disable, basic, extended, all
+        "optimized_cache": True,      # оптимізований граф пишеться в <модель>/optimized/ і вантажиться наступного разу
+        "memory_arena": True,         # арена CPU-пам'яті onnxruntime (швидше, але RSS більший)
+        "workers": 1                  # процесів із власною сесією для 'embed'; 0 -> усі ядра
     },
     "storage": {
         "index_dir": ".code-index",
-        "docs_intents_dir": "docs/intents"
+        "docs_intents_dir": "docs/intents",
+        "backend": "binary"  # binary, sqlite
+    },
+    "llm": {
+        "host": None,        # None -> OLLAMA_HOST або http://localhost:11434
+        "timeout": 120,      # секунд на один запит
+        "retries": 3,
+        "concurrency": 1     # паралельних запитів до Ollama
+    },
+    "scan": {
+        # Імена тек/файлів (будь-де в дереві) або шляхи від кореня з '/' (glob)
+        "exclude": [".git", "node_modules", "venv", ".venv", "__pycache__"],
+        "gitignore": True,          # враховувати .gitignore
+        "use_git": True,            # у git-репозиторії брати список файлів з `git ls-files`
+        "max_file_size": 1048576    # байт; більші (згенеровані, мініфіковані) файли пропускаються, 0 - без ліміту
+    },
+    "cache": {
+        "summary_max_entries": 100000
+    },
+    "ann": {
+        "enabled": True,
+        "min_size": 20000,   # менше векторів - точний пошук і так швидкий
+        "nlist": 0,          # 0 -> 2 * sqrt(n)
+        "nprobe": 32         # більше - вищий recall, повільніше
+    },
+    "search": {
+        "mode": "hybrid",    # hybrid (вектори + BM25), dense, lexical
+        "rrf_k": 60,         # константа reciprocal rank fusion
+        "candidates": 50     # скільки результатів кожного ранжування зливати
+    },
+    "server": {
+        "host": "127.0.0.1",
+        "port": 0            # 0 -> будь-який вільний порт (пишеться в server.json)
+    },
+    "shards": {
+        "workers": 0         # потоків для пошуку по шардах; 0 -> min(шардів, ядер)
+    },
+    "quantize": {
+        "method": "none",    # none, sq8, pq (будується під час embed)
+        "pq_m": 0,           # підпросторів для pq; 0 -> dim / 4
+        "rescore": 10        # кандидатів на точний перерахунок = k * rescore
     },
     "languages": {
         ".py": "python",
@@ -24,17 +75,26 @@ DEFAULT_CONFIG = {
 }
 
 def load_config():
+    # Лише читання: імпорт config не пише на диск (дефолтний файл створює 'config --init').
+    # yaml імпортується тільки якщо файл є - 'status'/'--help' не платять за нього.
     if not os.path.exists(CONFIG_FILE):
-        os.makedirs(CONFIG_DIR, exist_ok=True)
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            yaml.dump(DEFAULT_CONFIG, f, default_flow_style=False)
         return DEFAULT_CONFIG
-    
+
+    import yaml
     with open(CONFIG_FILE, "r", encoding="utf-8") as f:
         user_config = yaml.safe_load(f)
         # Об'єднуємо з дефолтними, щоб не було помилок при відсутності полів
         return {**DEFAULT_CONFIG, **user_config}
 
+def write_default_config() -> bool:
+    """Creates CONFIG_FILE with the defaults. False if it already exists."""
+    if os.path.exists(CONFIG_FILE): return False
+    import yaml
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
+        yaml.dump(DEFAULT_CONFIG, f, default_flow_style=False)
+    return True
+
 config_data = load_config()
 
 # Експортуємо змінні для використання в коді
@@ -43,15 +103,74 @@ ENTITIES_FILE = os.path.join(INDEX_DIR, "entities.json")
 INTENTS_FILE = os.path.join(INDEX_DIR, "intents.json")
 EMBEDDINGS_FILE = os.path.join(INDEX_DIR, "embeddings.npy")
 IDS_FILE = os.path.join(INDEX_DIR, "ids.json")
+EMBEDDINGS_META_FILE = os.path.join(INDEX_DIR, "embeddings_meta.json")
+MANIFEST_FILE = os.path.join(INDEX_DIR, "manifest.json")
+SQLITE_FILE = os.path.join(INDEX_DIR, "index.sqlite")
+SUMMARY_CACHE_FILE = os.path.join(INDEX_DIR, "summary_cache.json")
+ANN_FILE = os.path.join(INDEX_DIR, "ann_ivf.npz")
+LEXICAL_FILE = os.path.join(INDEX_DIR, "lexical.npz")
+CALLGRAPH_FILE = os.path.join(INDEX_DIR, "callgraph.npz")
+QUANT_FILE = os.path.join(INDEX_DIR, "embeddings_quant.npz")
+QUANT_CODES_FILE = os.path.join(INDEX_DIR, "embeddings_codes.npy")
 
 DOCS_INTENTS_DIR = config_data["storage"]["docs_intents_dir"]
 
+STORAGE_BACKEND = config_data["storage"].get("backend", "binary")
+
 EMBEDDING_MODEL = config_data["models"]["embedding"]
 
 OLLAMA_MODEL = config_data["models"]["ollama"]
 
 PROVIDER = config_data["models"].get("provider", "auto")
 
+EMBED_BATCH_SIZE = config_data["models"].get("batch_size", 32)
+
+ONNX_OPTIONS = {**DEFAULT_CONFIG["onnx"], **(config_data.get("onnx") or {})}
+ONNX_WORKERS = ONNX_OPTIONS["workers"]
+ONNX_MODEL_FILE = ONNX_OPTIONS["model_file"]
+# Параметри OnnxEmbedder (model_file + embed_onnx.create_session) - все, крім кількості процесів
+ONNX_EMBEDDER_OPTIONS = {k: v for k, v in ONNX_OPTIONS.items() if k != "workers"}
+
+LLM_OPTIONS = {**DEFAULT_CONFIG["llm"], **(config_data.get("llm") or {})}
+LLM_HOST = LLM_OPTIONS["host"]
+LLM_TIMEOUT = LLM_OPTIONS["timeout"]
+LLM_RETRIES = LLM_OPTIONS["retries"]
+LLM_CONCURRENCY = LLM_OPTIONS["concurrency"]
+
+SCAN_OPTIONS = {**DEFAULT_CONFIG["scan"], **(config_data.get("scan") or {})}
+SCAN_EXCLUDES = SCAN_OPTIONS["exclude"]
+SCAN_GITIGNORE = SCAN_OPTIONS["gitignore"]
+SCAN_USE_GIT = SCAN_OPTIONS["use_git"]
+SCAN_MAX_FILE_SIZE = SCAN_OPTIONS["max_file_size"]
+
+CACHE_OPTIONS = {**DEFAULT_CONFIG["cache"], **(config_data.get("cache") or {})}
+SUMMARY_CACHE_MAX_ENTRIES = CACHE_OPTIONS["summary_max_entries"]
+
+ANN_OPTIONS = {**DEFAULT_CONFIG["ann"], **(config_data.get("ann") or {})}
+ANN_ENABLED = ANN_OPTIONS["enabled"]
+ANN_MIN_SIZE = ANN_OPTIONS["min_size"]
+ANN_NLIST = ANN_OPTIONS["nlist"]
+ANN_NPROBE = ANN_OPTIONS["nprobe"]
+
+SEARCH_OPTIONS = {**DEFAULT_CONFIG["search"], **(config_data.get("search") or {})}
+SEARCH_MODE = SEARCH_OPTIONS["mode"]
+SEARCH_RRF_K = SEARCH_OPTIONS["rrf_k"]
+SEARCH_CANDIDATES = SEARCH_OPTIONS["candidates"]
+SEARCH_MODES = ("hybrid", "dense", "lexical")
+
+SERVER_OPTIONS = {**DEFAULT_CONFIG["server"], **(config_data.get("server") or {})}
+SERVER_HOST = SERVER_OPTIONS["host"]
+SERVER_PORT = SERVER_OPTIONS["port"]
+
+SHARD_OPTIONS = {**DEFAULT_CONFIG["shards"], **(config_data.get("shards") or {})}
+SHARD_WORKERS = SHARD_OPTIONS["workers"]
+
+QUANT_OPTIONS = {**DEFAULT_CONFIG["quantize"], **(config_data.get("quantize") or {})}
+QUANT_METHOD = QUANT_OPTIONS["method"]
+QUANT_PQ_M = QUANT_OPTIONS["pq_m"]
+QUANT_RESCORE = QUANT_OPTIONS["rescore"]
+QUANT_METHODS = ("sq8", "pq")  # = quantize.METHODS; тут, щоб argparse не імпортував numpy
+
 
 
 LANGUAGE_MAP = config_data["languages"]
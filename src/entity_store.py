@@ -0,0 +1,277 @@
+import os
+import mmap
+from abc import abstractmethod
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Бінарне сховище сутностей:
+#   entities.<gen>.bin - msgpack-записи підряд (по одному на сутність)
+#   entities.idx       - msgpack-індекс: ids, offsets, lengths, confidence, counts
+# Індекс публікується атомарно (os.replace) і вказує на свій data-файл,
+# тож падіння посеред запису не ламає попередню версію.
+# Модуль не імпортує config/pydantic на рівні модуля, щоб його міг
+# використовувати легкий search_index.py.
+
+INDEX_NAME = "entities.idx"
+FORMAT_VERSION = 1
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError("msgpack is not installed. Run 'pip install msgpack'.")
+    return msgpack
+
+def pack_entity(entity) -> bytes:
+    return _msgpack().packb(entity.model_dump(exclude_none=True), use_bin_type=True)
+
+def write_store(index_dir: str, records: Iterable[Tuple[str, str, bytes]]) -> dict:
+    """
+    Writes (id, confidence, packed record) tuples as a new store generation.
+    Duplicate ids keep their first position and the last record.
+    Returns the published index.
+    """
+    msgpack = _msgpack()
+    os.makedirs(index_dir, exist_ok=True)
+    index_file = os.path.join(index_dir, INDEX_NAME)
+
+    old_data = None
+    generation = 1
+    if os.path.exists(index_file):
+        with open(index_file, "rb") as f:
+            old = msgpack.unpackb(f.read(), raw=False)
+        old_data = old["data"]
+        generation = old.get("generation", 0) + 1
+
+    data_name = f"entities.{generation}.bin"
+    ids, offsets, lengths, confidence = [], [], [], []
+    position: Dict[str, int] = {}
+    offset = 0
+    data_path = os.path.join(index_dir, data_name)
+    try:
+        # records може бути потоком (scan): записи пишуться одразу, в пам'яті лише id і зсуви
+        with open(data_path, "wb") as f:
+            for eid, conf, blob in records:
+                f.write(blob)
+                if eid in position:
+                    i = position[eid]
+                    offsets[i], lengths[i], confidence[i] = offset, len(blob), conf
+                else:
+                    position[eid] = len(ids)
+                    ids.append(eid)
+                    offsets.append(offset)
+                    lengths.append(len(blob))
+                    confidence.append(conf)
+                offset += len(blob)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        # Перерваний запис (Ctrl+C, помилка парсингу): попередня версія лишається опублікованою
+        try:
+            os.remove(data_path)
+        except OSError:
+            pass
+        raise
+
+    counts = {"low": 0, "medium": 0, "high": 0}
+    for conf in confidence:
+        counts[conf] = counts.get(conf, 0) + 1
+
+    index = {
+        "version": FORMAT_VERSION,
+        "generation": generation,
+        "data": data_name,
+        "counts": counts,
+        "ids": ids,
+        "offsets": offsets,
+        "lengths": lengths,
+        "confidence": confidence,
+    }
+    tmp = index_file + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(msgpack.packb(index, use_bin_type=True))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, index_file)
+
+    # Попереднє покоління лишається до наступного запису: читач (serve, search), що вже
+    # прочитав старий індекс, ще може відкрити його data-файл. Старші - видаляються.
+    for name in os.listdir(index_dir):
+        if name.startswith("entities.") and name.endswith(".bin") and name not in (data_name, old_data):
+            try:
+                os.remove(os.path.join(index_dir, name))
+            except OSError:
+                pass
+    return index
+
+def read_index(index_dir: str) -> Optional[dict]:
+    index_file = os.path.join(index_dir, INDEX_NAME)
+    if not os.path.exists(index_file): return None
+    with open(index_file, "rb") as f:
+        return _msgpack().unpackb(f.read(), raw=False)
+
+class BaseEntityStore(MutableMapping):
+    """
+    Lazy {id: CodeEntity} map shared by the storage backends.
+    Plain-record/aggregate methods must not build pydantic objects.
+    """
+
+    @abstractmethod
+    def get_record(self, eid: str, default=None) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    def iter_records(self):
+        pass
+
+    @abstractmethod
+    def ids_by_confidence(self, confidence: str) -> List[str]:
+        pass
+
+    @abstractmethod
+    def confidence_counts(self) -> Dict[str, int]:
+        pass
+
+    @abstractmethod
+    def save(self):
+        """Persists every change made through the mapping."""
+        pass
+
+    def upsert(self, entities):
+        """Persists the given (changed) entities. Backends may write more than that."""
+        for e in entities:
+            self[e.id] = e
+        self.save()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class EntityStore(BaseEntityStore):
+    """
+    Lazy {id: CodeEntity} map over the binary store.
+    Records are decoded (and pydantic objects built) only when accessed.
+    Assigned/loaded entities are kept in memory; save() writes them back and
+    copies untouched records byte-for-byte.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._loaded = {}
+        self._data = None
+        # Між read_index і відкриттям data-файлу можуть пройти два записи: тоді читаємо індекс знову
+        for attempt in range(3):
+            try:
+                self._open(read_index(index_dir))
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def _open(self, index: Optional[dict]):
+        self.close()
+        index = index or {"ids": [], "offsets": [], "lengths": [], "confidence": [], "counts": {}, "data": None}
+        self._index = index
+        self._pos = {eid: i for i, eid in enumerate(index["ids"])}
+        self._order = dict.fromkeys(index["ids"])
+        self._dirty_order = False
+        self._loaded = {}
+        if index["data"]:
+            path = os.path.join(self.index_dir, index["data"])
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size:
+                    self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+    # --- Raw access (без pydantic) ---
+
+    def raw(self, eid: str) -> bytes:
+        i = self._pos[eid]
+        start = self._index["offsets"][i]
+        return self._data[start:start + self._index["lengths"][i]]
+
+    def get_record(self, eid: str, default=None) -> Optional[dict]:
+        """Returns the entity as a plain dict, without building a pydantic object."""
+        if eid in self._loaded:
+            return self._loaded[eid].model_dump(exclude_none=True)
+        if eid not in self._order or eid not in self._pos:
+            return default
+        return _msgpack().unpackb(self.raw(eid), raw=False)
+
+    def iter_records(self):
+        for eid in self._order:
+            yield self.get_record(eid)
+
+    def _confidence(self, eid: str) -> str:
+        if eid in self._loaded:
+            return self._loaded[eid].confidence
+        return self._index["confidence"][self._pos[eid]]
+
+    def ids_by_confidence(self, confidence: str):
+        return [eid for eid in self._order if self._confidence(eid) == confidence]
+
+    def confidence_counts(self) -> Dict[str, int]:
+        if not self._loaded and not self._dirty_order:
+            return {"low": 0, "medium": 0, "high": 0, **self._index["counts"]}
+        counts = {"low": 0, "medium": 0, "high": 0}
+        for eid in self._order:
+            counts[self._confidence(eid)] += 1
+        return counts
+
+    # --- Mapping API ---
+
+    def __getitem__(self, eid: str):
+        entity = self._loaded.get(eid)
+        if entity is not None:
+            return entity
+        if eid not in self._order:
+            raise KeyError(eid)
+        from .schema import CodeEntity
+        entity = CodeEntity(**_msgpack().unpackb(self.raw(eid), raw=False))
+        self._loaded[eid] = entity
+        return entity
+
+    def __setitem__(self, eid: str, entity):
+        self._loaded[eid] = entity
+        if eid not in self._order:
+            self._order[eid] = None
+            self._dirty_order = True
+
+    def __delitem__(self, eid: str):
+        del self._order[eid]
+        self._loaded.pop(eid, None)
+        self._dirty_order = True
+
+    def __contains__(self, eid) -> bool:
+        return eid in self._order
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def packed(self, eid: str) -> Tuple[str, bytes]:
+        """(confidence, msgpack record) as write_store() takes them; untouched records are not decoded."""
+        if eid in self._loaded:
+            entity = self._loaded[eid]
+            return entity.confidence, pack_entity(entity)
+        return self._confidence(eid), self.raw(eid)
+
+    def save(self):
+        """Writes a new generation: touched entities are re-serialized, the rest copied raw."""
+        index = write_store(self.index_dir, ((eid, *self.packed(eid)) for eid in self._order))
+        loaded = self._loaded
+        self._open(index)
+        # Вже створені об'єкти лишаються валідними - не будуємо їх знову
+        self._loaded = {eid: e for eid, e in loaded.items() if eid in self._order}
@@ -0,0 +1,182 @@
+import os
+import re
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Лексичний (BM25) інвертований індекс по symbol, шляху, responsibility і summary.
+# Чистий NumPy, як search.py, щоб його міг використовувати і search_index.py.
+# Ваги BM25 рахуються при побудові, тож запит - це сума коротких posting-списків.
+# Формат (.npz, без pickle): терміни і id як utf-8 blob + offsets, postings у CSR.
+
+FORMAT_VERSION = 1
+K1 = 1.2
+B = 0.75
+SYMBOL_BOOST = 3   # токени symbol рахуються як 3 входження
+COMMON_DF = 0.02   # термін, що є в >2% документів (і не менше ніж у COMMON_MIN), вважається частим
+COMMON_MIN = 1000
+
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Identifier-aware tokens: each word is kept whole (lowercased) and also split
+    on snake_case/camelCase, so 'loadEmbeddings' -> loadembeddings, load, embeddings.
+    """
+    tokens = []
+    for word in _WORD.findall(text or ""):
+        low = word.lower()
+        parts = [p.lower() for p in _PART.findall(word)]
+        if len(parts) != 1 or parts[0] != low:
+            tokens.append(low)
+        tokens.extend(parts)
+    return tokens
+
+def record_tokens(rec: dict) -> List[str]:
+    summary = (rec.get("summary") or {}).get("text") or ""
+    return (tokenize(rec.get("symbol", "")) * SYMBOL_BOOST
+            + tokenize(rec.get("path", ""))
+            + tokenize(rec.get("responsibility") or "")
+            + tokenize(summary))
+
+def pack_strings(items: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Strings as one utf-8 blob + offsets, so .npz files need no pickle."""
+    encoded = [s.encode("utf-8") for s in items]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+class PackedStrings:
+    """Read-only list of strings over a utf-8 blob; items are decoded on access."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.data = blob.tobytes()
+        self.offsets = offsets.tolist()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class LexicalIndex:
+    """BM25 over entity records; postings store precomputed per-document weights."""
+
+    def __init__(self, ids, terms: Dict[str, int], offsets: np.ndarray, docs: np.ndarray, weights: np.ndarray):
+        self.ids = ids
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+
+    @classmethod
+    def build(cls, records: Iterable[dict]) -> "LexicalIndex":
+        ids: List[str] = []
+        terms: Dict[str, int] = {}
+        term_col: List[int] = []
+        doc_col: List[int] = []
+        doc_len: List[int] = []
+        for rec in records:
+            doc = len(ids)
+            ids.append(rec["id"])
+            tokens = [terms.setdefault(t, len(terms)) for t in record_tokens(rec)]
+            term_col.extend(tokens)
+            doc_col.extend([doc] * len(tokens))
+            doc_len.append(len(tokens))
+
+        # (term, doc) пари -> tf, відсортовані за термом, потім документом (CSR)
+        n = len(ids)
+        keys = np.asarray(term_col, dtype=np.int64) * max(n, 1) + np.asarray(doc_col, dtype=np.int64)
+        keys, tf = np.unique(keys, return_counts=True)
+        term = keys // max(n, 1)
+        docs = (keys % max(n, 1)).astype(np.int32)
+        df = np.bincount(term, minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        lengths = np.asarray(doc_len, dtype=np.float32)
+        avgdl = float(lengths.mean()) if n else 1.0
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        tf = tf.astype(np.float32)
+        weights = (idf[term] * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[docs] / max(avgdl, 1e-9)))).astype(np.float32)
+        return cls(ids, terms, offsets, docs, weights)
+
+    def search(self, query: str, k: int = 5) -> Tuple[List[str], np.ndarray]:
+        """Returns (ids, BM25 scores) of the k best documents, best first."""
+        rows = [self.terms[t] for t in dict.fromkeys(tokenize(query)) if t in self.terms]
+        # Якщо в запиті є рідкісний термін (ідентифікатор), часті терміни з малим idf
+        # відкидаємо: їхні довгі posting-списки майже не змінюють порядок
+        common = max(COMMON_MIN, int(COMMON_DF * len(self.ids)))
+        rare = [r for r in rows if self.offsets[r + 1] - self.offsets[r] <= common]
+        rows = rare or rows
+        if not rows:
+            return [], np.empty(0, dtype=np.float32)
+        docs = np.concatenate([self.docs[self.offsets[r]:self.offsets[r + 1]] for r in rows])
+        weights = np.concatenate([self.weights[self.offsets[r]:self.offsets[r + 1]] for r in rows])
+        if len(rows) == 1:
+            uniq, scores = docs, weights
+        else:
+            # Сума ваг по документу без щільного масиву на всі документи
+            uniq, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        k = min(k, len(uniq))
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [self.ids[uniq[i]] for i in top], scores[top]
+
+    def save(self, path: str):
+        vocab = sorted(self.terms, key=self.terms.get)
+        term_blob, term_offsets = pack_strings(vocab)
+        id_blob, id_offsets = pack_strings(list(self.ids))
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=FORMAT_VERSION, term_blob=term_blob, term_offsets=term_offsets,
+                     id_blob=id_blob, id_offsets=id_offsets,
+                     offsets=self.offsets, docs=self.docs, weights=self.weights)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LexicalIndex"]:
+        if not os.path.exists(path): return None
+        with np.load(path) as data:
+            if int(data["version"]) != FORMAT_VERSION: return None
+            vocab = unpack_strings(data["term_blob"], data["term_offsets"])
+            # id потрібні лише для top-k - не декодуємо їх усі при завантаженні
+            ids = PackedStrings(data["id_blob"], data["id_offsets"])
+            return cls(ids, {t: i for i, t in enumerate(vocab)}, data["offsets"], data["docs"], data["weights"])
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+def looks_like_identifier(query: str) -> bool:
+    """'load_embeddings', 'loadEmbeddings', 'storage.load' - but not 'load embeddings'."""
+    q = query.strip()
+    return bool(_IDENTIFIER.match(q)) and ("_" in q or "." in q or any(c.isupper() for c in q[1:]))
+
+def rrf_fuse(rankings: List[List[str]], k: int = 5, c: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal rank fusion: score(id) = sum over rankings of 1 / (c + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, eid in enumerate(ranking, 1):
+            scores[eid] = scores.get(eid, 0.0) + 1.0 / (c + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+def exact_symbol_matches(query: str, ids: List[str]) -> List[str]:
+    """Ids ('path:symbol') whose symbol is exactly the identifier-like query."""
+    if not looks_like_identifier(query): return []
+    q = query.strip().lower()
+    return [eid for eid in ids if eid.rsplit(":", 1)[-1].lower() in (q, q.rsplit(".", 1)[-1])]
+
+def hybrid_rank(query: str, dense_ids: List[str], lexical_ids: List[str], k: int = 5, c: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuses dense and lexical rankings with RRF. For an identifier-like query an exact
+    symbol match counts as one more first place, so it always beats entities that
+    are merely similar in meaning.
+    """
+    return rrf_fuse([dense_ids, lexical_ids, exact_symbol_matches(query, lexical_ids)], k=k, c=c)
@@ -0,0 +1,170 @@
+import os
+import json
+import math
+import time
+import threading
+from contextlib import nullcontext
+from typing import Dict
+
+# Інструментація конвеєра: таймери, лічильники, гістограми і (опційно) спани
+# у форматі Chrome trace (chrome://tracing, Perfetto). Лише stdlib.
+# За замовчуванням вимкнена: span() повертає порожній контекст, count()/observe()
+# одразу виходять. Вмикає main.py (--metrics FILE / --trace FILE).
+
+BUCKETS_PER_OCTAVE = 4       # межі бакетів 2 ** (i / 4): перцентилі з похибкою до ~19%
+MAX_TRACE_EVENTS = 1_000_000  # далі спани лише агрегуються, щоб trace не з'їв пам'ять
+
+class Histogram:
+    """Count/sum/min/max plus log-scale buckets for approximate percentiles."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        b = math.floor(math.log2(value) * BUCKETS_PER_OCTAVE) if value > 0 else None
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile (clamped to min/max)."""
+        if not self.count: return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        # None (нуль і від'ємні) - перед усіма додатними бакетами
+        for b in sorted(self.buckets, key=lambda b: -math.inf if b is None else b):
+            seen += self.buckets[b]
+            if seen >= rank:
+                bound = 0.0 if b is None else 2 ** ((b + 1) / BUCKETS_PER_OCTAVE)
+                return min(max(bound, self.min), self.max)
+        return self.max
+
+    def to_dict(self, unit: str = "") -> dict:
+        if not self.count: return {"count": 0}
+        r = lambda v: round(v, 4)
+        return {
+            "count": self.count, f"sum{unit}": r(self.total), f"mean{unit}": r(self.total / self.count),
+            f"min{unit}": r(self.min), f"p50{unit}": r(self.percentile(50)), f"p95{unit}": r(self.percentile(95)),
+            f"p99{unit}": r(self.percentile(99)), f"max{unit}": r(self.max),
+        }
+
+_lock = threading.Lock()
+_enabled = False
+_tracing = False
+_t0 = time.perf_counter()
+_started = time.time()
+_timers: Dict[str, Histogram] = {}
+_histograms: Dict[str, Histogram] = {}
+_counters: Dict[str, float] = {}
+_events = []
+_dropped_events = 0
+_NULL = nullcontext()
+
+def enable(trace: bool = False):
+    global _enabled, _tracing
+    _enabled = True
+    _tracing = _tracing or trace
+
+def enabled() -> bool:
+    return _enabled
+
+class _Span:
+    __slots__ = ("name", "args", "start", "elapsed")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.elapsed = end - self.start
+        add_time(self.name, self.elapsed)
+        if _tracing:
+            _trace_event(self.name, self.start, end, self.args)
+        return False
+
+def span(name: str, **args):
+    """
+    Times a block: `with metrics.span("embed.batch", size=32) as s: ...` (args go to the
+    trace only). s is None when metrics are off, else s.elapsed holds the seconds after the block.
+    """
+    if not _enabled: return _NULL
+    return _Span(name, args)
+
+def add_time(name: str, seconds: float):
+    """Records a duration measured elsewhere (e.g. in a worker process)."""
+    if not _enabled: return
+    with _lock:
+        h = _timers.get(name)
+        if h is None:
+            h = _timers[name] = Histogram()
+        h.add(seconds * 1000)
+
+def count(name: str, n: float = 1):
+    if not _enabled: return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def observe(name: str, value: float):
+    """Adds a sample to a histogram (sizes, tokens/s, ...)."""
+    if not _enabled: return
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = Histogram()
+        h.add(value)
+
+def _trace_event(name: str, start: float, end: float, args: dict):
+    global _dropped_events
+    with _lock:
+        if len(_events) >= MAX_TRACE_EVENTS:
+            _dropped_events += 1
+            return
+        thread = threading.current_thread()
+        _events.append({
+            "name": name, "cat": name.split(".", 1)[0], "ph": "X",
+            "ts": (start - _t0) * 1e6, "dur": (end - start) * 1e6,
+            "pid": os.getpid(), "tid": thread.ident, "args": args, "_thread": thread.name,
+        })
+
+def snapshot(**info) -> dict:
+    with _lock:
+        return {
+            **info,
+            "started": _started,
+            "elapsed_s": round(time.perf_counter() - _t0, 4),
+            "timers": {k: _timers[k].to_dict("_ms") for k in sorted(_timers)},
+            "counters": dict(sorted(_counters.items())),
+            "histograms": {k: _histograms[k].to_dict() for k in sorted(_histograms)},
+        }
+
+def write(path: str, **info):
+    """Writes the aggregated metrics (plus `info`, e.g. the command) as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(**info), f, indent=2, ensure_ascii=False)
+
+def write_trace(path: str):
+    """Writes the recorded spans in Chrome trace event format."""
+    with _lock:
+        events, threads = [], {}
+        for e in _events:
+            e = dict(e)
+            threads[(e["pid"], e["tid"])] = e.pop("_thread")
+            events.append(e)
+        dropped = _dropped_events
+    # Імена потоків (summarize з concurrency > 1, serve)
+    meta = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for (pid, tid), name in threads.items()]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms",
+                   "otherData": {"dropped_events": dropped}}, f)
@@ -1,19 +1,62 @@
 import os
+import mmap
+import bisect
+import hashlib
+import importlib
+from collections import defaultdict
 from tree_sitter import Language, Parser, Query, QueryCursor
 from .schema import CodeEntity, EntitySummary
 
+# Версія результату extract_entities. Пишеться в маніфест; файли, розібрані
+# іншою версією, scan/watch перепарсять (напр. v2 додала entity.calls).
+PARSER_VERSION = 2
+
+def hash_bytes(data: bytes) -> str:
+    """Short content hash used for file manifests and entity bodies."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def read_entity_sources(entities):
+    """
+    Yields (entity, source code) pairs. Entities are grouped by file, so each file
+    is opened (and mmapped) once and every body is sliced by its byte span.
+    Entities without a span (indexed by an older scan) get the whole file.
+    Read errors are yielded as (entity, exception).
+    """
+    by_path = defaultdict(list)
+    for e in entities:
+        by_path[e.path].append(e)
+
+    for path, group in by_path.items():
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    data = b""
+                else:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    for e in group:
+                        if e.start_byte is not None and e.end_byte is not None:
+                            code = data[e.start_byte:e.end_byte]
+                        else:
+                            code = data[:]
+                        yield e, code.decode("utf8", errors="replace")
+                finally:
+                    if isinstance(data, mmap.mmap): data.close()
+        except OSError as ex:
+            for e in group:
+                yield e, ex
+
 class CodeParser:
+    # Офіційні пакети граматик. Модуль імпортується при першому файлі з цим
+    # розширенням, тож репозиторій з однією мовою не вантажить інші.
+    GRAMMARS = {
+        ".py": "tree_sitter_python",
+        ".kt": "tree_sitter_kotlin",
+        ".go": "tree_sitter_go"
+    }
+
     def __init__(self):
-        import tree_sitter_python
-        import tree_sitter_kotlin
-        import tree_sitter_go
-        
-        # Завантажуємо мови через офіційні пакети
-        self.LANGUAGES = {
-            ".py": Language(tree_sitter_python.language()),
-            ".kt": Language(tree_sitter_kotlin.language()),
-            ".go": Language(tree_sitter_go.language())
-        }
+        self.LANGUAGES = {}
 
         # S-Expressions (запити) для пошуку функцій
         self.QUERIES = {
@@ -31,15 +74,56 @@ class CodeParser:
             """
         }
 
-    def parse_file(self, filepath) -> list[CodeEntity]:
-        ext = os.path.splitext(filepath)[1]
-        lang = self.LANGUAGES.get(ext)
-        if not lang: return []
+        # Місця викликів: ім'я функції/методу, як воно записане (f(), obj.f(), pkg.F()).
+        # Резолвяться в сутності таблицею символів при побудові графа (callgraph.py).
+        self.CALL_QUERIES = {
+            ".py": """
+                (call function: (identifier) @callee)
+                (call function: (attribute attribute: (identifier) @callee))
+            """,
+            ".kt": """
+                (call_expression . (identifier) @callee)
+                (call_expression . (navigation_expression (identifier) @callee .))
+            """,
+            ".go": """
+                (call_expression function: (identifier) @callee)
+                (call_expression function: (selector_expression field: (field_identifier) @callee))
+            """
+        }
+
+        # Parser і скомпільований Query створюються один раз на мову
+        self._parsers = {}
+        self._queries = {}
+        self._call_queries = {}
+
+    def _get_language(self, ext) -> Language:
+        if ext not in self.LANGUAGES:
+            module = importlib.import_module(self.GRAMMARS[ext])
+            self.LANGUAGES[ext] = Language(module.language())
+        return self.LANGUAGES[ext]
+
+    def _get_parser(self, ext) -> Parser:
+        if ext not in self._parsers:
+            self._parsers[ext] = Parser(self._get_language(ext))
+        return self._parsers[ext]
 
-        # 1. Ініціалізуємо парсер
-        parser = Parser(lang)
+    def _get_query(self, ext) -> Query:
+        if ext not in self._queries:
+            self._queries[ext] = Query(self._get_language(ext), self.QUERIES[ext])
+        return self._queries[ext]
+
+    def _get_call_query(self, ext) -> Query:
+        if ext not in self._call_queries:
+            self._call_queries[ext] = Query(self._get_language(ext), self.CALL_QUERIES[ext])
+        return self._call_queries[ext]
+
+    def supports(self, filepath) -> bool:
+        return os.path.splitext(filepath)[1] in self.GRAMMARS
+
+    def parse_file(self, filepath) -> list[CodeEntity]:
+        if not self.supports(filepath): return []
 
-        # 2. Читаємо файл
+        # Читаємо файл
         try:
             with open(filepath, "rb") as f:
                 code_bytes = f.read()
@@ -47,15 +131,32 @@ class CodeParser:
             print(f"Read error {filepath}: {e}")
             return []
 
-        # 3. Парсимо
-        tree = parser.parse(code_bytes)
-        
-        # 4. Виконуємо запит
-        query_scm = self.QUERIES.get(ext)
-        if not query_scm: return []
+        return self.parse_bytes(filepath, code_bytes)
+
+    def parse_bytes(self, filepath, code_bytes: bytes) -> list[CodeEntity]:
+        """Parses already loaded file contents (used by incremental scan)."""
+        tree = self.parse_tree(filepath, code_bytes)
+        if tree is None: return []
+        return self.extract_entities(filepath, tree)
+
+    def parse_tree(self, filepath, code_bytes: bytes, old_tree=None):
+        """
+        Returns the tree-sitter tree for the file contents.
+        If old_tree is given (already edited via tree.edit), the parse is incremental.
+        """
+        ext = os.path.splitext(filepath)[1]
+        if ext not in self.GRAMMARS: return None
+        # Парсер кешований для мови
+        parser = self._get_parser(ext)
+        if old_tree is None:
+            return parser.parse(code_bytes)
+        return parser.parse(code_bytes, old_tree=old_tree)
+
+    def extract_entities(self, filepath, tree) -> list[CodeEntity]:
+        ext = os.path.splitext(filepath)[1]
+        if ext not in self.QUERIES: return []
         
-        query = Query(lang, query_scm)
-        cursor = QueryCursor(query)
+        cursor = QueryCursor(self._get_query(ext))
         captures_dict = cursor.captures(tree.root_node)
         
         # Flatten for compatibility
@@ -63,6 +164,8 @@ class CodeParser:
         for name, nodes in captures_dict.items():
             for node in nodes:
                 captures.append((node, name))
+        # Порядок у dict не детермінований між процесами -> сортуємо за позицією в файлі
+        captures.sort(key=lambda c: c[0].start_byte)
 
         entities = []
         processed = set()
@@ -93,13 +196,39 @@ class CodeParser:
                     summary=summary_obj,
                     responsibility=resp,
                     side_effects=effects,
+                    body_hash=hash_bytes(node.text),
+                    start_byte=node.start_byte,
+                    end_byte=node.end_byte,
+                    start_line=node.start_point[0] + 1,
+                    end_line=node.end_point[0] + 1,
                     confidence="low"
                 )
                 entity.update_confidence()
                 entities.append(entity)
         
+        self._extract_calls(ext, tree, entities)
         return entities
 
+    def _extract_calls(self, ext, tree, entities):
+        """
+        Fills entity.calls with the callee names of the call sites in its body
+        (deduplicated, in source order). A call inside a nested definition
+        belongs to the innermost one.
+        """
+        if not entities: return
+        nodes = QueryCursor(self._get_call_query(ext)).captures(tree.root_node).get("callee", [])
+        # entities вже відсортовані за start_byte
+        starts = [e.start_byte for e in entities]
+        for node in sorted(nodes, key=lambda n: n.start_byte):
+            i = bisect.bisect_right(starts, node.start_byte) - 1
+            # Попередні сусіди не містять виклик - йдемо назад до охоплюючої сутності
+            while i >= 0 and entities[i].end_byte < node.end_byte:
+                i -= 1
+            if i < 0: continue
+            name = node.text.decode("utf8")
+            if name not in entities[i].calls:
+                entities[i].calls.append(name)
+
     def _parse_contract(self, text):
         """Парсинг коментарів"""
         lines = text.split('\n')
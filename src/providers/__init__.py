@@ -4,37 +4,48 @@ from .base import BaseEmbedder, BaseLLM
 
 # Factory methods
 
-def get_embedder(provider_type: str, model_name_or_path: str) -> BaseEmbedder:
+def get_embedder(provider_type: str, model_name_or_path: str, batch_size: int = None,
+                 onnx_options: dict = None, workers: int = 1) -> BaseEmbedder:
     """
     Factory to create an embedder instance.
     provider_type: 'torch', 'onnx', or 'auto'
+    onnx_options: OnnxEmbedder options - model_file and SessionOptions (see embed_onnx.create_session).
+    workers: > 1 -> ONNX sessions in that many processes (OnnxEmbedderPool).
     """
     if provider_type == "auto":
         # Check if ONNX model exists first (preferred for speed/portability if available)
         # However, usually we default to torch on desktop unless specifically set.
         # Let's simple check: is it a path to a directory? -> ONNX. Is it a HF string? -> Torch.
-        if os.path.isdir(model_name_or_path) and os.path.exists(os.path.join(model_name_or_path, "model.onnx")):
+        # Квантизована model.int8.onnx (якщо є) обирається в OnnxEmbedder (model_file="auto")
+        from .embed_onnx import resolve_model_file
+        if os.path.isdir(model_name_or_path) and resolve_model_file(model_name_or_path):
             provider_type = "onnx"
         else:
             provider_type = "torch"
 
     if provider_type == "onnx":
+        if workers > 1:
+            from .embed_onnx import OnnxEmbedderPool
+            return OnnxEmbedderPool(model_name_or_path, workers, batch_size=batch_size, **(onnx_options or {}))
         from .embed_onnx import OnnxEmbedder
-        return OnnxEmbedder(model_name_or_path)
+        return OnnxEmbedder(model_name_or_path, batch_size=batch_size, **(onnx_options or {}))
     
     elif provider_type == "torch":
+        if workers > 1:
+            print("⚠️  Embedding workers apply to the ONNX provider only; using one torch model.")
         from .embed_torch import TorchEmbedder
-        return TorchEmbedder(model_name_or_path)
+        return TorchEmbedder(model_name_or_path, batch_size=batch_size)
     
     else:
         raise ValueError(f"Unknown embedder provider: {provider_type}")
 
-def get_llm(provider_type: str, model_name: str) -> BaseLLM:
+def get_llm(provider_type: str, model_name: str, **options) -> BaseLLM:
     """
     Factory for LLM. Currently only supports 'ollama'.
+    options: host, timeout, retries (passed to the provider).
     """
     if provider_type == "ollama" or provider_type == "auto":
         from .llm_ollama import OllamaLLM
-        return OllamaLLM(model_name)
+        return OllamaLLM(model_name, **options)
     else:
         raise ValueError(f"Unknown LLM provider: {provider_type}")
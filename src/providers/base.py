@@ -1,17 +1,66 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 import numpy as np
+from .. import metrics
 
 class BaseEmbedder(ABC):
-    @abstractmethod
-    def encode(self, texts: List[str]) -> np.ndarray:
+    # Розмір батчу за замовчуванням (перевизначається конфігом models.batch_size)
+    batch_size = 32
+
+    def encode(self, texts: List[str], batch_size: Optional[int] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Takes a list of strings and returns a numpy array of embeddings.
         Shape: (len(texts), embedding_dim)
+
+        Texts are encoded in fixed-size batches sorted by length (less padding),
+        and each batch is written straight into `out` in the original order.
+        `out` may be a preallocated (e.g. memory-mapped) array; otherwise one is allocated.
+        Only one batch of model activations is held in memory at a time.
         """
+        batch_size = batch_size or self.batch_size
+        if out is None:
+            out = np.empty((len(texts), self.dimension()), dtype=np.float32)
+        if not texts:
+            return out
+
+        batches = self._batches(texts, batch_size)
+        if len(batches) > 1:
+            from tqdm import tqdm
+            batches = tqdm(batches, desc="Embedding", unit="batch")
+        for idx in batches:
+            with metrics.span("embed.batch", size=len(idx)) as s:
+                out[idx] = self.encode_batch([texts[i] for i in idx])
+            if s is not None:
+                metrics.observe("embed.texts_per_s", len(idx) / max(s.elapsed, 1e-9))
+        metrics.count("embed.texts", len(texts))
+        return out
+
+    @staticmethod
+    def _batches(texts: List[str], batch_size: int) -> List[np.ndarray]:
+        """Row indices of each batch, texts sorted by length."""
+        # Довжина в символах - дешевий, але добрий proxy для кількості токенів
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        return [order[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+
+    @abstractmethod
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Encodes one batch. Shape: (len(texts), embedding_dim)"""
+        pass
+
+    def dimension(self) -> int:
+        if not hasattr(self, "_dimension"):
+            self._dimension = self.encode_batch(["dimension probe"]).shape[1]
+        return self._dimension
+
+    def close(self):
+        """Releases worker processes, if any."""
         pass
 
 class BaseLLM(ABC):
+    # Змінюйте при зміні промпту: версія входить у ключ кешу summaries
+    prompt_version = 1
+    model_name = ""
+
     @abstractmethod
     def generate_summary(self, code_snippet: str) -> str:
         """
@@ -1,44 +1,291 @@
 import os
+import json
+import time
+import platform
 import numpy as np
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
 from .base import BaseEmbedder
+from .. import metrics
 
-class OnnxEmbedder(BaseEmbedder):
-    def __init__(self, model_dir: str):
+# Рівні оптимізації графа onnxruntime (onnx.graph_optimization у конфігу)
+GRAPH_OPTIMIZATION_LEVELS = ("disable", "basic", "extended", "all")
+FP32_MODEL = "model.onnx"
+QUANTIZED_MODEL = "model.int8.onnx"  # пише 'quantize-model'; "auto" бере його замість fp32
+BATCHES_IN_FLIGHT = 2  # батчів у черзі на воркера: поки один рахує, наступний уже переданий
+
+def _import_runtime():
+    try:
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+    except ImportError:
+        raise ImportError("onnxruntime or transformers is not installed. Run 'pip install onnxruntime transformers'.")
+    return ort, AutoTokenizer
+
+def resolve_model_file(model_dir: str, model_file: str = "auto") -> Optional[str]:
+    """
+    Path of the graph to run: model_file in model_dir, or for "auto" the int8 model
+    written by 'quantize-model' if present, else the fp32 model.onnx. None if missing.
+    """
+    names = (QUANTIZED_MODEL, FP32_MODEL) if model_file == "auto" else (model_file,)
+    for name in names:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+def _model_file(model_dir: str, model_file: str = "auto") -> str:
+    onnx_file = resolve_model_file(model_dir, model_file)
+    if onnx_file is None:
+        missing = os.path.join(model_dir, FP32_MODEL if model_file == "auto" else model_file)
+        raise FileNotFoundError(f"ONNX model not found at {missing}. Run 'python3 download_onnx.py' first.")
+    return onnx_file
+
+def _hidden_size(model_dir: str) -> Optional[int]:
+    # Розмірність беремо з config.json моделі, щоб не робити пробний inference
+    config_file = os.path.join(model_dir, "config.json")
+    if not os.path.exists(config_file): return None
+    with open(config_file, "r", encoding="utf-8") as f:
+        return json.load(f).get("hidden_size")
+
+def optimized_model_path(onnx_file: str, level: str, ort_version: str) -> str:
+    """
+    Where the graph optimized at `level` is cached: <model dir>/optimized/<name>.<level>.<arch>.ort<version>.onnx.
+    Level "all" may bake in CPU-specific layouts, so the cache is per machine and runtime version.
+    """
+    name = os.path.splitext(os.path.basename(onnx_file))[0]
+    return os.path.join(os.path.dirname(onnx_file), "optimized",
+                        f"{name}.{level}.{platform.machine() or 'cpu'}.ort{ort_version}.onnx")
+
+def create_session(onnx_file: str, intra_op_threads: int = 0, inter_op_threads: int = 0,
+                   graph_optimization: str = "all", optimized_cache: bool = True, memory_arena: bool = True):
+    """
+    InferenceSession with explicit SessionOptions (0 threads = onnxruntime default).
+    With optimized_cache the optimized graph is written next to the model on first load;
+    later loads read it with optimizations off instead of re-running them.
+    Returns (session, cache_hit).
+    """
+    ort, _ = _import_runtime()
+    if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"Unknown graph_optimization '{graph_optimization}' (expected one of {', '.join(GRAPH_OPTIMIZATION_LEVELS)}).")
+    levels = dict(zip(GRAPH_OPTIMIZATION_LEVELS, (
+        ort.GraphOptimizationLevel.ORT_DISABLE_ALL, ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED, ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    )))
+    options = ort.SessionOptions()
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    if inter_op_threads:
+        options.inter_op_num_threads = inter_op_threads
+    options.enable_cpu_mem_arena = memory_arena
+    options.graph_optimization_level = levels[graph_optimization]
+    # Assuming CPU execution for broader compatibility (Termux)
+    providers = ["CPUExecutionProvider"]
+
+    if not optimized_cache or graph_optimization == "disable":
+        return ort.InferenceSession(onnx_file, options, providers=providers), False
+
+    cached = optimized_model_path(onnx_file, graph_optimization, ort.__version__)
+    if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(onnx_file):
+        options.graph_optimization_level = levels["disable"]
+        return ort.InferenceSession(cached, options, providers=providers), True
+
+    # Модель на read-only носії (/sdcard) - просто без кешу
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+    except OSError:
+        return ort.InferenceSession(onnx_file, options, providers=providers), False
+    if not os.access(os.path.dirname(cached), os.W_OK):
+        return ort.InferenceSession(onnx_file, options, providers=providers), False
+    # Тимчасове ім'я з pid: кілька воркерів можуть оптимізувати одночасно, os.replace атомарний
+    tmp = f"{cached[:-len('.onnx')]}.{os.getpid()}.tmp.onnx"
+    options.optimized_model_filepath = tmp
+    # Попередження "hardware specific optimizations" не про нас: кеш і так ключований архітектурою
+    options.log_severity_level = 3
+    session = ort.InferenceSession(onnx_file, options, providers=providers)
+    if os.path.exists(tmp):
+        os.replace(tmp, cached)
+    return session, False
+
+def quantize_model(model_dir: str, weight_type: str = "qint8", per_channel: bool = False) -> str:
+    """
+    Dynamic int8 quantization of model_dir/model.onnx into model.int8.onnx: weights are
+    stored as int8, activations are quantized per batch at run time (no calibration data).
+    Needs the 'onnx' package. Returns the path of the quantized model.
+    """
+    try:
+        from onnxruntime.quantization import quantize_dynamic, quant_pre_process, QuantType
+    except ImportError:
+        raise ImportError("Quantization needs onnxruntime and onnx. Run 'pip install onnxruntime onnx'.")
+    weight_types = {"qint8": QuantType.QInt8, "quint8": QuantType.QUInt8}
+    if weight_type not in weight_types:
+        raise ValueError(f"Unknown weight type '{weight_type}' (expected one of {', '.join(weight_types)}).")
+    src = _model_file(model_dir, FP32_MODEL)
+    dst = os.path.join(model_dir, QUANTIZED_MODEL)
+    # Через тимчасовий файл: обірваний запуск не лишає напівзаписану модель, яку "auto" взяв би
+    tmp = os.path.join(model_dir, f"model.int8.{os.getpid()}.tmp.onnx")
+    prepared = os.path.join(model_dir, f"model.prep.{os.getpid()}.tmp.onnx")
+    try:
+        # Рекомендована підготовка: виведення форм і злиття вузлів, тоді квантизується більше MatMul
+        # (символьне виведення форм потребує sympy - без нього). Граф, на якому вона падає, - як є
         try:
-            import onnxruntime as ort
-            from transformers import AutoTokenizer
-        except ImportError:
-            raise ImportError("onnxruntime or transformers is not installed. Run 'pip install onnxruntime transformers'.")
-
-        onnx_file = os.path.join(model_dir, "model.onnx")
-        if not os.path.exists(onnx_file):
-             raise FileNotFoundError(f"ONNX model not found at {onnx_file}. Run 'python3 export_to_onnx.py' first.")
-
-        print(f"Loading ONNX Embedder from {model_dir}...")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
-        # Assuming CPU execution for broader compatibility (Termux)
-        self.session = ort.InferenceSession(onnx_file, providers=["CPUExecutionProvider"])
-
-    def encode(self, texts: List[str]) -> np.ndarray:
-        # Tokenize
-        inputs = self.tokenizer(texts, padding=True, truncation=True, return_tensors="np")
-        
+            quant_pre_process(src, prepared, skip_symbolic_shape=True)
+            source = prepared
+        except Exception as e:
+            print(f"⚠️  Pre-processing failed ({e}); quantizing the graph as is.")
+            source = src
+        quantize_dynamic(source, tmp, weight_type=weight_types[weight_type], per_channel=per_channel)
+        os.replace(tmp, dst)
+    finally:
+        for path in (tmp, prepared):
+            if os.path.exists(path):
+                os.remove(path)
+    return dst
+
+class OnnxEmbedder(BaseEmbedder):
+    """
+    Sentence embeddings from an exported transformer (model.onnx + tokenizer files in model_dir),
+    mean-pooled and normalized. model_file: see resolve_model_file(); session options
+    are passed through to create_session().
+    """
+
+    def __init__(self, model_dir: str, batch_size: int = None, verbose: bool = True, model_file: str = "auto",
+                 **session_options):
+        _, AutoTokenizer = _import_runtime()
+        onnx_file = _model_file(model_dir, model_file)
+
+        if verbose:
+            print(f"Loading ONNX Embedder from {model_dir} ({os.path.basename(onnx_file)})...")
+        with metrics.span("embed.onnx.load"):
+            self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+            self.session, cache_hit = create_session(onnx_file, **session_options)
+        metrics.count("embed.onnx.optimized_cache_hits" if cache_hit else "embed.onnx.optimized_cache_misses")
+        if batch_size:
+            self.batch_size = batch_size
+
+        hidden_size = _hidden_size(model_dir)
+        if hidden_size:
+            self._dimension = hidden_size
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        # Tokenize (padding лише до найдовшого тексту в батчі)
+        with metrics.span("embed.onnx.tokenize"):
+            inputs = self.tokenizer(texts, padding=True, truncation=True, return_tensors="np")
+
         # Inference
-        outputs = self.session.run(None, dict(inputs))
-        
+        with metrics.span("embed.onnx.run", shape=list(inputs["input_ids"].shape)) as s:
+            outputs = self.session.run(None, dict(inputs))
+        if s is not None:
+            # Реальні токени (без padding) і пропускна здатність моделі
+            tokens = int(inputs["attention_mask"].sum())
+            metrics.count("embed.onnx.tokens", tokens)
+            metrics.count("embed.onnx.padded_tokens", int(inputs["input_ids"].size))
+            metrics.observe("embed.onnx.tokens_per_s", tokens / max(s.elapsed, 1e-9))
+
         # Mean Pooling (attention mask aware) - common logic for sentence-transformers models
         last_hidden_state = outputs[0]
         attention_mask = inputs['attention_mask']
-        
+
         input_mask_expanded = np.expand_dims(attention_mask, -1)
         input_mask_expanded = np.broadcast_to(input_mask_expanded, last_hidden_state.shape)
-        
+
         sum_embeddings = np.sum(last_hidden_state * input_mask_expanded, axis=1)
         sum_mask = np.clip(input_mask_expanded.sum(axis=1), a_min=1e-9, a_max=None)
-        
+
         embeddings = sum_embeddings / sum_mask
-        
+
         # Normalize
         norm = np.linalg.norm(embeddings, axis=1, keepdims=True)
         return embeddings / norm
+
+# --- Пул процесів: по сесії на воркера ---
+
+_worker_embedder = None
+
+def _init_worker(model_dir: str, model_file: str, session_options: dict):
+    global _worker_embedder
+    _worker_embedder = OnnxEmbedder(model_dir, verbose=False, model_file=model_file, **session_options)
+
+def _encode_in_worker(texts: List[str]):
+    # Воркер не бачить metrics головного процесу: час батчу повертається з результатом
+    start = time.perf_counter()
+    vectors = _worker_embedder.encode_batch(texts)
+    return vectors, time.perf_counter() - start
+
+class OnnxEmbedderPool(BaseEmbedder):
+    """
+    `workers` processes, each with its own OnnxEmbedder session; encode() spreads the
+    length-sorted batches across them. One session rarely keeps many cores busy on
+    small batches (tokenization and pooling are single-threaded), several do.
+    Unless intra_op_threads is set, the cores are split evenly between the sessions.
+    """
+
+    def __init__(self, model_dir: str, workers: int, batch_size: int = None, model_file: str = "auto",
+                 **session_options):
+        _import_runtime()
+        onnx_file = _model_file(model_dir, model_file)
+        self.workers = max(1, workers)
+        if not session_options.get("intra_op_threads"):
+            session_options["intra_op_threads"] = max(1, (os.cpu_count() or 1) // self.workers)
+        if batch_size:
+            self.batch_size = batch_size
+        self._dimension = _hidden_size(model_dir)
+
+        print(f"Loading ONNX Embedder from {model_dir} ({os.path.basename(onnx_file)}) in {self.workers} worker processes "
+              f"({session_options['intra_op_threads']} threads each)...")
+        # Оптимізований граф готуємо один раз тут, а не в кожному воркері паралельно
+        if session_options.get("optimized_cache", True) and session_options.get("graph_optimization", "all") != "disable":
+            with metrics.span("embed.onnx.prepare"):
+                create_session(onnx_file, **session_options)
+        # spawn, а не fork: onnxruntime і tokenizers не переживають fork з потоками, що вже працюють
+        import multiprocessing
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(model_dir, os.path.basename(onnx_file), session_options))
+        if not self._dimension:
+            self._dimension = self.pool.submit(_encode_in_worker, ["dimension probe"]).result()[0].shape[1]
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.pool.submit(_encode_in_worker, texts).result()[0]
+
+    def encode(self, texts: List[str], batch_size: Optional[int] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Like BaseEmbedder.encode(), with up to workers * BATCHES_IN_FLIGHT batches in flight."""
+        batch_size = batch_size or self.batch_size
+        if out is None:
+            out = np.empty((len(texts), self.dimension()), dtype=np.float32)
+        if not texts:
+            return out
+
+        batches = self._batches(texts, batch_size)
+        progress = None
+        if len(batches) > 1:
+            from tqdm import tqdm
+            progress = tqdm(total=len(batches), desc="Embedding", unit="batch")
+
+        def collect(idx, future):
+            vectors, elapsed = future.result()
+            out[idx] = vectors
+            metrics.observe("embed.texts_per_s", len(idx) / max(elapsed, 1e-9))
+            if progress is not None:
+                progress.update()
+
+        # Результати забираємо по порядку вікном: пам'ять - лише батчі в дорозі
+        pending = deque()
+        try:
+            for idx in batches:
+                pending.append((idx, self.pool.submit(_encode_in_worker, [texts[i] for i in idx])))
+                if len(pending) >= self.workers * BATCHES_IN_FLIGHT:
+                    collect(*pending.popleft())
+            while pending:
+                collect(*pending.popleft())
+        finally:
+            # Ctrl+C: не рахуємо батчі, які ще в черзі
+            for _, future in pending:
+                future.cancel()
+            if progress is not None:
+                progress.close()
+        metrics.count("embed.texts", len(texts))
+        return out
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
@@ -1,16 +1,24 @@
 from typing import List
 import numpy as np
 from .base import BaseEmbedder
+from .. import metrics
 
 class TorchEmbedder(BaseEmbedder):
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, batch_size: int = None):
         try:
             from sentence_transformers import SentenceTransformer
         except ImportError:
             raise ImportError("sentence-transformers is not installed. Run 'pip install sentence-transformers'.")
         
         print(f"Loading Torch Embedder: {model_name}...")
-        self.model = SentenceTransformer(model_name)
+        with metrics.span("embed.torch.load"):
+            self.model = SentenceTransformer(model_name)
+        if batch_size:
+            self.batch_size = batch_size
 
-    def encode(self, texts: List[str]) -> np.ndarray:
-        return self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        with metrics.span("embed.torch.encode", size=len(texts)):
+            return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False)
+
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
@@ -1,11 +1,29 @@
+import time
+import httpx
 import ollama
 from .base import BaseLLM
+from .. import metrics
+
+def is_transient(error: Exception) -> bool:
+    """Worth retrying: connection problems, timeouts and 5xx. 4xx (unknown model, bad request) are not."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500
+    # ConnectionError - так ollama.Client повідомляє про відмову з'єднання
+    return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
 
 class OllamaLLM(BaseLLM):
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, host: str = None, timeout: float = 120, retries: int = 3, backoff: float = 1.0):
         self.model_name = model_name
+        self.retries = retries
+        self.backoff = backoff
+        # Client потокобезпечний (httpx), тож один екземпляр на всі паралельні запити
+        self.client = ollama.Client(host=host, timeout=timeout)
 
     def generate_summary(self, code_snippet: str) -> str:
+        """
+        Raises the last error if all retries failed (or at once if it is not transient),
+        so the caller can leave the entity unsummarized instead of storing a bogus summary.
+        """
         prompt = f"""
         Analyze this code.
         Code:
@@ -14,11 +32,29 @@ class OllamaLLM(BaseLLM):
         Output a single sentence describing the BUSINESS RESPONSIBILITY.
         Do not describe syntax. Start with a verb.
         """
-        try:
-            res = ollama.chat(model=self.model_name, messages=[
-                {'role': 'user', 'content': prompt}
-            ])
-            return res['message']['content'].strip()
-        except Exception as e:
-            print(f"Ollama Error: {e}")
-            return "Analysis failed"
+        for attempt in range(self.retries + 1):
+            try:
+                metrics.count("llm.ollama.requests")
+                with metrics.span("llm.ollama.chat", model=self.model_name, attempt=attempt):
+                    res = self.client.chat(model=self.model_name, messages=[
+                        {'role': 'user', 'content': prompt}
+                    ])
+                self._record_usage(res)
+                return res['message']['content'].strip()
+            except Exception as e:
+                metrics.count("llm.ollama.errors")
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                metrics.count("llm.ollama.retries")
+                delay = self.backoff * (2 ** attempt)
+                print(f"Ollama Error: {e}. Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    @staticmethod
+    def _record_usage(res):
+        # Ollama повертає кількість токенів і час генерації (нс) на стороні сервера
+        if not metrics.enabled(): return
+        prompt_tokens, tokens, duration = res.get("prompt_eval_count"), res.get("eval_count"), res.get("eval_duration")
+        if prompt_tokens: metrics.count("llm.ollama.prompt_tokens", prompt_tokens)
+        if tokens: metrics.count("llm.ollama.output_tokens", tokens)
+        if tokens and duration: metrics.observe("llm.ollama.tokens_per_s", tokens / (duration / 1e9))
@@ -0,0 +1,169 @@
+import os
+import numpy as np
+from typing import Callable, Optional
+from .search import normalize, select_top_k
+
+# Квантизація матриці ембедингів (чистий NumPy, як search.py/ann.py):
+#   sq8 - скалярна: кожен вимір -> uint8 (min + step * code), 4x менше за float32
+#   pq  - продуктова: вектор ріжеться на m підпросторів, кожен кодується
+#         номером центроїда (uint8) свого codebook-а, dim*4/m разів менше
+# Коди лежать в окремому .npy (mmap), параметри - в .npz поруч.
+# Пошук сканує коди, а потім точно перераховує невеликий список кандидатів.
+
+FORMAT_VERSION = 1
+METHODS = ("sq8", "pq")
+
+def kmeans(data: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Plain (Euclidean) k-means. Returns k x dim centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iters):
+        # argmin ||x - c||^2 = argmax (x.c - ||c||^2 / 2)
+        labels = np.argmax(data @ centroids.T - 0.5 * np.einsum("ij,ij->i", centroids, centroids), axis=1)
+        counts = np.bincount(labels, minlength=k)
+        present = counts > 0
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+        centroids[present] = np.add.reduceat(data[order], starts, axis=0) / counts[present, None]
+        # Порожні кластери - на випадкові точки
+        if not present.all():
+            centroids[~present] = data[rng.choice(len(data), int((~present).sum()), replace=False)]
+    return centroids
+
+def default_pq_m(dim: int) -> int:
+    """Subspaces of 4 dims (16x smaller than float32), or the largest divisor of dim below that."""
+    for m in range(max(1, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+class QuantizedIndex:
+    """Compressed copy of the embedding matrix with approximate dot-product scoring."""
+
+    def __init__(self, method: str, codes: np.ndarray, params: dict):
+        self.method = method
+        self.codes = codes
+        self.params = params
+
+    @property
+    def rows(self) -> int:
+        return len(self.codes)
+
+    @property
+    def dim(self) -> int:
+        if self.method == "sq8":
+            return len(self.params["lo"])
+        m, _, sub = self.params["codebooks"].shape
+        return m * sub
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(v.nbytes for v in self.params.values())
+
+    # --- Побудова ---
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, method: str = "sq8", m: int = 0, sample: int = 16384,
+              seed: int = 0, chunk: int = 65536, alloc: Optional[Callable] = None) -> "QuantizedIndex":
+        """
+        Encodes `matrix` chunk by chunk (it may be memory-mapped).
+        alloc(shape) returns the uint8 array the codes are written to (e.g. a memmap).
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown quantization method '{method}' (expected one of {', '.join(METHODS)})")
+        n, dim = matrix.shape
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(n, size=min(n, sample), replace=False))
+        train = np.asarray(matrix[rows], dtype=np.float32)
+
+        if method == "sq8":
+            lo = train.min(axis=0)
+            step = np.maximum(train.max(axis=0) - lo, 1e-12) / 255.0
+            params = {"lo": lo.astype(np.float32), "step": step.astype(np.float32)}
+            shape = (n, dim)
+        else:
+            m = m or default_pq_m(dim)
+            if dim % m:
+                raise ValueError(f"pq: dimension {dim} is not divisible by m={m}")
+            ksub = min(256, len(train))
+            sub = dim // m
+            codebooks = np.stack([
+                kmeans(train[:, j * sub:(j + 1) * sub], ksub, seed=seed + j) for j in range(m)
+            ]).astype(np.float32)
+            params = {"codebooks": codebooks}
+            shape = (n, m)
+
+        codes = alloc(shape) if alloc is not None else np.empty(shape, dtype=np.uint8)
+        index = cls(method, codes, params)
+        for start in range(0, n, chunk):
+            codes[start:start + chunk] = index.encode(np.asarray(matrix[start:start + chunk], dtype=np.float32))
+        return index
+
+    def encode(self, block: np.ndarray) -> np.ndarray:
+        if self.method == "sq8":
+            q = np.rint((block - self.params["lo"]) / self.params["step"])
+            return np.clip(q, 0, 255).astype(np.uint8)
+        codebooks = self.params["codebooks"]
+        m, _, sub = codebooks.shape
+        out = np.empty((len(block), m), dtype=np.uint8)
+        for j in range(m):
+            part = block[:, j * sub:(j + 1) * sub]
+            c = codebooks[j]
+            out[:, j] = np.argmax(part @ c.T - 0.5 * np.einsum("ij,ij->i", c, c), axis=1)
+        return out
+
+    # --- Пошук ---
+
+    def scores(self, query: np.ndarray, chunk: int = 4096) -> np.ndarray:
+        """Approximate dot products of every row with a unit query."""
+        n = len(self.codes)
+        out = np.empty(n, dtype=np.float32)
+        if self.method == "sq8":
+            # q.x ~= q.lo + (q * step).code
+            w = (query * self.params["step"]).astype(np.float32)
+            bias = float(query @ self.params["lo"])
+            for start in range(0, n, chunk):
+                out[start:start + chunk] = self.codes[start:start + chunk].astype(np.float32) @ w + bias
+            return out
+        # PQ: таблиця q_j . centroid для кожного підпростору, далі - сума lookup-ів
+        codebooks = self.params["codebooks"]
+        m, _, sub = codebooks.shape
+        lut = np.einsum("jkd,jd->jk", codebooks, query.reshape(m, sub))
+        cols = np.arange(m)
+        for start in range(0, n, chunk):
+            out[start:start + chunk] = lut[cols, self.codes[start:start + chunk]].sum(axis=1)
+        return out
+
+    def search(self, query: np.ndarray, k: int = 5, min_score=None, matrix: Optional[np.ndarray] = None, rescore: int = 10):
+        """
+        Scans the codes; if the float `matrix` is given, the best k * rescore
+        candidates are rescored exactly. Returns (indices, scores).
+        """
+        q = normalize(query)
+        approx = self.scores(q)
+        if matrix is None:
+            return select_top_k(approx, k, min_score)
+        cand, _ = select_top_k(approx, k * max(1, rescore))
+        cand = np.sort(cand)
+        idx, exact = select_top_k(matrix[cand] @ q.astype(matrix.dtype, copy=False), k, min_score)
+        return cand[idx], exact
+
+    # --- Файли ---
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=FORMAT_VERSION, method=self.method, rows=self.rows, **self.params)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, codes_path: str, rows: Optional[int] = None, mmap_mode="r") -> Optional["QuantizedIndex"]:
+        """Returns None if the files are absent or were built for a matrix of a different size."""
+        if not os.path.exists(path) or not os.path.exists(codes_path): return None
+        with np.load(path) as data:
+            if int(data["version"]) != FORMAT_VERSION: return None
+            method = str(data["method"])
+            params = {key: data[key] for key in data.files if key not in ("version", "method", "rows")}
+        codes = np.load(codes_path, mmap_mode=mmap_mode)
+        if rows is not None and len(codes) != rows: return None
+        return cls(method, codes, params)
@@ -0,0 +1,190 @@
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Union
+from . import metrics
+from .parser import CodeParser, PARSER_VERSION, hash_bytes
+from .schema import CodeEntity, EntitySummary
+from .walker import Walker
+
+CHUNKS_IN_FLIGHT = 4  # на воркера: скільки чанків файлів чекають у пулі, поки запис відстає
+
+def _field(entity, name):
+    return entity.get(name) if isinstance(entity, dict) else getattr(entity, name)
+
+def carry_over(new: CodeEntity, old: Union[CodeEntity, dict, None]) -> bool:
+    """
+    Copies summary/responsibility/confidence from the previous scan
+    if the entity body did not change. old may be an entity or its plain record.
+    Returns True if anything was kept.
+    """
+    if old is None or not _field(old, "body_hash") or _field(old, "body_hash") != new.body_hash:
+        return False
+    summary = _field(old, "summary")
+    new.summary = EntitySummary(**summary) if isinstance(summary, dict) else summary
+    new.responsibility = _field(old, "responsibility")
+    new.confidence = _field(old, "confidence")
+    return True
+
+def _previous(entities, eid: str):
+    # Зі сховища беремо plain-запис: get() закешував би pydantic-об'єкт на весь scan
+    get_record = getattr(entities, "get_record", None)
+    return get_record(eid) if get_record is not None else entities.get(eid)
+
+# --- Parsing (serial або в пулі процесів) ---
+
+_worker_parser: Optional[CodeParser] = None
+
+def _init_worker():
+    # Кожен воркер створює CodeParser один раз, тож Parser/Query компілюються раз на мову
+    global _worker_parser
+    _worker_parser = CodeParser()
+
+def _process_file(p: CodeParser, task):
+    """
+    Reads and hashes a file; parses it only if the hash differs from the previous one.
+    Returns (digest, entities, timings) where entities is None for unchanged content,
+    or (None, None, timings) if the file could not be read.
+    timings = (read+hash seconds, parse seconds, bytes): воркери не бачать
+    metrics головного процесу, тож час повертається разом з результатом.
+    """
+    path, prev_hash = task
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            code_bytes = f.read()
+    except Exception as e:
+        print(f"Read error {path}: {e}")
+        return None, None, (time.perf_counter() - start, 0.0, 0)
+
+    digest = hash_bytes(code_bytes)
+    read_time = time.perf_counter() - start
+    if digest == prev_hash:
+        return digest, None, (read_time, 0.0, len(code_bytes))
+    entities = p.parse_bytes(path, code_bytes)
+    return digest, entities, (read_time, time.perf_counter() - start - read_time, len(code_bytes))
+
+def _process_chunk(tasks):
+    return [_process_file(_worker_parser, task) for task in tasks]
+
+def _run_tasks(p: CodeParser, tasks, jobs: int):
+    """Yields _process_file results in the same order as tasks."""
+    if jobs <= 1 or len(tasks) < 2:
+        for task in tasks:
+            yield _process_file(p, task)
+        return
+
+    chunksize = max(1, min(64, len(tasks) // (jobs * 8)))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+        # Чанки подаються вікном, а не всі одразу (як у pool.map): готові сутності
+        # не накопичуються в пам'яті, якщо споживач повільніший за воркерів
+        pending = deque()
+        for i in range(0, len(tasks), chunksize):
+            pending.append(pool.submit(_process_chunk, tasks[i:i + chunksize]))
+            if len(pending) >= jobs * CHUNKS_IN_FLIGHT:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+class ScanStream:
+    """
+    Rescans only files whose size/mtime/content hash differ from the manifest,
+    as a stream: iterating yields, in walk order, new CodeEntity objects for
+    (re)parsed files and plain ids for entities kept unchanged from `entities`
+    (the caller copies those from the previous index without decoding them).
+    Nothing is accumulated, so memory does not grow with the repository;
+    .manifest and .stats are complete once the stream is exhausted.
+    With jobs > 1 files are read and parsed in a process pool; the output
+    is identical to the serial run.
+    """
+
+    def __init__(self, root, p: CodeParser, entities, manifest: Dict[str, dict], jobs: int = 1,
+                 walker: Optional[Walker] = None):
+        self.root = root
+        self.parser = p
+        self.walker = walker or Walker(root)
+        self.entities = entities
+        self.old_manifest = manifest
+        self.jobs = jobs
+        self.manifest: Dict[str, dict] = {}
+        self.stats = {"reparsed": 0, "skipped": 0, "removed": 0, "preserved": 0, "entities": 0, "too_large": 0}
+
+    def _plan(self):
+        # План: для кожного файлу або беремо сутності з маніфесту, або (пере)читаємо.
+        # Тут лише шляхи і stat - O(файлів), без сутностей
+        plan, tasks = [], []
+        for path, st in self.walker:
+            if not self.parser.supports(path): continue
+            prev = self.old_manifest.get(path)
+            known = (prev is not None and prev.get("parser") == PARSER_VERSION
+                     and all(eid in self.entities for eid in prev["entities"]))
+
+            # Дешева перевірка: розмір і mtime не змінились
+            if known and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+                plan.append((path, prev, None))
+                continue
+
+            plan.append((path, prev if known else None, st))
+            tasks.append((path, prev["hash"] if known else None))
+        return plan, tasks
+
+    def __iter__(self) -> Iterator[Union[CodeEntity, str]]:
+        start = time.time()
+        stats = self.stats
+        with metrics.span("scan.plan"):
+            plan, tasks = self._plan()
+        metrics.count("scan.files_seen", len(plan))
+        metrics.count("scan.files_too_large", self.walker.stats["too_large"])
+        self.stats["too_large"] = self.walker.stats["too_large"]
+
+        # Читаємо/парсимо змінені файли і віддаємо результат у порядку обходу.
+        # scan.files - wall time етапу (разом із записом споживача),
+        # scan.read/scan.parse - сума по файлах (по всіх воркерах)
+        with metrics.span("scan.files", jobs=self.jobs, files=len(tasks)):
+            results = _run_tasks(self.parser, tasks, self.jobs)
+            for path, prev, st in plan:
+                if st is None:
+                    self.manifest[path] = prev
+                    stats["skipped"] += 1
+                    stats["entities"] += len(prev["entities"])
+                    yield from prev["entities"]
+                    continue
+
+                digest, found, (read_time, parse_time, size) = next(results)
+                metrics.add_time("scan.read", read_time)
+                metrics.count("scan.bytes_read", size)
+                if found is not None:
+                    metrics.add_time("scan.parse", parse_time)
+                    metrics.count("scan.entities_parsed", len(found))
+                if digest is None: continue
+                entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest, "parser": PARSER_VERSION}
+
+                # mtime змінився (touch, checkout), але вміст той самий
+                if found is None:
+                    self.manifest[path] = {**entry, "entities": prev["entities"]}
+                    stats["skipped"] += 1
+                    stats["entities"] += len(prev["entities"])
+                    yield from prev["entities"]
+                    continue
+
+                # Файл новий або змінений
+                for e in found:
+                    # Незмінне тіло без summary нічого не зберігає - не рахуємо
+                    if carry_over(e, _previous(self.entities, e.id)) and e.summary is not None:
+                        stats["preserved"] += 1
+                self.manifest[path] = {**entry, "entities": list(dict.fromkeys(e.id for e in found))}
+                stats["reparsed"] += 1
+                stats["entities"] += len(found)
+                yield from found
+
+        stats["removed"] = len(set(self.old_manifest) - set(self.manifest))
+        stats["elapsed"] = time.time() - start
+
+def incremental_scan(root, p: CodeParser, entities: Dict[str, CodeEntity], manifest: Dict[str, dict], jobs: int = 1):
+    """
+    ScanStream collected into memory (for callers that need every entity object).
+    Returns (entities list, new manifest, stats).
+    """
+    scan = ScanStream(root, p, entities, manifest, jobs=jobs)
+    result: List[CodeEntity] = [entities[item] if isinstance(item, str) else item for item in scan]
+    return result, scan.manifest, scan.stats
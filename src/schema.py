@@ -19,6 +19,15 @@ class CodeEntity(BaseModel):
     side_effects: Optional[List[str]] = Field(default_factory=list)
     calls: Optional[List[str]] = Field(default_factory=list)
     called_by: Optional[List[str]] = Field(default_factory=list)
+
+    # Hash of the entity source; lets incremental scan keep summaries of unchanged code
+    body_hash: Optional[str] = None
+
+    # Location of the entity in its file (lines are 1-based, inclusive)
+    start_byte: Optional[int] = None
+    end_byte: Optional[int] = None
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
     
     # Confidence is mandatory
     confidence: Literal["low", "medium", "high"]
@@ -0,0 +1,67 @@
+import numpy as np
+
+# Чистий NumPy (без config/pydantic), щоб легкий search_index.py міг імпортувати цей модуль.
+
+def normalize_rows(matrix: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """L2-normalizes rows in place, chunk by chunk (works on memory-mapped arrays)."""
+    for start in range(0, len(matrix), chunk):
+        block = matrix[start:start + chunk]
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        np.maximum(norms, 1e-12, out=norms)
+        block /= norms
+    return matrix
+
+def normalize(vec: np.ndarray) -> np.ndarray:
+    vec = np.asarray(vec, dtype=np.float32)
+    return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+def row_norms(matrix: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """Row norms for legacy (non-normalized) matrices."""
+    out = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), chunk):
+        out[start:start + chunk] = np.linalg.norm(matrix[start:start + chunk], axis=1)
+    return np.maximum(out, 1e-12, out=out)
+
+def select_top_k(scores: np.ndarray, k: int, min_score=None):
+    """Indices of the k best scores (descending) via argpartition, optionally above min_score."""
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=scores.dtype)
+    if k < n:
+        idx = np.argpartition(scores, n - k)[n - k:]
+    else:
+        idx = np.arange(n)
+    idx = idx[np.argsort(scores[idx])[::-1]]
+    top = scores[idx]
+    if min_score is not None:
+        keep = top >= min_score
+        idx, top = idx[keep], top[keep]
+    return idx, top
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int = 5, min_score=None, norms=None):
+    """
+    Cosine top-k over a unit-normalized (possibly memory-mapped) matrix:
+    one GEMV plus argpartition, no matrix-sized temporaries.
+    Pass `norms` for legacy matrices that were saved without normalization.
+    Returns (indices, scores).
+    """
+    scores = matrix @ normalize(query).astype(matrix.dtype, copy=False)
+    if norms is not None:
+        scores /= norms
+    return select_top_k(scores, k, min_score)
+
+def top_k_batch(matrix: np.ndarray, queries: np.ndarray, k: int = 5, min_score=None, norms=None, max_block: int = 1 << 26):
+    """
+    Top-k for many queries at once: one matrix-matrix product per block of queries
+    (the block keeps the score matrix under max_block floats). Returns a list of (indices, scores).
+    """
+    q = normalize_rows(np.array(queries, dtype=np.float32)).astype(matrix.dtype, copy=False)
+    block = max(1, max_block // max(1, len(matrix)))
+    results = []
+    for start in range(0, len(q), block):
+        scores = q[start:start + block] @ matrix.T
+        if norms is not None:
+            scores /= norms
+        results.extend(select_top_k(row, k, min_score) for row in scores)
+    return results
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from . import config, storage, metrics
+from .ai import AIEngine
+from .client import SERVER_FILE_NAME
+from .vector_index import Searcher, result_record
+
+# 'serve': тримає embedder, матрицю і сутності в пам'яті та відповідає на
+# запити по HTTP на localhost. Адреса пишеться в .code-index/server.json,
+# звідки її беруть клієнти (main.py search, search_index.py).
+
+SERVER_FILE = os.path.join(config.INDEX_DIR, SERVER_FILE_NAME)
+
+# Файли, зміна яких означає, що індекс треба перечитати
+WATCHED_FILES = [
+    config.IDS_FILE, config.EMBEDDINGS_FILE, config.EMBEDDINGS_META_FILE,
+    config.ANN_FILE, config.QUANT_FILE, config.QUANT_CODES_FILE, config.LEXICAL_FILE,
+    os.path.join(config.INDEX_DIR, "entities.idx"), config.ENTITIES_FILE,
+    config.SQLITE_FILE, config.SQLITE_FILE + "-wal",
+]
+
+# Опції пошуку, які клієнт може передати разом із query/queries
+SEARCH_OPTIONS = ("k", "min_score", "nprobe", "exact", "mode")
+
+def _signature():
+    sig = []
+    for path in WATCHED_FILES:
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+class SearchService:
+    """Warm embedder + index; reloads the index when its files change on disk."""
+
+    def __init__(self):
+        self.engine = AIEngine(load_embedder=True)
+        self.lock = threading.Lock()
+        self.index: Optional[Searcher] = None
+        self.entities = None
+        self.signature = None
+        self.reload_if_changed()
+
+    def reload_if_changed(self) -> bool:
+        sig = _signature()
+        if sig == self.signature: return False
+        try:
+            index, entities = Searcher(), storage.load_entities()
+        except Exception as e:
+            # Файли якраз переписуються (embed/scan) - спробуємо на наступному запиті
+            print(f"⚠️  Reload failed, keeping the previous index: {e}")
+            return False
+        if self.entities is not None and hasattr(self.entities, "close"):
+            self.entities.close()
+        self.index, self.entities, self.signature = index, entities, sig
+        print(f"🔄 Index loaded: {len(index.vectors.ids)} vectors, lexical index: {'yes' if index.lexical else 'no'}.")
+        return True
+
+    def search(self, query: str, **options) -> dict:
+        reply = self.search_batch([query], **options)
+        if "error" not in reply:
+            reply["results"] = reply["results"][0]
+        return reply
+
+    def search_batch(self, queries, k: int = 5, min_score=None, nprobe=None, exact=False, mode=None) -> dict:
+        """One embed call and one scoring pass for all queries. "results" is a list per query."""
+        start = time.time()
+        queries = list(queries)
+        with self.lock, metrics.span("serve.request", queries=len(queries)):
+            metrics.count("serve.requests")
+            with metrics.span("serve.reload_check"):
+                self.reload_if_changed()
+            if self.index.empty:
+                return {"results": [], "error": "Index empty. Run 'scan' and 'embed'."}
+            q_vecs = None
+            if self.index.needs_embedding(mode):
+                with metrics.span("serve.embed", queries=len(queries)):
+                    q_vecs = self.engine.embed_texts(queries)
+            hits = self.index.query_batch(queries, q_vecs, k=k, min_score=min_score, nprobe=nprobe, exact=exact, mode=mode)
+            with metrics.span("serve.records"):
+                results = [[result_record(self.entities, eid, s) for eid, s in found] for found in hits]
+        return {"results": results, "elapsed_ms": (time.time() - start) * 1000}
+
+    def health(self) -> Dict:
+        return {"status": "ok", "pid": os.getpid(), "vectors": len(self.index.vectors.ids) if self.index else 0}
+
+def _make_handler(service: SearchService):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, service.health())
+            else:
+                self._reply(404, {"error": f"Unknown endpoint {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/search":
+                self._reply(404, {"error": f"Unknown endpoint {self.path}"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("expected a JSON object")
+                if "queries" not in payload and "query" not in payload:
+                    raise KeyError("query")
+                if "queries" in payload and not isinstance(payload["queries"], list):
+                    raise ValueError("'queries' must be a list")
+                # Невідомий ключ інакше дав би TypeError у search() і 500
+                unknown = sorted(set(payload) - {"query", "queries"} - set(SEARCH_OPTIONS))
+                if unknown:
+                    raise ValueError(f"unknown option(s) {', '.join(unknown)}; expected {', '.join(SEARCH_OPTIONS)}")
+            except (ValueError, KeyError) as e:
+                self._reply(400, {"error": f"Bad request: {e}"})
+                return
+            options = {key: payload[key] for key in SEARCH_OPTIONS if key in payload}
+            try:
+                if "queries" in payload:
+                    self._reply(200, service.search_batch(payload["queries"], **options))
+                else:
+                    self._reply(200, service.search(payload["query"], **options))
+            except Exception as e:
+                self._reply(500, {"error": str(e)})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+def serve(host: str = "127.0.0.1", port: int = 0):
+    """Runs the daemon in the foreground until Ctrl+C / SIGTERM."""
+    service = SearchService()
+    httpd = ThreadingHTTPServer((host, port), _make_handler(service))
+    host, port = httpd.server_address[:2]
+
+    storage.ensure_index_dir()
+    tmp = SERVER_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getpid(), "host": host, "port": port, "started": time.time()}, f)
+    os.replace(tmp, SERVER_FILE)
+
+    # SIGTERM -> той самий шлях, що й Ctrl+C, щоб прибрати server.json
+    signal.signal(signal.SIGTERM, _interrupt)
+    print(f"🚀 Serving {config.INDEX_DIR} on http://{host}:{port} (pid {os.getpid()}). Press Ctrl+C to stop.")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        httpd.server_close()
+        try:
+            with open(SERVER_FILE, "r", encoding="utf-8") as f:
+                if json.load(f).get("pid") == os.getpid():
+                    os.remove(SERVER_FILE)
+        except (OSError, ValueError):
+            pass
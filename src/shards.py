@@ -0,0 +1,183 @@
+import os
+import json
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from . import storage, metrics
+from .config import SHARDS_FILE, SHARD_WORKERS, INDEX_DIR, SEARCH_RRF_K
+from .vector_index import Searcher, result_record
+
+# Каталог шардів: іменовані індекси (по одному на репозиторій, мову, ...), кожен -
+# звичайна папка .code-index зі своєю матрицею і сховищем сутностей, тож шард
+# перебудовується окремо (scan/embed у своєму репозиторії). Каталог лежить поруч
+# із config.yaml і спільний для всіх репозиторіїв користувача.
+# Пошук іде по всіх шардах паралельно (numpy відпускає GIL), top-k кожного
+# зливається купою: затримка росте з найбільшим шардом, а не з сумою.
+
+def load_catalog() -> Dict[str, dict]:
+    """{name: {"path": absolute index dir}} in registration order."""
+    if not os.path.exists(SHARDS_FILE): return {}
+    with open(SHARDS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f).get("shards", {})
+
+def save_catalog(catalog: Dict[str, dict]):
+    os.makedirs(os.path.dirname(SHARDS_FILE), exist_ok=True)
+    tmp = SHARDS_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "shards": catalog}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, SHARDS_FILE)
+
+def resolve_index_dir(path: str) -> str:
+    """A repository root (containing the configured index dir) or an index dir itself."""
+    path = os.path.abspath(os.path.expanduser(path))
+    nested = os.path.join(path, os.path.basename(os.path.normpath(INDEX_DIR)))
+    return nested if os.path.isdir(nested) else path
+
+def add_shard(name: str, path: str) -> str:
+    """Registers (or re-points) a shard. Returns the resolved index dir."""
+    if not name or "/" in name or "," in name:
+        raise ValueError(f"Invalid shard name '{name}' (no '/' or ',').")
+    index_dir = resolve_index_dir(path)
+    if not os.path.isdir(index_dir):
+        raise ValueError(f"No index at {index_dir}. Run 'scan' and 'embed' there first.")
+    catalog = load_catalog()
+    catalog[name] = {"path": index_dir}
+    save_catalog(catalog)
+    return index_dir
+
+def remove_shard(name: str) -> bool:
+    catalog = load_catalog()
+    if catalog.pop(name, None) is None: return False
+    save_catalog(catalog)
+    return True
+
+def select(names: Optional[str] = None) -> Dict[str, dict]:
+    """Catalog entries for 'a,b' (None or 'all' = every shard). Unknown names raise ValueError."""
+    catalog = load_catalog()
+    if not names or names == "all": return catalog
+    wanted = [n.strip() for n in names.split(",") if n.strip()]
+    unknown = [n for n in wanted if n not in catalog]
+    if unknown:
+        raise ValueError(f"Unknown shard(s): {', '.join(unknown)}. See 'shards list'.")
+    return {n: catalog[n] for n in wanted}
+
+def shard_info(index_dir: str) -> dict:
+    """Sizes and embedder of one shard without loading its matrix or decoding entities."""
+    info = {"exists": os.path.isdir(index_dir), "entities": 0, "vectors": 0, "dim": None, "embedder": None}
+    if not info["exists"]: return info
+    entities = storage.load_entities(index_dir)
+    info["entities"] = len(entities)
+    if hasattr(entities, "close"):
+        entities.close()
+    ids, matrix = storage.load_embeddings(mmap_mode="r", index_dir=index_dir)
+    info["vectors"] = len(ids)
+    if matrix is not None:
+        info["dim"] = int(matrix.shape[1])
+    info["embedder"] = storage.load_embeddings_meta(index_dir).get("embedder")
+    return info
+
+class ShardedSearcher:
+    """
+    Searcher per shard behind one query_batch(): shards are queried on a thread pool
+    and their top-k lists merged by score. Cosine (dense) and RRF (hybrid) scores are
+    comparable across shards; BM25 depends on each shard's statistics, so merged lexical
+    results are approximate. Shards whose mode differs (no vectors or no lexical index)
+    are fused by rank. Shards embedded with another model than the query's (or with
+    another dimension) are searched lexically only, see use_query_model().
+    """
+
+    def __init__(self, catalog: Dict[str, dict], workers: int = 0):
+        self.names = list(catalog)
+        workers = workers or SHARD_WORKERS or min(len(catalog), os.cpu_count() or 1)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="shard")
+        # Шарди вантажаться паралельно: читання ids.json/lexical.npz теж відпускає GIL
+        loaded = self.pool.map(lambda name: self._load(name, catalog[name]["path"]), self.names)
+        self.searchers: Dict[str, Searcher] = dict(zip(self.names, loaded))
+        self.paths = {name: catalog[name]["path"] for name in self.names}
+        self._entities: Dict[str, object] = {}
+        # Шарди, чиї вектори не порівнянні з вектором запиту: {name: причина}
+        self.lexical_only: Dict[str, str] = {}
+
+    @staticmethod
+    def _load(name: str, index_dir: str) -> Searcher:
+        with metrics.span("search.shard_load", shard=name):
+            return Searcher(index_dir)
+
+    @property
+    def empty(self) -> bool:
+        return all(s.empty for s in self.searchers.values())
+
+    def needs_embedding(self, requested: Optional[str] = None) -> bool:
+        return any(s.needs_embedding(requested) for s in self.searchers.values() if not s.empty)
+
+    def dense_mismatches(self, embedder: Optional[str], dim: Optional[int]) -> Dict[str, str]:
+        """{shard: reason} for shards whose vectors cannot be scored against the query model."""
+        mismatches = {}
+        for name, s in self.searchers.items():
+            if s.vectors.empty: continue
+            model = s.vectors.meta.get("embedder")
+            if dim is not None and s.vectors.dim != dim:
+                mismatches[name] = f"has {s.vectors.dim}-dim vectors, the query has {dim}"
+            elif embedder and model and model != embedder:
+                # Індекси без meta (старий embed) приймаємо, якщо збігається розмірність
+                mismatches[name] = f"was embedded with {model}"
+        return mismatches
+
+    def use_query_model(self, embedder: Optional[str], dim: Optional[int]) -> Dict[str, str]:
+        """Searches shards embedded with another model lexically only. Returns them with the reason."""
+        self.lexical_only = self.dense_mismatches(embedder, dim)
+        return self.lexical_only
+
+    def _mode(self, name: str, requested: Optional[str]) -> str:
+        return "lexical" if name in self.lexical_only else self.searchers[name].mode(requested)
+
+    def _query_shard(self, name: str, texts, q_vecs, options) -> List[List[Tuple[str, float]]]:
+        searcher = self.searchers[name]
+        if searcher.empty:
+            return [[] for _ in texts]
+        if name in self.lexical_only:
+            # Векторів цього шарду не порівняти із запитом: лише BM25 (або нічого)
+            if searcher.lexical is None:
+                return [[] for _ in texts]
+            q_vecs, options = None, {**options, "mode": "lexical"}
+        with metrics.span("search.shard", shard=name, queries=len(texts)):
+            return searcher.query_batch(texts, q_vecs, **options)
+
+    def query_batch(self, texts: List[str], q_vecs=None, k: int = 5, **options) -> List[List[Tuple[str, str, float]]]:
+        """Returns [(shard, id, score)] per text, best first across all shards."""
+        options["k"] = k
+        if q_vecs is not None and len(q_vecs):
+            # Без use_query_model() шард з іншою розмірністю впав би в потоці з ValueError
+            dim = len(q_vecs[0])
+            self.lexical_only.update(self.dense_mismatches(None, dim))
+        futures = [(name, self.pool.submit(self._query_shard, name, texts, q_vecs, options)) for name in self.names]
+        per_shard = [(name, f.result()) for name, f in futures]
+
+        # Шард без векторів шукає лише лексично, без lexical.npz - лише dense: шкали різні
+        # (BM25, cosine, RRF). Тоді не-hybrid списки переводимо в RRF за рангом,
+        # як одне ранжування з двох у hybrid
+        modes = {name: self._mode(name, options.get("mode")) for name, s in self.searchers.items() if not s.empty}
+        by_rank = {name for name, mode in modes.items() if mode != "hybrid"} if len(set(modes.values())) > 1 else set()
+        with metrics.span("search.merge", shards=len(per_shard)):
+            merged = []
+            for i in range(len(texts)):
+                hits = ((1.0 / (SEARCH_RRF_K + rank) if name in by_rank else score, name, eid)
+                        for name, found in per_shard for rank, (eid, score) in enumerate(found[i], 1))
+                merged.append([(name, eid, score) for score, name, eid in heapq.nlargest(k, hits)])
+        return merged
+
+    def query(self, text: str, q_vec=None, k: int = 5, **options) -> List[Tuple[str, str, float]]:
+        return self.query_batch([text], None if q_vec is None else [q_vec], k, **options)[0]
+
+    def record(self, shard: str, eid: str, score: float) -> dict:
+        """Search hit as a plain dict, like vector_index.result_record(), plus the shard name."""
+        entities = self._entities.get(shard)
+        if entities is None:
+            entities = self._entities[shard] = storage.load_entities(self.paths[shard])
+        return {"shard": shard, **result_record(entities, eid, score)}
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        for entities in self._entities.values():
+            if hasattr(entities, "close"):
+                entities.close()
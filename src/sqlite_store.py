@@ -0,0 +1,270 @@
+import os
+import json
+import sqlite3
+from typing import Dict, List, Optional
+from .entity_store import BaseEntityStore
+
+# Опційний SQLite-бекенд (storage.backend: sqlite).
+# WAL дозволяє читати індекс (status/search), поки scan/summarize пишуть,
+# а кожен checkpoint - це одна транзакція з upsert-ами лише змінених рядків.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    confidence TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entities_confidence ON entities(confidence);
+CREATE INDEX IF NOT EXISTS entities_path ON entities(path);
+CREATE INDEX IF NOT EXISTS entities_symbol ON entities(symbol);
+CREATE INDEX IF NOT EXISTS entities_seq ON entities(seq);
+
+CREATE TABLE IF NOT EXISTS intents (
+    id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+def connect(db_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    # isolation_level=None: транзакції відкриваємо явно (BEGIN IMMEDIATE).
+    # check_same_thread=False: 'serve' читає з потоків HTTP-сервера (під своїм lock-ом)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+class Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+def _row(entity, seq):
+    data = entity.model_dump(exclude_none=True)
+    return (entity.id, seq, entity.path, entity.symbol, entity.confidence, json.dumps(data, ensure_ascii=False))
+
+UPSERT_SQL = """
+INSERT INTO entities (id, seq, path, symbol, confidence, data) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    path = excluded.path, symbol = excluded.symbol,
+    confidence = excluded.confidence, data = excluded.data
+"""
+
+# Як UPSERT_SQL, але рядок зі старим seq (< base) отримує новий: дублікати id у потоці
+# лишають першу позицію і останній запис, як і у бінарному сховищі
+SCAN_UPSERT_SQL = """
+INSERT INTO entities (id, seq, path, symbol, confidence, data) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    seq = CASE WHEN seq < ? THEN excluded.seq ELSE seq END,
+    path = excluded.path, symbol = excluded.symbol,
+    confidence = excluded.confidence, data = excluded.data
+"""
+
+class SqliteEntityStore(BaseEntityStore):
+    """
+    Lazy {id: CodeEntity} map over the SQLite entities table.
+    Changes are staged in memory and written by save()/upsert() in one transaction.
+    Like the binary store, save() rewrites every loaded entity (they may be mutated in place);
+    use upsert() to write just the rows that changed.
+    """
+
+    def __init__(self, db_path: str):
+        self.conn = connect(db_path)
+        self._ids = dict.fromkeys(r[0] for r in self.conn.execute("SELECT id FROM entities ORDER BY seq"))
+        self._loaded = {}
+        self._deleted = set()
+
+    def close(self):
+        self.conn.close()
+
+    # --- Raw access (без pydantic) ---
+
+    def get_record(self, eid: str, default=None) -> Optional[dict]:
+        if eid in self._loaded:
+            return self._loaded[eid].model_dump(exclude_none=True)
+        if eid not in self._ids:
+            return default
+        row = self.conn.execute("SELECT data FROM entities WHERE id = ?", (eid,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def iter_records(self):
+        seen = set()
+        for eid, data in self.conn.execute("SELECT id, data FROM entities ORDER BY seq"):
+            if eid in self._deleted: continue
+            seen.add(eid)
+            yield self._loaded[eid].model_dump(exclude_none=True) if eid in self._loaded else json.loads(data)
+        # Ще не збережені нові сутності
+        for eid, e in self._loaded.items():
+            if eid not in seen and eid in self._ids:
+                yield e.model_dump(exclude_none=True)
+
+    def ids_by_confidence(self, confidence: str) -> List[str]:
+        # Індекс по confidence: "усі low" - це index scan, а не повний прохід
+        ids = [r[0] for r in self.conn.execute(
+            "SELECT id FROM entities WHERE confidence = ? ORDER BY seq", (confidence,))]
+        if not self._loaded and not self._deleted:
+            return ids
+        ids = [eid for eid in ids if eid not in self._deleted and
+               (eid not in self._loaded or self._loaded[eid].confidence == confidence)]
+        seen = set(ids)
+        ids += [eid for eid, e in self._loaded.items() if eid not in seen and e.confidence == confidence]
+        return ids
+
+    def confidence_counts(self) -> Dict[str, int]:
+        counts = {"low": 0, "medium": 0, "high": 0}
+        if not self._loaded and not self._deleted:
+            for conf, n in self.conn.execute("SELECT confidence, COUNT(*) FROM entities GROUP BY confidence"):
+                counts[conf] = n
+            return counts
+        for conf in ("low", "medium", "high"):
+            counts[conf] = len(self.ids_by_confidence(conf))
+        return counts
+
+    # --- Mapping API ---
+
+    def __getitem__(self, eid: str):
+        entity = self._loaded.get(eid)
+        if entity is not None:
+            return entity
+        if eid not in self._ids:
+            raise KeyError(eid)
+        row = self.conn.execute("SELECT data FROM entities WHERE id = ?", (eid,)).fetchone()
+        if row is None:
+            raise KeyError(eid)
+        from .schema import CodeEntity
+        entity = CodeEntity(**json.loads(row[0]))
+        self._loaded[eid] = entity
+        return entity
+
+    def __setitem__(self, eid: str, entity):
+        self._loaded[eid] = entity
+        self._deleted.discard(eid)
+        self._ids.setdefault(eid, None)
+
+    def __delitem__(self, eid: str):
+        del self._ids[eid]
+        self._loaded.pop(eid, None)
+        self._deleted.add(eid)
+
+    def __contains__(self, eid) -> bool:
+        return eid in self._ids
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # --- Writes ---
+
+    def _next_seq(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM entities").fetchone()[0]
+
+    def upsert(self, entities):
+        """Writes only the given entities (one transaction)."""
+        entities = list(entities)
+        for e in entities:
+            self._loaded[e.id] = e
+            self._ids.setdefault(e.id, None)
+            self._deleted.discard(e.id)
+        with Transaction(self.conn) as conn:
+            seq = self._next_seq()
+            conn.executemany(UPSERT_SQL, [_row(e, seq + n) for n, e in enumerate(entities)])
+
+    def save(self, manifest: Optional[Dict[str, dict]] = None):
+        """
+        Writes all staged changes: upserts loaded entities and deletes removed ones.
+        manifest: scan state to replace in the same transaction.
+        """
+        with Transaction(self.conn) as conn:
+            if self._deleted:
+                conn.executemany("DELETE FROM entities WHERE id = ?", [(eid,) for eid in self._deleted])
+            seq = self._next_seq()
+            loaded = [self._loaded[eid] for eid in self._ids if eid in self._loaded]
+            conn.executemany(UPSERT_SQL, [_row(e, seq + n) for n, e in enumerate(loaded)])
+            if manifest is not None:
+                write_manifest(conn, manifest)
+        self._deleted.clear()
+
+    def replace_all(self, entities, manifest: Optional[Dict[str, dict]] = None):
+        """Replaces the whole table (and the manifest, if given) atomically."""
+        with Transaction(self.conn) as conn:
+            conn.execute("DELETE FROM entities")
+            conn.executemany(UPSERT_SQL, (_row(e, n) for n, e in enumerate(entities)))
+            if manifest is not None:
+                write_manifest(conn, manifest)
+        self._ids = dict.fromkeys(r[0] for r in self.conn.execute("SELECT id FROM entities ORDER BY seq"))
+        self._loaded = {}
+        self._deleted.clear()
+
+    def replace_stream(self, items, manifest: Optional[Dict[str, dict]] = None) -> int:
+        """
+        Replaces the table with a scan stream in one transaction: CodeEntity objects are
+        upserted, plain ids keep their existing row (not re-read). Rows the stream did
+        not mention are deleted at the end. manifest (filled while the stream runs) is
+        written in the same transaction. Returns the number of entities.
+        """
+        with Transaction(self.conn) as conn:
+            # Нові seq починаються після старих: все, що лишилось нижче base, - видалене
+            base = self._next_seq()
+            seq = base
+            for item in items:
+                if isinstance(item, str):
+                    conn.execute("UPDATE entities SET seq = ? WHERE id = ? AND seq < ?", (seq, item, base))
+                else:
+                    conn.execute(SCAN_UPSERT_SQL, (*_row(item, seq), base))
+                seq += 1
+            conn.execute("DELETE FROM entities WHERE seq < ?", (base,))
+            conn.execute("UPDATE entities SET seq = seq - ?", (base,))
+            if manifest is not None:
+                write_manifest(conn, manifest)
+        self._ids = dict.fromkeys(r[0] for r in self.conn.execute("SELECT id FROM entities ORDER BY seq"))
+        self._loaded = {}
+        self._deleted.clear()
+        return len(self._ids)
+
+# --- Intents & manifest ---
+
+def save_intents(conn: sqlite3.Connection, intents):
+    with Transaction(conn) as c:
+        c.execute("DELETE FROM intents")
+        c.executemany("INSERT INTO intents (id, seq, data) VALUES (?, ?, ?)", [
+            (i.id, n, json.dumps(i.model_dump(exclude_none=True), ensure_ascii=False))
+            for n, i in enumerate(intents)
+        ])
+
+def load_intents(conn: sqlite3.Connection) -> List[dict]:
+    return [json.loads(r[0]) for r in conn.execute("SELECT data FROM intents ORDER BY seq")]
+
+def write_manifest(conn: sqlite3.Connection, manifest: Dict[str, dict]):
+    """Replaces the files table inside the caller's transaction."""
+    conn.execute("DELETE FROM files")
+    conn.executemany("INSERT INTO files (path, data) VALUES (?, ?)", [
+        (path, json.dumps(entry, ensure_ascii=False)) for path, entry in manifest.items()
+    ])
+
+def save_manifest(conn: sqlite3.Connection, manifest: Dict[str, dict]):
+    with Transaction(conn) as c:
+        write_manifest(c, manifest)
+
+def load_manifest(conn: sqlite3.Connection) -> Dict[str, dict]:
+    return {path: json.loads(data) for path, data in conn.execute("SELECT path, data FROM files")}
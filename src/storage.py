@@ -1,50 +1,363 @@
 import os
 import json
-import numpy as np
-from typing import List, Dict
-from .config import INDEX_DIR, ENTITIES_FILE, INTENTS_FILE, EMBEDDINGS_FILE, IDS_FILE
-from .schema import CodeEntity, Intent
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, List, Dict, Iterable, Optional, Union
+from .config import (
+    INDEX_DIR, ENTITIES_FILE, INTENTS_FILE, EMBEDDINGS_FILE, IDS_FILE, EMBEDDINGS_META_FILE,
+    MANIFEST_FILE, SQLITE_FILE, STORAGE_BACKEND, ANN_FILE,
+    QUANT_FILE, QUANT_CODES_FILE, LEXICAL_FILE, CALLGRAPH_FILE,
+)
+from .entity_store import BaseEntityStore, EntityStore, INDEX_NAME, write_store, pack_entity
+
+# numpy і pydantic (schema) імпортуються у функціях, яким вони потрібні:
+# 'status', 'export' і лексичний пошук обходяться без них
+if TYPE_CHECKING:
+    import numpy as np
+    from .schema import CodeEntity, Intent
 
 def ensure_index_dir():
     os.makedirs(INDEX_DIR, exist_ok=True)
 
+def _in(index_dir: Optional[str], path: str) -> str:
+    # Той самий файл в іншій папці індексу (шард); None - налаштований INDEX_DIR
+    return path if index_dir is None else os.path.join(index_dir, os.path.basename(path))
+
+def _use_sqlite() -> bool:
+    return STORAGE_BACKEND == "sqlite"
+
+_sqlite_conn = None
+
+def _sqlite():
+    # Одне з'єднання на процес для intents/manifest
+    global _sqlite_conn
+    if _sqlite_conn is None:
+        from . import sqlite_store
+        _sqlite_conn = sqlite_store.connect(SQLITE_FILE)
+    return _sqlite_conn
+
 # --- Entities ---
-def save_entities(entities: List[CodeEntity]):
-    ensure_index_dir()
-    data = [e.model_dump(exclude_none=True) for e in entities]
-    with open(ENTITIES_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+# Основне сховище - бінарне (entity_store) або SQLite (storage.backend: sqlite).
+# entities.json лишається як людиночитний експорт (команда 'export') і як legacy-формат для читання.
+
+def save_entities(entities: Union[Iterable["CodeEntity"], Mapping[str, "CodeEntity"]],
+                  manifest: Optional[Dict[str, dict]] = None):
+    """
+    Persists a full entity set (replaces the previous one) or all changes of a loaded store.
+    manifest: scan state saved along with them - in the same transaction for SQLite,
+    right after the entity index for the binary store (see save_scan).
+    """
+    if _use_sqlite():
+        from .sqlite_store import SqliteEntityStore
+        if isinstance(entities, SqliteEntityStore):
+            entities.save(manifest)
+            return
+        if isinstance(entities, Mapping):
+            entities = entities.values()
+        with SqliteEntityStore(SQLITE_FILE) as store:
+            store.replace_all(entities, manifest)
+        return
+    if isinstance(entities, BaseEntityStore):
+        entities.save()
+    else:
+        if isinstance(entities, Mapping):
+            entities = entities.values()
+        write_store(INDEX_DIR, ((e.id, e.confidence, pack_entity(e)) for e in entities))
+    if manifest is not None:
+        save_manifest(manifest)
+
+def save_scan(previous: Mapping[str, "CodeEntity"], items: Iterable[Union["CodeEntity", str]],
+              manifest: Optional[Dict[str, dict]] = None) -> int:
+    """
+    Streams a scan (scanner.ScanStream) into a new entity set: CodeEntity objects are
+    serialized as they arrive, plain ids are copied from `previous` without decoding.
+    The new set replaces the old one atomically once the stream ends, so an interrupted
+    scan leaves the previous index intact. Returns the number of entities.
+    manifest (ScanStream.manifest) is read after the stream ends. SQLite commits it with
+    the entities; the binary store publishes it right after the index. A crash between
+    the two leaves an older manifest, which only makes the next scan re-hash those files.
+    """
+    if _use_sqlite():
+        from .sqlite_store import SqliteEntityStore
+        if isinstance(previous, SqliteEntityStore):
+            return previous.replace_stream(items, manifest)
+        with SqliteEntityStore(SQLITE_FILE) as store:
+            return store.replace_stream(items, manifest)
+
+    def records():
+        for item in items:
+            if not isinstance(item, str):
+                yield item.id, item.confidence, pack_entity(item)
+            elif isinstance(previous, EntityStore):
+                yield (item, *previous.packed(item))
+            else:
+                e = previous[item]
+                yield item, e.confidence, pack_entity(e)
+
+    index = write_store(INDEX_DIR, records())
+    if isinstance(previous, BaseEntityStore):
+        previous.close()
+    if manifest is not None:
+        save_manifest(manifest)
+    return len(index["ids"])
+
+def upsert_entities(entities: Mapping[str, "CodeEntity"], changed: List["CodeEntity"]):
+    """
+    Checkpoint for long runs: persists `changed` entities of a loaded map.
+    SQLite upserts just these rows in one transaction; other backends save everything.
+    """
+    if isinstance(entities, BaseEntityStore):
+        entities.upsert(changed)
+    else:
+        save_entities(entities)
 
-def load_entities() -> Dict[str, CodeEntity]:
-    if not os.path.exists(ENTITIES_FILE): return {}
-    with open(ENTITIES_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def load_entities(index_dir: Optional[str] = None) -> Mapping[str, "CodeEntity"]:
+    """
+    Returns a lazy {id: entity} map; records are decoded only when accessed.
+    Falls back to the legacy entities.json if the binary store does not exist yet.
+    index_dir: another index (a shard); its backend is detected from the files present.
+    """
+    folder = INDEX_DIR if index_dir is None else index_dir
+    sqlite_file = _in(index_dir, SQLITE_FILE)
+    if _sqlite_index(index_dir):
+        from .sqlite_store import SqliteEntityStore
+        return SqliteEntityStore(sqlite_file)
+    legacy_file = _legacy_file(index_dir)
+    if legacy_file is None:
+        return EntityStore(folder)
+    from .schema import CodeEntity
     # Повертаємо map {id: entity} для швидкого доступу
-    return {item["id"]: CodeEntity(**item) for item in data}
+    return {item["id"]: CodeEntity(**item) for item in _load_legacy_records(legacy_file)}
+
+def _sqlite_index(index_dir: Optional[str] = None) -> bool:
+    if index_dir is None:
+        return _use_sqlite()
+    return os.path.exists(_in(index_dir, SQLITE_FILE)) and not os.path.exists(os.path.join(index_dir, INDEX_NAME))
+
+def _legacy_file(index_dir: Optional[str] = None) -> Optional[str]:
+    """entities.json if it is the only entity store there (an index from before the binary format)."""
+    folder = INDEX_DIR if index_dir is None else index_dir
+    legacy_file = _in(index_dir, ENTITIES_FILE)
+    if _sqlite_index(index_dir) or os.path.exists(os.path.join(folder, INDEX_NAME)) or not os.path.exists(legacy_file):
+        return None
+    return legacy_file
+
+def _load_legacy_records(legacy_file: str) -> List[dict]:
+    with open(legacy_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+@contextmanager
+def open_entities(index_dir: Optional[str] = None):
+    """load_entities() that closes the store (its SQLite connection or mmap) on exit."""
+    entities = load_entities(index_dir)
+    try:
+        yield entities
+    finally:
+        if isinstance(entities, BaseEntityStore):
+            entities.close()
+
+def entity_ids(entities: Mapping[str, "CodeEntity"], confidence: Optional[str] = None) -> List[str]:
+    """Ids (optionally filtered by confidence) without decoding untouched records."""
+    if confidence is None:
+        return list(entities)
+    if isinstance(entities, BaseEntityStore):
+        return entities.ids_by_confidence(confidence)
+    return [eid for eid, e in entities.items() if e.confidence == confidence]
+
+def iter_entity_records(entities: Mapping[str, "CodeEntity"]) -> Iterable[dict]:
+    """Plain dict records (no pydantic objects for the binary store)."""
+    if isinstance(entities, BaseEntityStore):
+        return entities.iter_records()
+    return (e.model_dump(exclude_none=True) for e in entities.values())
+
+def get_entity_record(entities: Mapping[str, "CodeEntity"], eid: str) -> Optional[dict]:
+    """One entity as a plain dict (None for unknown ids, e.g. intents)."""
+    if isinstance(entities, BaseEntityStore):
+        return entities.get_record(eid)
+    e = entities.get(eid)
+    return e.model_dump(exclude_none=True) if e is not None else None
+
+def entity_counts() -> Dict[str, int]:
+    """Confidence counts without decoding any entity record (or importing pydantic)."""
+    legacy_file = _legacy_file()
+    if legacy_file is None:
+        with open_entities() as entities:
+            return entities.confidence_counts()
+    # Старий entities.json: рахуємо з сирих dict-ів, без CodeEntity
+    counts = {"low": 0, "medium": 0, "high": 0}
+    for rec in _load_legacy_records(legacy_file):
+        counts[rec["confidence"]] = counts.get(rec["confidence"], 0) + 1
+    return counts
+
+def export_entities_json(path: str = ENTITIES_FILE) -> int:
+    """Writes all entities as indented JSON for humans. Returns the number of records."""
+    count = 0
+    with open_entities() as entities, open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for rec in iter_entity_records(entities):
+            f.write(",\n  " if count else "\n  ")
+            f.write(json.dumps(rec, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+            count += 1
+        f.write("\n]\n" if count else "]\n")
+    return count
 
 # --- Intents ---
-def save_intents(intents: List[Intent]):
+def save_intents(intents: List["Intent"]):
     ensure_index_dir()
+    if _use_sqlite():
+        from . import sqlite_store
+        sqlite_store.save_intents(_sqlite(), intents)
+        return
     data = [i.model_dump(exclude_none=True) for i in intents]
     with open(INTENTS_FILE, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
-def load_intents() -> List[Intent]:
+def _load_intent_records() -> List[dict]:
+    if _use_sqlite():
+        from . import sqlite_store
+        return sqlite_store.load_intents(_sqlite())
     if not os.path.exists(INTENTS_FILE): return []
     with open(INTENTS_FILE, "r", encoding="utf-8") as f:
-        return [Intent(**i) for i in json.load(f)]
+        return json.load(f)
+
+def load_intents() -> List["Intent"]:
+    from .schema import Intent
+    return [Intent(**i) for i in _load_intent_records()]
+
+def intent_count() -> int:
+    """Number of intents without building pydantic objects (for 'status')."""
+    return len(_load_intent_records())
 
 # --- Embeddings ---
-def save_embeddings(ids: List[str], matrix: np.ndarray):
+EMBEDDINGS_TMP_FILE = EMBEDDINGS_FILE + ".tmp.npy"
+
+def open_embeddings_output(shape, dtype="float32") -> "np.ndarray":
+    """
+    Memory-mapped .npy that the new matrix is written into batch by batch.
+    Pass it to save_embeddings() to publish it in place of embeddings.npy.
+    """
+    import numpy as np
+    ensure_index_dir()
+    return np.lib.format.open_memmap(EMBEDDINGS_TMP_FILE, mode="w+", dtype=dtype, shape=shape)
+
+def save_embeddings(ids: List[str], matrix: "np.ndarray", meta: Optional[dict] = None):
+    """meta: {"embedder": identity, "hashes": [text hash per row]} for incremental embed."""
+    import numpy as np
     ensure_index_dir()
-    np.save(EMBEDDINGS_FILE, matrix)
+    # ANN-індекс і коди описують старі рядки - прибираємо до публікації нової матриці
+    for stale in (ANN_FILE, QUANT_FILE, QUANT_CODES_FILE):
+        if os.path.exists(stale):
+            os.remove(stale)
+    if isinstance(matrix, np.memmap) and os.path.abspath(matrix.filename) == os.path.abspath(EMBEDDINGS_TMP_FILE):
+        matrix.flush()
+        os.replace(EMBEDDINGS_TMP_FILE, EMBEDDINGS_FILE)
+    else:
+        np.save(EMBEDDINGS_FILE, matrix)
     with open(IDS_FILE, "w", encoding="utf-8") as f:
         json.dump(ids, f)
+    if meta is not None:
+        with open(EMBEDDINGS_META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    elif os.path.exists(EMBEDDINGS_META_FILE):
+        os.remove(EMBEDDINGS_META_FILE)
 
-def load_embeddings():
-    if not os.path.exists(EMBEDDINGS_FILE) or not os.path.exists(IDS_FILE):
+def load_embeddings_meta(index_dir: Optional[str] = None) -> dict:
+    meta_file = _in(index_dir, EMBEDDINGS_META_FILE)
+    if not os.path.exists(meta_file): return {}
+    with open(meta_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_embeddings(mmap_mode=None, index_dir: Optional[str] = None):
+    """Returns (ids, matrix). matrix is None if embeddings.npy is absent (e.g. only the quantized codes were copied)."""
+    ids_file, embeddings_file = _in(index_dir, IDS_FILE), _in(index_dir, EMBEDDINGS_FILE)
+    if not os.path.exists(ids_file):
         return [], None
-    with open(IDS_FILE, "r") as f:
+    with open(ids_file, "r") as f:
         ids = json.load(f)
-    matrix = np.load(EMBEDDINGS_FILE)
+    if not os.path.exists(embeddings_file):
+        return ids, None
+    import numpy as np
+    matrix = np.load(embeddings_file, mmap_mode=mmap_mode)
     return ids, matrix
+
+# --- ANN index ---
+def save_ann_index(index):
+    ensure_index_dir()
+    index.save(ANN_FILE)
+
+def load_ann_index(rows: Optional[int] = None, index_dir: Optional[str] = None):
+    """IVF index for the current embeddings (None if absent or built for another matrix)."""
+    from .ann import IVFIndex
+    return IVFIndex.load(_in(index_dir, ANN_FILE), rows=rows)
+
+# --- Lexical (BM25) index ---
+def build_lexical_index(entities: Mapping[str, "CodeEntity"]):
+    """Rebuilds .code-index/lexical.npz from the entity records (no pydantic objects)."""
+    from .lexical import LexicalIndex
+    ensure_index_dir()
+    index = LexicalIndex.build(iter_entity_records(entities))
+    index.save(LEXICAL_FILE)
+    return index
+
+def load_lexical_index(index_dir: Optional[str] = None):
+    from .lexical import LexicalIndex
+    return LexicalIndex.load(_in(index_dir, LEXICAL_FILE))
+
+# --- Call graph ---
+def build_call_graph(entities: Mapping[str, "CodeEntity"]):
+    """Resolves entity.calls into .code-index/callgraph.npz (CSR over entity indices)."""
+    from .callgraph import CallGraph
+    ensure_index_dir()
+    graph = CallGraph.build(iter_entity_records(entities))
+    graph.save(CALLGRAPH_FILE)
+    return graph
+
+def load_call_graph():
+    from .callgraph import CallGraph
+    return CallGraph.load(CALLGRAPH_FILE)
+
+# --- Quantized embeddings ---
+QUANT_CODES_TMP_FILE = QUANT_CODES_FILE + ".tmp.npy"
+
+def open_quant_codes_output(shape) -> "np.ndarray":
+    """Memory-mapped uint8 codes; publish with save_quantized()."""
+    import numpy as np
+    ensure_index_dir()
+    return np.lib.format.open_memmap(QUANT_CODES_TMP_FILE, mode="w+", dtype=np.uint8, shape=shape)
+
+def save_quantized(index):
+    import numpy as np
+    ensure_index_dir()
+    codes = index.codes
+    if isinstance(codes, np.memmap) and os.path.abspath(codes.filename) == os.path.abspath(QUANT_CODES_TMP_FILE):
+        codes.flush()
+        os.replace(QUANT_CODES_TMP_FILE, QUANT_CODES_FILE)
+    else:
+        np.save(QUANT_CODES_FILE, codes)
+    index.save(QUANT_FILE)
+
+def load_quantized(rows: Optional[int] = None, index_dir: Optional[str] = None):
+    """Quantized codes for the current embeddings (None if absent or stale)."""
+    from .quantize import QuantizedIndex
+    return QuantizedIndex.load(_in(index_dir, QUANT_FILE), _in(index_dir, QUANT_CODES_FILE), rows=rows)
+
+# --- Scan manifest ---
+def save_manifest(manifest: Dict[str, dict]):
+    """Stores per-file scan state: {path: {size, mtime_ns, hash, entities}}."""
+    ensure_index_dir()
+    if _use_sqlite():
+        from . import sqlite_store
+        sqlite_store.save_manifest(_sqlite(), manifest)
+        return
+    tmp = MANIFEST_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "files": manifest}, f, ensure_ascii=False)
+    os.replace(tmp, MANIFEST_FILE)
+
+def load_manifest() -> Dict[str, dict]:
+    if _use_sqlite():
+        from . import sqlite_store
+        return sqlite_store.load_manifest(_sqlite())
+    if not os.path.exists(MANIFEST_FILE): return {}
+    with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+        return json.load(f).get("files", {})
@@ -0,0 +1,121 @@
+from typing import List, Optional, Tuple
+from . import storage, search, metrics
+from .config import ANN_ENABLED, ANN_NPROBE, QUANT_RESCORE, SEARCH_MODE, SEARCH_RRF_K, SEARCH_CANDIDATES, SEARCH_MODES
+from .lexical import hybrid_rank
+
+class VectorIndex:
+    """
+    The embedding matrix plus whatever ANN/quantized indexes were built for it.
+    search() picks the cheapest valid path: quantized codes (+ exact rescoring),
+    then IVF, then the exact scan.
+    """
+
+    def __init__(self, index_dir: Optional[str] = None):
+        # mmap: матриця не копіюється в пам'ять, сторінки читає ОС
+        self.ids, self.matrix = storage.load_embeddings(mmap_mode="r", index_dir=index_dir)
+        self.meta = storage.load_embeddings_meta(index_dir)
+
+        # Старі індекси (до нормалізації в embed) - ділимо на норми рядків
+        self.norms = None
+        if self.matrix is not None and not self.meta.get("normalized"):
+            self.norms = search.row_norms(self.matrix)
+
+        # Квантизовані коди можуть бути і без embeddings.npy (скопійовано лише їх).
+        # IVF-індекс є лише для великих (нормалізованих) матриць.
+        normalized = self.norms is None
+        self.qindex = storage.load_quantized(rows=len(self.ids), index_dir=index_dir) if self.ids and normalized else None
+        self.ann = None
+        if ANN_ENABLED and self.matrix is not None and normalized:
+            self.ann = storage.load_ann_index(rows=len(self.matrix), index_dir=index_dir)
+
+    @property
+    def empty(self) -> bool:
+        return self.matrix is None and self.qindex is None
+
+    @property
+    def dim(self) -> Optional[int]:
+        if self.matrix is not None:
+            return int(self.matrix.shape[1])
+        return self.qindex.dim if self.qindex is not None else None
+
+    def search(self, q_vec, k: int = 5, min_score=None, nprobe: Optional[int] = None, exact: bool = False):
+        """Returns (indices, scores); exact=True ignores the ANN index and the codes (if the matrix exists)."""
+        if self.qindex is not None and (self.matrix is None or not exact):
+            # Скан кодів, потім точний перерахунок k * rescore кандидатів (якщо є float-матриця)
+            return self.qindex.search(q_vec, k=k, min_score=min_score, matrix=self.matrix, rescore=QUANT_RESCORE)
+        if self.ann is not None and not exact:
+            return self.ann.search(self.matrix, q_vec, k=k, nprobe=nprobe or ANN_NPROBE, min_score=min_score)
+        # Cosine sim = dot product одиничних векторів + argpartition top-k
+        return search.top_k(self.matrix, q_vec, k=k, min_score=min_score, norms=self.norms)
+
+    def search_batch(self, q_vecs, k: int = 5, min_score=None, nprobe: Optional[int] = None, exact: bool = False):
+        """Many queries: the exact scan is one matrix-matrix product; codes/IVF go query by query."""
+        uses_codes = self.qindex is not None and (self.matrix is None or not exact)
+        uses_ann = self.ann is not None and not exact
+        if uses_codes or uses_ann:
+            return [self.search(q, k=k, min_score=min_score, nprobe=nprobe, exact=exact) for q in q_vecs]
+        return search.top_k_batch(self.matrix, q_vecs, k=k, min_score=min_score, norms=self.norms)
+
+class Searcher:
+    """
+    Dense VectorIndex + lexical BM25 index, fused with reciprocal rank fusion.
+    Falls back to the part that exists: lexical only before 'embed', dense only
+    for indexes built before the lexical index existed.
+    """
+
+    MODES = SEARCH_MODES
+
+    def __init__(self, index_dir: Optional[str] = None):
+        self.vectors = VectorIndex(index_dir)
+        self.lexical = storage.load_lexical_index(index_dir)
+
+    @property
+    def empty(self) -> bool:
+        return self.vectors.empty and self.lexical is None
+
+    def mode(self, requested: Optional[str] = None) -> str:
+        if self.vectors.empty: return "lexical"
+        if self.lexical is None: return "dense"
+        return requested or SEARCH_MODE
+
+    def needs_embedding(self, requested: Optional[str] = None) -> bool:
+        """False when the query can be answered without loading the embedder."""
+        return self.mode(requested) != "lexical"
+
+    def query(self, text: str, q_vec=None, k: int = 5, min_score=None, nprobe=None, exact=False, mode=None) -> List[Tuple[str, float]]:
+        """Returns [(id, score)], best first. Scores are cosine (dense), BM25 (lexical) or RRF (hybrid)."""
+        return self.query_batch([text], None if q_vec is None else [q_vec], k, min_score, nprobe, exact, mode)[0]
+
+    def _lexical(self, text: str, k: int) -> List[Tuple[str, float]]:
+        ids, scores = self.lexical.search(text, k)
+        return [(eid, float(s)) for eid, s in zip(ids, scores)]
+
+    def query_batch(self, texts: List[str], q_vecs=None, k: int = 5, min_score=None, nprobe=None, exact=False, mode=None):
+        """query() for many texts; q_vecs (one per text) are needed unless the mode is lexical."""
+        mode = self.mode(mode)
+        metrics.count(f"search.queries.{mode}", len(texts))
+        if mode == "lexical":
+            with metrics.span("search.lexical", queries=len(texts)):
+                return [self._lexical(t, k) for t in texts]
+
+        # Для злиття беремо ширший список кандидатів з кожного ранжування
+        n = k if mode == "dense" else max(k, SEARCH_CANDIDATES)
+        with metrics.span("search.dense", queries=len(texts)):
+            hits = self.vectors.search_batch(q_vecs, k=n, min_score=min_score, nprobe=nprobe, exact=exact)
+        results = []
+        for text, (idx, scores) in zip(texts, hits):
+            dense = [(self.vectors.ids[i], float(s)) for i, s in zip(idx, scores)]
+            if mode == "dense":
+                results.append(dense)
+                continue
+            with metrics.span("search.lexical", queries=1):
+                lexical = [eid for eid, _ in self._lexical(text, n)]
+            with metrics.span("search.fuse"):
+                results.append(hybrid_rank(text, [eid for eid, _ in dense], lexical, k=k, c=SEARCH_RRF_K))
+        return results
+
+def result_record(entities, eid: str, score: float) -> dict:
+    """Search hit as a plain dict (path/symbol/summary are None/empty for intents)."""
+    rec = storage.get_entity_record(entities, eid) or {}
+    summary = (rec.get("summary") or {}).get("text") or rec.get("responsibility") or ""
+    return {"id": eid, "score": float(score), "path": rec.get("path"), "symbol": rec.get("symbol"), "summary": summary}
@@ -0,0 +1,267 @@
+import os
+import re
+import stat
+import shutil
+import fnmatch
+import subprocess
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .config import LANGUAGE_MAP, SCAN_EXCLUDES, SCAN_GITIGNORE, SCAN_MAX_FILE_SIZE, SCAN_USE_GIT
+
+# Обхід дерева для scan/watch. Теки відсікаються до спуску в них (scandir, без
+# os.walk по node_modules), файли відбираються за розширенням і розміром ще до
+# парсера. У git-репозиторії список файлів береться з індексу (`git ls-files`):
+# git вже знає і дерево, і .gitignore, тож обхід диска не потрібен взагалі.
+
+class _Rule:
+    __slots__ = ("regex", "negate", "dir_only", "base")
+
+    def __init__(self, regex, negate: bool, dir_only: bool, base: str):
+        self.regex = regex
+        self.negate = negate
+        self.dir_only = dir_only
+        self.base = base
+
+def _glob_to_regex(pattern: str) -> str:
+    """gitignore glob -> regex over '/'-separated relative paths."""
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[" and pattern.find("]", i + 2) != -1:
+            end = pattern.find("]", i + 2)
+            body = pattern[i + 1:end]
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body.replace("\\", "\\\\")) + "]")
+            i = end + 1
+        elif c == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+def parse_gitignore(text: str, base: str = "") -> List[_Rule]:
+    """
+    Rules of one .gitignore located in `base` (relative dir, '' = root).
+    Supports comments, '!' negation, trailing '/' (directories only), anchoring
+    by a leading or inner '/', and '*', '?', '[...]', '**'.
+    """
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"): continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line: continue
+        # Шаблон без '/' в середині діє на будь-якій глибині
+        anchored = "/" in line
+        line = line.lstrip("/")
+        regex = _glob_to_regex(line if anchored else "**/" + line)
+        rules.append(_Rule(re.compile(regex + "$"), negate, dir_only, base))
+    return rules
+
+class Walker:
+    """
+    Yields (path, stat) for source files under root: directories matching `excludes`
+    or .gitignore are pruned before descending, files are filtered by extension and
+    size. Paths keep the root prefix (os.path.join(root, relative)), like os.walk.
+
+    excludes: bare names ('node_modules', '*.min.js') match any path component,
+    patterns with '/' ('vendor/generated/*') match the path relative to root.
+    """
+
+    def __init__(self, root: str, extensions: Optional[Iterable[str]] = None, excludes: Iterable[str] = SCAN_EXCLUDES,
+                 max_size: int = SCAN_MAX_FILE_SIZE, gitignore: bool = SCAN_GITIGNORE, use_git: bool = SCAN_USE_GIT):
+        self.root = root
+        self.extensions = tuple(LANGUAGE_MAP if extensions is None else extensions)
+        excludes = list(excludes or [])
+        self.exclude_names = {x for x in excludes if "/" not in x and not any(c in x for c in "*?[")}
+        self.exclude_globs = [x for x in excludes if "/" not in x and x not in self.exclude_names]
+        self.exclude_paths = [x.strip("/") for x in excludes if "/" in x]
+        self.max_size = max_size or 0
+        self.gitignore = gitignore
+        self.use_git = use_git
+        self.source = None
+        self.stats = {"files": 0, "too_large": 0, "ignored": 0}
+        self._rules: Dict[str, List[_Rule]] = {}
+
+    # --- Правила ---
+
+    def _excluded(self, rel: str, name: str) -> bool:
+        if name in self.exclude_names: return True
+        if any(fnmatch.fnmatch(name, g) for g in self.exclude_globs): return True
+        return any(fnmatch.fnmatch(rel, p) for p in self.exclude_paths)
+
+    def _dir_rules(self, rel_dir: str) -> List[_Rule]:
+        """Rules of every .gitignore from root down to rel_dir (deeper files come last and win)."""
+        rules = self._rules.get(rel_dir)
+        if rules is not None: return rules
+        parent = self._dir_rules(os.path.dirname(rel_dir)) if rel_dir else []
+        own = []
+        if self.gitignore:
+            try:
+                with open(os.path.join(self.root, rel_dir, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+                    own = parse_gitignore(f.read(), rel_dir.replace(os.sep, "/"))
+            except OSError:
+                pass
+        rules = self._rules[rel_dir] = parent + own if own else parent
+        return rules
+
+    def _gitignored(self, rel: str, is_dir: bool) -> bool:
+        ignored = False
+        for rule in self._dir_rules(os.path.dirname(rel)):
+            if rule.dir_only and not is_dir: continue
+            path = rel.replace(os.sep, "/")
+            if rule.base:
+                if not path.startswith(rule.base + "/"): continue
+                path = path[len(rule.base) + 1:]
+            if rule.regex.match(path):
+                ignored = not rule.negate
+        return ignored
+
+    def _skip(self, rel: str, name: str, is_dir: bool) -> bool:
+        return self._excluded(rel, name) or (self.gitignore and self._gitignored(rel, is_dir))
+
+    def ignored(self, path: str, is_dir: bool = False) -> bool:
+        """True if path (or one of its parent dirs) is excluded; for watcher events."""
+        rel = os.path.relpath(path, self.root)
+        if rel == ".": return False
+        if rel.startswith(".." + os.sep): return True
+        parts = rel.split(os.sep)
+        for i in range(1, len(parts) + 1):
+            if self._skip(os.path.join(*parts[:i]), parts[i - 1], is_dir or i < len(parts)):
+                return True
+        return False
+
+    def _wanted(self, st) -> bool:
+        if self.max_size and st.st_size > self.max_size:
+            self.stats["too_large"] += 1
+            return False
+        self.stats["files"] += 1
+        return True
+
+    # --- Обхід ---
+
+    def dirs(self, top: Optional[str] = None) -> Iterator[str]:
+        """Directories under top (default: root) that are not pruned, top first (for inotify watches)."""
+        top = top or self.root
+        rel = os.path.relpath(top, self.root)
+        stack = [(top, "" if rel == "." else rel)]
+        while stack:
+            path, rel = stack.pop()
+            yield path
+            try:
+                with os.scandir(path) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+            for entry in reversed(entries):
+                if not entry.is_dir(follow_symlinks=False): continue
+                sub = os.path.join(rel, entry.name)
+                if not self._skip(sub, entry.name, True):
+                    stack.append((entry.path, sub))
+
+    def _scandir_files(self) -> Iterator[Tuple[str, os.stat_result]]:
+        stack = [(self.root, "")]
+        while stack:
+            path, rel = stack.pop()
+            try:
+                with os.scandir(path) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                print(f"Read error {path}: {e}")
+                continue
+            subdirs = []
+            for entry in entries:
+                sub = os.path.join(rel, entry.name)
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Відсікаємо до спуску: в ігноровану теку scandir не заходить
+                        if self._skip(sub, entry.name, True):
+                            self.stats["ignored"] += 1
+                        else:
+                            subdirs.append((entry.path, sub))
+                        continue
+                    if not entry.name.endswith(self.extensions): continue
+                    if self._skip(sub, entry.name, False):
+                        self.stats["ignored"] += 1
+                        continue
+                    st = entry.stat()
+                except OSError as e:
+                    print(f"Read error {entry.path}: {e}")
+                    continue
+                if stat.S_ISREG(st.st_mode) and self._wanted(st):
+                    yield entry.path, st
+            stack.extend(reversed(subdirs))
+
+    def _git_files(self) -> Optional[List[str]]:
+        """Tracked and untracked-but-not-ignored files relative to root, or None outside a git checkout."""
+        # --exclude-standard застосовує .gitignore, тож без нього (gitignore: false) - обхід диска
+        if not (self.use_git and self.gitignore) or shutil.which("git") is None: return None
+        try:
+            out = subprocess.run(
+                ["git", "-C", self.root, "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                capture_output=True, check=True,
+            ).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return [os.fsdecode(p) for p in out.split(b"\0") if p]
+
+    def _dir_excluded(self, folder: str, cache: Dict[str, bool]) -> bool:
+        if not folder: return False
+        hit = cache.get(folder)
+        if hit is None:
+            hit = cache[folder] = (self._dir_excluded(os.path.dirname(folder), cache)
+                                   or self._excluded(folder, os.path.basename(folder)))
+        return hit
+
+    def _listed_files(self, listed: List[str]) -> Iterator[Tuple[str, os.stat_result]]:
+        excluded_dirs: Dict[str, bool] = {}
+        previous = None
+        for rel in listed:
+            # Конфлікт злиття: той самий шлях на кількох стадіях індексу
+            if rel == previous or not rel.endswith(self.extensions): continue
+            previous = rel
+            rel = rel.replace("/", os.sep)
+            # .gitignore вже застосував git; лишаються виключення з конфігу
+            if self._dir_excluded(os.path.dirname(rel), excluded_dirs) or self._excluded(rel, os.path.basename(rel)):
+                self.stats["ignored"] += 1
+                continue
+            path = os.path.join(self.root, rel)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue  # видалений, але ще в індексі git
+            except OSError as e:
+                print(f"Read error {path}: {e}")
+                continue
+            if stat.S_ISREG(st.st_mode) and self._wanted(st):
+                yield path, st
+
+    def __iter__(self) -> Iterator[Tuple[str, os.stat_result]]:
+        self.stats = {"files": 0, "too_large": 0, "ignored": 0}
+        listed = self._git_files()
+        self.source = "git" if listed is not None else "scandir"
+        if listed is not None:
+            return self._listed_files(listed)
+        return self._scandir_files()
+
+def walk_files(root: str, **options) -> Iterator[str]:
+    """Paths of the source files under root (see Walker for the options)."""
+    return (path for path, _ in Walker(root, **options))
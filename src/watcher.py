@@ -0,0 +1,338 @@
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+from typing import Dict, Optional, Set
+from . import storage, metrics
+from .config import SCAN_MAX_FILE_SIZE
+from .parser import CodeParser, PARSER_VERSION, hash_bytes
+from .scanner import carry_over
+from .walker import Walker
+
+# --- Filesystem watchers ---
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+class PollingWatcher:
+    """Fallback watcher: compares (size, mtime) snapshots every interval."""
+
+    def __init__(self, root, p: CodeParser):
+        self.walker = Walker(root)
+        self.p = p
+        self.snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> Dict[str, tuple]:
+        return {path: (st.st_size, st.st_mtime_ns) for path, st in self.walker if self.p.supports(path)}
+
+    def wait(self, timeout: float) -> Set[str]:
+        time.sleep(timeout)
+        snap = self._take_snapshot()
+        changed = {p for p in snap.keys() | self.snapshot.keys() if snap.get(p) != self.snapshot.get(p)}
+        self.snapshot = snap
+        return changed
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    """Linux inotify watcher (via libc, no extra dependencies). Watches directories recursively."""
+
+    def __init__(self, root, p: CodeParser):
+        self.p = p
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: Dict[int, str] = {}
+        self.walker = Walker(root)
+        self._add_tree(root)
+
+    def _add_dir(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = path
+
+    def _drop_tree(self, top):
+        """Forgets the watches of top and everything under it (moved away or deleted)."""
+        prefix = top + os.sep
+        for wd, path in list(self.dirs.items()):
+            if path == top or path.startswith(prefix):
+                # Для видаленої теки ядро вже зняло watch - помилку ігноруємо
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def _add_tree(self, top):
+        """Watches top and its non-ignored subdirectories; returns them."""
+        added = list(self.walker.dirs(top))
+        for path in added:
+            self._add_dir(path)
+        return added
+
+    def _wanted(self, path) -> bool:
+        return self.p.supports(path) and not self.walker.ignored(path)
+
+    def wait(self, timeout: float) -> Set[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready: return set()
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                # Черга переповнена: події втрачені, перевіряємо все
+                print("⚠️  inotify queue overflow, rescanning tree.")
+                changed.update(path for path in walk_files_from(self.dirs.values()) if self._wanted(path))
+                continue
+
+            base = self.dirs.get(wd)
+            if base is None: continue
+            if mask & IN_DELETE_SELF:
+                # Сама тека зникла: усе під нею LiveIndex прибере як видалене
+                self._drop_tree(base)
+                changed.add(base)
+                continue
+            if not name: continue
+            path = os.path.join(base, os.fsdecode(name))
+
+            if mask & IN_ISDIR:
+                if mask & (IN_MOVED_FROM | IN_DELETE):
+                    # Тека перейменована чи винесена з дерева: старі шляхи видаляються
+                    # (LiveIndex.update знімає всі файли з цим префіксом), watch-і - теж
+                    self._drop_tree(path)
+                    changed.add(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO) and not self.walker.ignored(path, is_dir=True):
+                    # Нова тека: ставимо watch і вважаємо змінними всі файли в ній
+                    changed.update(f for f in walk_files_from(self._add_tree(path)) if self._wanted(f))
+                continue
+            if self._wanted(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+def walk_files_from(dirs):
+    for d in list(dirs):
+        try:
+            names = os.listdir(d)
+        except OSError:
+            continue
+        for name in names:
+            yield os.path.join(d, name)
+
+def make_watcher(root, p: CodeParser, force_polling=False):
+    if not force_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, p)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), falling back to polling.")
+    return PollingWatcher(root, p)
+
+# --- Incremental reparsing ---
+
+def _point(data: bytes, offset: int):
+    row = data.count(b"\n", 0, offset)
+    col = offset - (data.rfind(b"\n", 0, offset) + 1)
+    return (row, col)
+
+def _common_prefix(a: memoryview, b: memoryview, limit: int) -> int:
+    # Бінарний пошук по зрізах: порівняння йде в C, а не байт за байтом у Python
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]: lo = mid
+        else: hi = mid - 1
+    return lo
+
+def _common_suffix(a: memoryview, b: memoryview, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]: lo = mid
+        else: hi = mid - 1
+    return lo
+
+def compute_edit(old: bytes, new: bytes):
+    """
+    Describes the change old -> new as a single tree-sitter edit
+    (common prefix and suffix are kept). Returns kwargs for Tree.edit().
+    """
+    a, b = memoryview(old), memoryview(new)
+    start = _common_prefix(a, b, min(len(old), len(new)))
+    suffix = _common_suffix(a, b, min(len(old), len(new)) - start)
+    old_end, new_end = len(old) - suffix, len(new) - suffix
+    return dict(
+        start_byte=start,
+        old_end_byte=old_end,
+        new_end_byte=new_end,
+        start_point=_point(old, start),
+        old_end_point=_point(old, old_end),
+        new_end_point=_point(new, new_end),
+    )
+
+class LiveIndex:
+    """
+    Keeps the entity index, the manifest and the last tree per file in memory
+    and applies file changes to them incrementally.
+    """
+
+    def __init__(self, p: CodeParser):
+        self.p = p
+        self.entities = storage.load_entities()
+        self.manifest = storage.load_manifest()
+        # path -> (tree, bytes) останнього розбору
+        self.trees: Dict[str, tuple] = {}
+        self.dirty = False
+
+    def _parse(self, path, code_bytes):
+        cached = self.trees.get(path)
+        if cached is None:
+            return self.p.parse_tree(path, code_bytes)
+        old_tree, old_bytes = cached
+        old_tree.edit(**compute_edit(old_bytes, code_bytes))
+        return self.p.parse_tree(path, code_bytes, old_tree=old_tree)
+
+    def _remove(self, path) -> int:
+        """Drops path, or every indexed file under it if path was a directory."""
+        prefix = path + os.sep
+        removed = 0
+        for indexed in [path] + [f for f in self.manifest if f.startswith(prefix)]:
+            prev = self.manifest.pop(indexed, None)
+            self.trees.pop(indexed, None)
+            if prev is None: continue
+            for eid in prev["entities"]:
+                self.entities.pop(eid, None)
+            removed += len(prev["entities"])
+            self.dirty = True
+        return removed
+
+    def update(self, path) -> Optional[dict]:
+        """Re-indexes one file. Returns counts of added/changed/removed entities."""
+        try:
+            st = os.stat(path)
+            with open(path, "rb") as f:
+                code_bytes = f.read()
+        except OSError:
+            return {"added": 0, "changed": 0, "removed": self._remove(path)}
+        # Як і scan: завеликий (згенерований) файл не індексуємо
+        if SCAN_MAX_FILE_SIZE and st.st_size > SCAN_MAX_FILE_SIZE:
+            return {"added": 0, "changed": 0, "removed": self._remove(path)}
+
+        prev = self.manifest.get(path)
+        digest = hash_bytes(code_bytes)
+        if prev and prev["hash"] == digest and prev.get("parser") == PARSER_VERSION:
+            prev.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            return None
+
+        tree = self._parse(path, code_bytes)
+        if tree is None: return None
+        self.trees[path] = (tree, code_bytes)
+        found = self.p.extract_entities(path, tree)
+
+        # Свіжа сутність зберігається завжди: незмінне тіло могло зсунутися (рядок вище),
+        # а summarize читає тіло за span-ом. Summary переноситься, якщо тіло те саме
+        counts = {"added": 0, "changed": 0, "removed": 0}
+        new_ids = set()
+        for e in found:
+            new_ids.add(e.id)
+            old = self.entities.get(e.id)
+            if not carry_over(e, old):
+                counts["added" if old is None else "changed"] += 1
+            self.entities[e.id] = e
+        for eid in (prev["entities"] if prev else []):
+            if eid not in new_ids:
+                self.entities.pop(eid, None)
+                counts["removed"] += 1
+
+        self.manifest[path] = {
+            "size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest, "parser": PARSER_VERSION,
+            "entities": list(dict.fromkeys(e.id for e in found)),
+        }
+        self.dirty = True
+        return counts
+
+    def flush(self):
+        if not self.dirty: return
+        storage.save_entities(self.entities, self.manifest)
+        # Похідні індекси інакше знаходили б видалені сутності і не бачили нових
+        with metrics.span("watch.lexical_index"):
+            storage.build_lexical_index(self.entities)
+        with metrics.span("watch.callgraph"):
+            storage.build_call_graph(self.entities)
+        self.dirty = False
+
+    def close(self):
+        if hasattr(self.entities, "close"):
+            self.entities.close()
+
+def watch(root, p: CodeParser, debounce=0.5, max_delay=5.0, force_polling=False):
+    """
+    Watches root and keeps the index fresh. Bursts of events are debounced:
+    a batch is applied after `debounce` seconds of quiet (or `max_delay` at most),
+    and the index is written once per batch.
+    """
+    index = LiveIndex(p)
+    watcher = make_watcher(root, p, force_polling=force_polling)
+    print(f"👀 Watching {root} ({type(watcher).__name__}). Press Ctrl+C to stop.")
+
+    pending: Set[str] = set()
+    first_event = None
+    try:
+        while True:
+            changed = watcher.wait(debounce)
+            now = time.time()
+            if changed:
+                pending |= changed
+                first_event = first_event or now
+                if now - first_event < max_delay:
+                    continue
+            if not pending: continue
+
+            start = time.time()
+            totals = {"added": 0, "changed": 0, "removed": 0}
+            with metrics.span("watch.batch", files=len(pending)):
+                for path in sorted(pending):
+                    with metrics.span("watch.update"):
+                        counts = index.update(path)
+                    for k, v in (counts or {}).items():
+                        totals[k] += v
+                        metrics.count(f"watch.entities_{k}", v)
+                with metrics.span("watch.flush"):
+                    index.flush()
+            print(f"🔄 {len(pending)} file(s): +{totals['added']} ~{totals['changed']} -{totals['removed']} entities "
+                  f"({(time.time() - start) * 1000:.0f} ms)")
+            pending.clear()
+            first_event = None
+    except KeyboardInterrupt:
+        for path in sorted(pending):
+            index.update(path)
+        index.flush()
+        print("\nStopped watching. Index saved.")
+    finally:
+        watcher.close()
+        index.close()
@@ -0,0 +1,91 @@
+import os
+import re
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+class FakeOllama(ThreadingHTTPServer):
+    """
+    Local stand-in for Ollama's /api/chat. The reply depends on markers in the prompt:
+    FAIL500 / FAIL404 - that status every time; FLAKY - 503 on the first request for
+    that prompt, then 200; SLEEP=<s> - answers after s seconds; HANG - blocks until
+    release() (or 30 s). Otherwise 200 with "Handles <function name>".
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.lock = threading.Lock()
+        self.requests = []          # function names in arrival order
+        self.finished = []          # імена, на які вже відповіли
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.hang = threading.Event()
+
+    def release(self):
+        self.hang.set()
+
+    def count(self, name: str) -> int:
+        with self.lock:
+            return self.requests.count(name)
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server: FakeOllama = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        match = re.search(r"def (\w+)", prompt)
+        name = match.group(1) if match else "?"
+        with server.lock:
+            server.requests.append(name)
+            attempt = server.requests.count(name)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        sleep = re.search(r"SLEEP=([\d.]+)", prompt)
+        if sleep:
+            time.sleep(float(sleep.group(1)))
+        if "HANG" in prompt:
+            server.hang.wait(30)
+        if "FAIL500" in prompt or ("FLAKY" in prompt and attempt == 1):
+            status, reply = 500 if "FAIL500" in prompt else 503, {"error": "server overloaded"}
+        elif "FAIL404" in prompt:
+            status, reply = 404, {"error": f"model '{body['model']}' not found"}
+        else:
+            status, reply = 200, {"model": body["model"], "created_at": "2026-01-01T00:00:00Z", "done": True,
+                                  "message": {"role": "assistant", "content": f"Handles {name}"}}
+        # Запит завершено до відправки відповіді: отримавши її, клієнт одразу шле наступний
+        with server.lock:
+            server.in_flight -= 1
+            server.finished.append(name)
+        try:
+            self._reply(status, reply)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # клієнт уже відвалився по таймауту
+
+@pytest.fixture
+def fake_ollama():
+    server = FakeOllama()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.release()
+    server.shutdown()
+    server.server_close()
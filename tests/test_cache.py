@@ -0,0 +1,14 @@
+from src.cache import SummaryCache, normalize_code
+
+METHOD = "def area(self):\n        side = self.side\n\n        return side * side  \n"
+FUNCTION = "def area(self):\n    side = self.side\n    return side * side\n"
+
+def test_indented_method_and_module_level_copy_share_a_key():
+    # Тіло методу вирізане від start byte: перший рядок без відступу, решта - з відступом класу
+    assert normalize_code(METHOD) == normalize_code(FUNCTION)
+    assert SummaryCache.make_key(METHOD, "m", 1) == SummaryCache.make_key(FUNCTION, "m", 1)
+
+def test_relative_indentation_is_kept():
+    nested = "def f():\n        if x:\n            return 1\n"
+    assert normalize_code(nested) == normalize_code("def f():\n    if x:\n        return 1")
+    assert normalize_code(nested) != normalize_code("def f():\n    if x:\n    return 1")
@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import subprocess
+import msgpack
+import pytest
+from conftest import ROOT
+from src.entity_store import EntityStore, read_index, write_store
+
+def records(n, text="v1"):
+    return [(f"e{i}", "low", msgpack.packb({"id": f"e{i}", "text": text})) for i in range(n)]
+
+def data_files(index_dir):
+    return sorted(name for name in os.listdir(index_dir) if name.endswith(".bin"))
+
+def test_previous_generation_is_kept_until_next_write(tmp_path):
+    write_store(str(tmp_path), records(3))
+    write_store(str(tmp_path), records(3, "v2"))
+    assert data_files(tmp_path) == ["entities.1.bin", "entities.2.bin"]
+    write_store(str(tmp_path), records(3, "v3"))
+    assert data_files(tmp_path) == ["entities.2.bin", "entities.3.bin"]
+
+def test_reader_of_previous_index_can_open_its_data(tmp_path):
+    write_store(str(tmp_path), records(3))
+    stale = read_index(str(tmp_path))
+    write_store(str(tmp_path), records(3, "v2"))
+    # Читач прочитав індекс до запису і відкриває data-файл після нього
+    store = EntityStore.__new__(EntityStore)
+    store.index_dir, store._data = str(tmp_path), None
+    store._open(stale)
+    assert store.get_record("e1")["text"] == "v1"
+    store.close()
+
+def test_reader_rereads_index_when_data_is_gone(tmp_path, monkeypatch):
+    write_store(str(tmp_path), records(2))
+    stale = read_index(str(tmp_path))
+    write_store(str(tmp_path), records(2, "v2"))
+    write_store(str(tmp_path), records(2, "v3"))
+    indexes = iter([stale])
+    monkeypatch.setattr("src.entity_store.read_index", lambda d: next(indexes, None) or read_index(d))
+    store = EntityStore(str(tmp_path))
+    assert store.get_record("e0")["text"] == "v3"
+    store.close()
+
+# --- SQLite: маніфест у тій самій транзакції, що й сутності ---
+
+def entity(eid):
+    from src.schema import CodeEntity
+    path, symbol = eid.split(":")
+    return CodeEntity(id=eid, type="function", path=path, symbol=symbol, confidence="low")
+
+def test_sqlite_scan_commits_manifest_with_entities(tmp_path):
+    from src import sqlite_store
+    db = str(tmp_path / "index.sqlite")
+    with sqlite_store.SqliteEntityStore(db) as store:
+        store.replace_stream([entity("a.py:f"), entity("a.py:g")], {"a.py": {"entities": ["a.py:f", "a.py:g"]}})
+
+    def interrupted():
+        yield entity("b.py:h")
+        raise KeyboardInterrupt
+
+    with sqlite_store.SqliteEntityStore(db) as store:
+        with pytest.raises(KeyboardInterrupt):
+            store.replace_stream(interrupted(), {"b.py": {"entities": ["b.py:h"]}})
+    with sqlite_store.SqliteEntityStore(db) as store:
+        assert list(store) == ["a.py:f", "a.py:g"]
+        assert sqlite_store.load_manifest(store.conn) == {"a.py": {"entities": ["a.py:f", "a.py:g"]}}
+
+# --- Legacy entities.json: 'status' рахує без pydantic ---
+
+def test_status_on_legacy_json_skips_pydantic(tmp_path):
+    (tmp_path / ".code-index").mkdir()
+    records = [{"id": f"a.py:f{i}", "type": "function", "path": "a.py", "symbol": f"f{i}",
+                "confidence": "medium" if i % 3 == 0 else "low"} for i in range(6)]
+    (tmp_path / ".code-index" / "entities.json").write_text(json.dumps(records), encoding="utf-8")
+    proc = subprocess.run([sys.executable, "-X", "importtime", os.path.join(ROOT, "main.py"), "status"],
+                          cwd=tmp_path, env={**os.environ, "HOME": str(tmp_path)},
+                          capture_output=True, text=True, check=True)
+    assert "Medium (LLM):   2" in proc.stdout and "Low (Raw):      4" in proc.stdout
+    assert "pydantic" not in proc.stderr and "src.schema" not in proc.stderr
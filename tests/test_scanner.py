@@ -0,0 +1,23 @@
+from src.parser import CodeParser
+from src.scanner import ScanStream
+from src.schema import EntitySummary
+
+def scan(root, entities, manifest):
+    stream = ScanStream(str(root), CodeParser(), entities, manifest)
+    found = {e.id: e for e in stream if not isinstance(e, str)}
+    return stream, found
+
+def test_preserved_counts_only_kept_summaries(tmp_path):
+    source = tmp_path / "mod.py"
+    source.write_text("def a():\n    return 1\n\n\ndef b():\n    return 2\n", encoding="utf-8")
+    first, entities = scan(tmp_path, {}, {})
+    a_id = next(eid for eid in entities if eid.endswith(":a"))
+    entities[a_id].summary = EntitySummary(text="Returns one", source="llm")
+    entities[a_id].update_confidence()
+
+    # Новий c() змушує перечитати файл; a() і b() не змінились, але summary є лише в a()
+    source.write_text(source.read_text(encoding="utf-8") + "\n\ndef c():\n    return 3\n", encoding="utf-8")
+    second, found = scan(tmp_path, entities, first.manifest)
+    assert second.stats["reparsed"] == 1
+    assert second.stats["preserved"] == 1
+    assert found[a_id].summary.text == "Returns one"
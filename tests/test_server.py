@@ -0,0 +1,58 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import pytest
+from src.server import _make_handler
+
+class StubService:
+    """Records the options it was called with; no model or index behind it."""
+
+    def __init__(self):
+        self.calls = []
+
+    def search(self, query, **options):
+        self.calls.append(("search", query, options))
+        return {"results": [], "elapsed_ms": 0}
+
+    def search_batch(self, queries, **options):
+        self.calls.append(("search_batch", queries, options))
+        return {"results": [[] for _ in queries], "elapsed_ms": 0}
+
+@pytest.fixture
+def daemon():
+    service = StubService()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(service))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", service
+    httpd.shutdown()
+    httpd.server_close()
+
+def post(url, payload):
+    request = urllib.request.Request(url + "/search", data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as resp:
+            return resp.status, json.load(resp)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+def test_known_options_are_passed(daemon):
+    url, service = daemon
+    status, _ = post(url, {"query": "parse", "k": 3, "mode": "hybrid", "exact": True})
+    assert status == 200
+    assert service.calls == [("search", "parse", {"k": 3, "mode": "hybrid", "exact": True})]
+
+def test_unknown_option_is_rejected(daemon):
+    url, service = daemon
+    status, reply = post(url, {"queries": ["a", "b"], "k": 3, "top_k": 5})
+    assert status == 400 and "top_k" in reply["error"]
+    assert service.calls == []
+
+@pytest.mark.parametrize("payload", [{}, {"queries": "not a list"}, ["query"]])
+def test_malformed_request_is_rejected(daemon, payload):
+    url, service = daemon
+    status, _ = post(url, payload)
+    assert status == 400
+    assert service.calls == []
@@ -0,0 +1,55 @@
+import os
+import json
+import numpy as np
+import pytest
+from src.lexical import LexicalIndex
+from src.shards import ShardedSearcher
+
+RECORDS = [
+    {"id": "a.py:parse_file", "path": "a.py", "symbol": "parse_file", "summary": {"text": "Parses one file"}},
+    {"id": "a.py:load_config", "path": "a.py", "symbol": "load_config", "summary": {"text": "Reads the config"}},
+]
+
+def make_shard(index_dir, dim, embedder, lexical=True):
+    os.makedirs(index_dir)
+    rng = np.random.default_rng(dim)
+    matrix = rng.standard_normal((len(RECORDS), dim)).astype(np.float32)
+    np.save(os.path.join(index_dir, "embeddings.npy"), matrix / np.linalg.norm(matrix, axis=1, keepdims=True))
+    with open(os.path.join(index_dir, "ids.json"), "w") as f:
+        json.dump([r["id"] for r in RECORDS], f)
+    with open(os.path.join(index_dir, "embeddings_meta.json"), "w") as f:
+        json.dump({"embedder": embedder, "normalized": True}, f)
+    if lexical:
+        LexicalIndex.build(RECORDS).save(os.path.join(index_dir, "lexical.npz"))
+    return {"path": str(index_dir)}
+
+@pytest.fixture
+def searcher(tmp_path):
+    catalog = {
+        "same": make_shard(tmp_path / "same", 16, "onnx:model-a"),
+        "wide": make_shard(tmp_path / "wide", 32, "onnx:model-b"),
+        "other": make_shard(tmp_path / "other", 16, "onnx:model-b"),
+        "dense": make_shard(tmp_path / "dense", 32, "onnx:model-b", lexical=False),
+    }
+    index = ShardedSearcher(catalog, workers=2)
+    yield index
+    index.close()
+
+def test_mismatched_shards_are_reported(searcher):
+    mismatches = searcher.use_query_model("onnx:model-a", 16)
+    assert sorted(mismatches) == ["dense", "other", "wide"]
+    assert "32-dim" in mismatches["wide"] and "model-b" in mismatches["other"]
+
+def test_mismatched_shards_fall_back_to_lexical(searcher):
+    searcher.use_query_model("onnx:model-a", 16)
+    q_vec = np.ones(16, dtype=np.float32) / 4
+    found = searcher.query("parse_file", q_vec, k=10, mode="dense")
+    shards = {name for name, _, _ in found}
+    # dense: лише шард тієї ж моделі; решта - BM25, шард без lexical.npz - нічого
+    assert shards == {"same", "wide", "other"}
+    assert ("wide", "a.py:parse_file") in {(name, eid) for name, eid, _ in found}
+
+def test_other_dimension_does_not_break_search(searcher):
+    # Без use_query_model(): шард іншої розмірності не валить пошук ValueError-ом з потоку
+    found = searcher.query("load_config", np.ones(16, dtype=np.float32) / 4, k=10)
+    assert {name for name, _, _ in found} == {"same", "other", "wide"}
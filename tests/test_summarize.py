@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import httpx
+import ollama
+import pytest
+from conftest import ROOT
+from src.ai import AIEngine
+from src.providers.llm_ollama import OllamaLLM, is_transient
+
+def make_llm(server, timeout=5.0, retries=2):
+    return OllamaLLM("test-model", host=server.url, timeout=timeout, retries=retries, backoff=0)
+
+def make_engine(llm):
+    # Без конструктора: він бере host/model з конфігу користувача
+    engine = AIEngine.__new__(AIEngine)
+    engine.embedder = None
+    engine.llm = llm
+    return engine
+
+# --- OllamaLLM: відповіді та повтори ---
+
+def test_success(fake_ollama):
+    assert make_llm(fake_ollama).generate_summary("def ok():\n    pass") == "Handles ok"
+    assert fake_ollama.count("ok") == 1
+
+def test_5xx_is_retried(fake_ollama):
+    assert make_llm(fake_ollama).generate_summary("def flaky():\n    'FLAKY'") == "Handles flaky"
+    assert fake_ollama.count("flaky") == 2
+
+def test_5xx_gives_up_after_retries(fake_ollama):
+    with pytest.raises(ollama.ResponseError) as info:
+        make_llm(fake_ollama, retries=2).generate_summary("def down():\n    'FAIL500'")
+    assert info.value.status_code == 500
+    assert fake_ollama.count("down") == 3
+
+def test_4xx_is_not_retried(fake_ollama):
+    with pytest.raises(ollama.ResponseError) as info:
+        make_llm(fake_ollama, retries=3).generate_summary("def missing():\n    'FAIL404'")
+    assert info.value.status_code == 404
+    assert fake_ollama.count("missing") == 1
+
+def test_timeout_is_retried(fake_ollama):
+    with pytest.raises(httpx.TimeoutException):
+        make_llm(fake_ollama, timeout=0.3, retries=1).generate_summary("def slow():\n    'SLEEP=1'")
+    assert fake_ollama.count("slow") == 2
+
+def test_connection_refused_is_transient(fake_ollama):
+    url = fake_ollama.url
+    fake_ollama.shutdown()
+    fake_ollama.server_close()
+    llm = OllamaLLM("test-model", host=url, timeout=1, retries=1, backoff=0)
+    with pytest.raises(ConnectionError) as info:
+        llm.generate_summary("def ok():\n    pass")
+    assert is_transient(info.value)
+
+def test_is_transient():
+    assert is_transient(ollama.ResponseError("busy", 503))
+    assert not is_transient(ollama.ResponseError("bad request", 400))
+    assert not is_transient(ollama.ResponseError("not found", 404))
+    assert is_transient(httpx.ReadTimeout("timed out"))
+    assert not is_transient(ValueError("bad prompt"))
+
+# --- AIEngine.generate_summaries: вікно конкурентності і порядок ---
+
+def test_window_keeps_input_order(fake_ollama):
+    # Перші відповідають найдовше: сервер завершує їх в оберненому порядку
+    items = [(i, f"def f{i:02d}():\n    'SLEEP={0.05 * (8 - i % 8):.2f}'") for i in range(16)]
+    results = list(make_engine(make_llm(fake_ollama)).generate_summaries(iter(items), concurrency=4))
+    assert [key for key, _, _ in results] == list(range(16))
+    assert [summary for _, summary, _ in results] == [f"Handles f{i:02d}" for i in range(16)]
+    assert 1 < fake_ollama.max_in_flight <= 4
+    assert fake_ollama.finished != sorted(fake_ollama.finished)
+
+def test_window_pulls_items_lazily(fake_ollama):
+    pulled = []
+
+    def items():
+        for i in range(20):
+            pulled.append(i)
+            yield i, f"def f{i:02d}():\n    pass"
+
+    results = make_engine(make_llm(fake_ollama)).generate_summaries(items(), concurrency=2)
+    next(results)
+    # Вікно - concurrency * 2 запитів: далі джерело не читається, доки результат не забрали
+    assert len(pulled) <= 2 * 2 + 1
+    results.close()
+
+def test_errors_are_yielded_in_place(fake_ollama):
+    items = [(0, "def a():\n    pass"), (1, "def b():\n    'FAIL404'"), (2, "def c():\n    pass")]
+    results = list(make_engine(make_llm(fake_ollama, retries=1)).generate_summaries(iter(items), concurrency=3))
+    assert [key for key, _, _ in results] == [0, 1, 2]
+    assert results[0][1] == "Handles a" and results[2][1] == "Handles c"
+    assert isinstance(results[1][2], ollama.ResponseError) and results[1][1] is None
+
+# --- summarize end-to-end: checkpoint зберігає префікс у порядку подачі ---
+
+def _project(tmp_path, server, markers):
+    home, project = tmp_path / "home", tmp_path / "project"
+    (home / ".config" / "code-indexer").mkdir(parents=True)
+    (home / ".config" / "code-indexer" / "config.yaml").write_text(
+        f"llm:\n  host: {server.url}\n  timeout: 60\n  retries: 1\n", encoding="utf-8")
+    project.mkdir()
+    body = "".join(f"def f{i:02d}():\n    return '{markers.get(i, 'ok')}'\n\n\n" for i in range(25))
+    (project / "funcs.py").write_text(body, encoding="utf-8")
+    env = {**os.environ, "HOME": str(home)}
+    _main(project, env, "scan", ".")
+    return project, env
+
+def _main(project, env, *args, **kwargs):
+    return subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), *args], cwd=project, env=env,
+                          capture_output=True, text=True, check=True, **kwargs)
+
+def _confidence(project, env):
+    out = project / "export.json"
+    _main(project, env, "export", "--out", str(out))
+    return {e["symbol"]: e["confidence"] for e in json.loads(out.read_text(encoding="utf-8"))}
+
+def test_summarize_checkpoint_is_an_ordered_prefix(tmp_path, fake_ollama):
+    project, env = _project(tmp_path, fake_ollama, {14: "HANG"})
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py"), "summarize", "-c", "3"],
+                            cwd=project, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # f14 висить; запити за ним у вікні (f15, f16) вже отримали відповідь
+        deadline = time.time() + 30
+        while time.time() < deadline and not {"f14", "f16"} <= set(fake_ollama.requests):
+            time.sleep(0.05)
+        time.sleep(1.0)
+        assert "f16" in fake_ollama.finished
+        # Процес "падає" посеред прогону: на диску лише checkpoint після 10 оброблених
+        proc.kill()
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    fake_ollama.release()
+    confidence = _confidence(project, env)
+    assert [s for s, c in sorted(confidence.items()) if c == "medium"] == [f"f{i:02d}" for i in range(10)]
+
+def test_summarize_leaves_failures_low(tmp_path, fake_ollama):
+    project, env = _project(tmp_path, fake_ollama, {3: "FAIL404", 7: "FAIL500", 11: "FLAKY"})
+    _main(project, env, "summarize", "-c", "3")
+    confidence = _confidence(project, env)
+    assert confidence["f03"] == "low" and confidence["f07"] == "low"
+    assert all(c == "medium" for s, c in confidence.items() if s not in ("f03", "f07"))
+    # 404 - без повторів, 500 - 1 + retries, FLAKY - вдалий другий запит
+    assert fake_ollama.count("f03") == 1
+    assert fake_ollama.count("f07") == 2
+    assert fake_ollama.count("f11") == 2